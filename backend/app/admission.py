@@ -0,0 +1,223 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+from urllib.parse import parse_qs
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() in ("1", "true", "yes")
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+class Rejected(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, status_code: int, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class Lane:
+    """
+    Concurrency limit with a bounded FIFO wait queue
+
+    When ``adaptive`` is set the limit follows AIMD on observed latency: it
+    grows by 1/limit per request that completes within ``target_latency`` and
+    is multiplied by ``backoff`` (at most once per ``cooldown``) when a request
+    is slower.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: float,
+        max_queue: int,
+        queue_timeout: float,
+        adaptive: bool = False,
+        min_limit: float = 1,
+        max_limit: Optional[float] = None,
+        target_latency: float = 0.5,
+        backoff: float = 0.9,
+        cooldown: float = 1.0
+    ):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.avg_latency = target_latency
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    def retry_after(self) -> int:
+        """Estimated seconds until a new request could be served"""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self.avg_latency * backlog / max(self.limit, 1)))
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Rejected(429, self.retry_after(), f"Too many concurrent {self.name} requests")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # A releasing request hands its slot over by resolving the waiter
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return
+            self._abandon(waiter)
+            self.timed_out += 1
+            raise Rejected(503, self.retry_after(), f"Timed out waiting for {self.name} capacity")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Cancelled right after being handed a slot; pass it on
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future):
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self, latency: float):
+        self.in_flight -= 1
+        self.avg_latency = 0.8 * self.avg_latency + 0.2 * latency
+        if self.adaptive:
+            self._adapt(latency)
+        self._wake()
+
+    def _adapt(self, latency: float):
+        if latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                logger.info(f"{self.name} lane limit decreased to {self.limit:.1f} (latency {latency * 1000:.0f}ms)")
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(True)
+
+    def stats(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "avg_latency_ms": round(self.avg_latency * 1000, 1),
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+
+def build_lanes() -> Dict[str, Lane]:
+    """Create the admission lanes from environment configuration"""
+    return {
+        "search": Lane(
+            "search",
+            limit=_env_float("SEARCH_CONCURRENCY_LIMIT", 16),
+            min_limit=_env_float("SEARCH_CONCURRENCY_MIN", 2),
+            max_limit=_env_float("SEARCH_CONCURRENCY_MAX", 64),
+            max_queue=int(_env_float("SEARCH_QUEUE_SIZE", 100)),
+            queue_timeout=_env_float("SEARCH_QUEUE_TIMEOUT_MS", 2000) / 1000,
+            target_latency=_env_float("SEARCH_TARGET_LATENCY_MS", 500) / 1000,
+            adaptive=True
+        ),
+        # Bookings and payments have their own, larger lane so search traffic
+        # can never take their slots
+        "priority": Lane(
+            "priority",
+            limit=_env_float("PRIORITY_CONCURRENCY_LIMIT", 128),
+            max_queue=int(_env_float("PRIORITY_QUEUE_SIZE", 1000)),
+            queue_timeout=_env_float("PRIORITY_QUEUE_TIMEOUT_MS", 10000) / 1000
+        ),
+    }
+
+
+def classify(scope: Dict) -> Optional[str]:
+    """Return the lane of a request, or None when it is not admission controlled"""
+    path = scope.get("path", "")
+    if path.startswith("/bookings") or path.startswith("/payments"):
+        return "priority"
+    if path == "/search/flights":
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        include_connections = query.get("include_connections", ["true"])[-1].lower()
+        if include_connections not in ("false", "0", "no", "off"):
+            return "search"
+    return None
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying per-lane admission control and load shedding"""
+
+    def __init__(self, app, lanes: Optional[Dict[str, Lane]] = None):
+        self.app = app
+        self.lanes = lanes if lanes is not None else build_lanes()
+
+    async def __call__(self, scope, receive, send):
+        lane_name = classify(scope) if scope["type"] == "http" else None
+        if lane_name is None:
+            await self.app(scope, receive, send)
+            return
+
+        lane = self.lanes[lane_name]
+        try:
+            await lane.acquire()
+        except Rejected as e:
+            await self._reject(send, e)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release(time.monotonic() - started)
+
+    @staticmethod
+    async def _reject(send, rejection: Rejected):
+        body = json.dumps({"detail": rejection.detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": rejection.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(rejection.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,282 @@
+import asyncio
+import argparse
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReadPreference
+from typing import Dict, List, Optional, Tuple
+from app.archive_flights import ARCHIVE_COLLECTION, find_flight
+from app.price_alerts import date_bucket
+from app.utils.airport_timezones import ensure_airport_timezones
+from app.utils.batch import parse_object_id
+from fastapi import HTTPException
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Daily per-route rollup: one document per (origin, destination, local departure day)
+ROLLUP_COLLECTION = "analytics_route_daily"
+
+# Counters kept per route and day
+ROLLUP_FIELDS = ("flights", "total_seats", "sold_seats", "bookings", "seats_booked", "revenue")
+
+# Flight fields needed to place a flight (and its bookings/payments) in a rollup
+FLIGHT_FIELDS = {"origin": 1, "destination": 1, "departure_time": 1, "total_seats": 1, "available_seats": 1}
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+}
+
+RouteDay = Tuple[str, str, str]
+
+
+def rollup_id(key: RouteDay) -> str:
+    origin, destination, day = key
+    return f"{origin}-{destination}-{day}"
+
+
+def flight_contribution(flight: Optional[Dict]) -> Dict[str, float]:
+    """Seat counters a flight adds to its route and day"""
+    if not flight:
+        return {}
+    total = flight.get("total_seats", 0)
+    return {"flights": 1, "total_seats": total, "sold_seats": total - flight.get("available_seats", total)}
+
+
+def booking_contribution(booking: Optional[Dict]) -> Dict[str, float]:
+    """Confirmed bookings count towards bookings and seats booked"""
+    if not booking or booking.get("status") != "confirmed":
+        return {}
+    return {"bookings": 1, "seats_booked": booking.get("seats", 0)}
+
+
+def payment_contribution(payment: Optional[Dict]) -> Dict[str, float]:
+    """Completed payments count as revenue; refunded and failed ones do not"""
+    if not payment or payment.get("status") != "completed":
+        return {}
+    return {"revenue": payment.get("amount", 0)}
+
+
+async def _flight_key(db: AsyncIOMotorDatabase, flight: Optional[Dict]) -> Optional[RouteDay]:
+    if not flight:
+        return None
+    await ensure_airport_timezones(db)
+    return flight["origin"], flight["destination"], date_bucket(flight)
+
+
+async def _flight_of(db: AsyncIOMotorDatabase, flight_id: Optional[str]) -> Optional[Dict]:
+    try:
+        return await find_flight(db, {"_id": parse_object_id(flight_id)})
+    except HTTPException:
+        return None
+
+
+async def apply_rollup_change(
+    db: AsyncIOMotorDatabase,
+    before: Tuple[Optional[RouteDay], Dict[str, float]],
+    after: Tuple[Optional[RouteDay], Dict[str, float]]
+):
+    """
+    Move a document's contribution from its old route/day to its new one
+
+    Args:
+        db: Database instance
+        before: (route/day, counters) of the document before the write
+        after: (route/day, counters) after the write; either key may be None
+    """
+    increments: Dict[RouteDay, Dict[str, float]] = {}
+    for (key, counters), sign in ((before, -1), (after, 1)):
+        if key is None:
+            continue
+        for field, value in counters.items():
+            inc = increments.setdefault(key, {})
+            inc[field] = inc.get(field, 0) + sign * value
+
+    now = datetime.utcnow()
+    for key, inc in increments.items():
+        inc = {field: value for field, value in inc.items() if value}
+        if not inc:
+            continue
+        origin, destination, day = key
+        await db[ROLLUP_COLLECTION].update_one(
+            {"_id": rollup_id(key)},
+            {
+                "$inc": inc,
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"origin": origin, "destination": destination, "day": day}
+            },
+            upsert=True
+        )
+
+
+async def record_flight_change(db: AsyncIOMotorDatabase, before: Optional[Dict], after: Optional[Dict]):
+    """Update rollups after a flight write (used as a background task by the flight routes)"""
+    try:
+        await apply_rollup_change(
+            db,
+            (await _flight_key(db, before), flight_contribution(before)),
+            (await _flight_key(db, after), flight_contribution(after))
+        )
+    except Exception as e:
+        logger.error(f"Error updating analytics rollups for flight {(after or before or {}).get('_id')}: {str(e)}")
+
+
+async def update_booking_rollups(db: AsyncIOMotorDatabase, before: Optional[Dict], after: Optional[Dict]):
+    """Move a booking's contribution between rollups; raises on database errors"""
+    before_flight = await _flight_of(db, before.get("flight_id")) if before else None
+    if after and before and after.get("flight_id") == before.get("flight_id"):
+        after_flight = before_flight
+    else:
+        after_flight = await _flight_of(db, after.get("flight_id")) if after else None
+    await apply_rollup_change(
+        db,
+        (await _flight_key(db, before_flight), booking_contribution(before)),
+        (await _flight_key(db, after_flight), booking_contribution(after))
+    )
+
+
+async def record_booking_change(db: AsyncIOMotorDatabase, before: Optional[Dict], after: Optional[Dict]):
+    """Update rollups after a booking write"""
+    try:
+        await update_booking_rollups(db, before, after)
+    except Exception as e:
+        logger.error(f"Error updating analytics rollups for booking {(after or before or {}).get('_id')}: {str(e)}")
+
+
+async def record_payment_change(db: AsyncIOMotorDatabase, before: Optional[Dict], after: Optional[Dict]):
+    """Update rollups after a payment write"""
+    try:
+        payment = after or before
+        booking = await db.bookings.find_one({"_id": parse_object_id(payment.get("booking_id"))}, {"flight_id": 1})
+        flight = await _flight_of(db, booking.get("flight_id")) if booking else None
+        key = await _flight_key(db, flight)
+        await apply_rollup_change(db, (key, payment_contribution(before)), (key, payment_contribution(after)))
+    except Exception as e:
+        logger.error(f"Error updating analytics rollups for payment {(after or before or {}).get('_id')}: {str(e)}")
+
+
+def _route_day_stages(prefix: str = "") -> List[Dict]:
+    """Stages adding origin/destination/local departure day of a (possibly embedded) flight"""
+    return [
+        {"$lookup": {"from": "airports", "localField": f"{prefix}origin", "foreignField": "code", "as": "_origin_airport"}},
+        {"$set": {"_key": {
+            "origin": f"${prefix}origin",
+            "destination": f"${prefix}destination",
+            "day": {"$dateToString": {
+                "format": "%Y-%m-%d",
+                "date": f"${prefix}departure_time",
+                "timezone": {"$ifNull": [{"$first": "$_origin_airport.timezone"}, "UTC"]}
+            }}
+        }}},
+    ]
+
+
+def _join_flight_stages(id_field: str) -> List[Dict]:
+    """Stages embedding the flight referenced by a string id field, from either collection"""
+    return [
+        {"$set": {"_flight_id": {"$convert": {"input": f"${id_field}", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {"from": "flights", "localField": "_flight_id", "foreignField": "_id", "as": "_hot"}},
+        {"$lookup": {"from": ARCHIVE_COLLECTION, "localField": "_flight_id", "foreignField": "_id", "as": "_archived"}},
+        {"$set": {"flight": {"$first": {"$concatArrays": ["$_hot", "$_archived"]}}}},
+        {"$match": {"flight": {"$ne": None}}},
+    ]
+
+
+def rebuild_pipelines() -> Dict[str, List[Dict]]:
+    """Full rollup aggregations per source collection, grouped by route and day"""
+    return {
+        "flights": [
+            {"$project": FLIGHT_FIELDS},
+            {"$unionWith": {"coll": ARCHIVE_COLLECTION}},
+            *_route_day_stages(),
+            {"$group": {
+                "_id": "$_key",
+                "flights": {"$sum": 1},
+                "total_seats": {"$sum": "$total_seats"},
+                "sold_seats": {"$sum": {"$subtract": ["$total_seats", "$available_seats"]}}
+            }},
+        ],
+        "bookings": [
+            {"$match": {"status": "confirmed"}},
+            {"$project": {"flight_id": 1, "seats": 1}},
+            *_join_flight_stages("flight_id"),
+            *_route_day_stages("flight."),
+            {"$group": {"_id": "$_key", "bookings": {"$sum": 1}, "seats_booked": {"$sum": "$seats"}}},
+        ],
+        "payments": [
+            {"$match": {"status": "completed"}},
+            {"$project": {"booking_id": 1, "amount": 1}},
+            {"$set": {"_booking_id": {"$convert": {"input": "$booking_id", "to": "objectId", "onError": None, "onNull": None}}}},
+            {"$lookup": {"from": "bookings", "localField": "_booking_id", "foreignField": "_id", "as": "_booking"}},
+            {"$set": {"booking_flight_id": {"$first": "$_booking.flight_id"}}},
+            *_join_flight_stages("booking_flight_id"),
+            *_route_day_stages("flight."),
+            {"$group": {"_id": "$_key", "revenue": {"$sum": "$amount"}}},
+        ],
+    }
+
+
+async def rebuild_rollups(
+    db: AsyncIOMotorDatabase,
+    read_preference=ReadPreference.SECONDARY,
+    batch_size: int = 1000
+) -> int:
+    """
+    Recompute all rollups from the source collections
+
+    The aggregations run with allowDiskUse on a secondary (by default), so
+    the primary only sees the rollup inserts. Results are written to a
+    staging collection that then replaces the rollups with one rename.
+    Incremental updates made while the rebuild runs are not carried over,
+    so run it off-peak or follow it with another rebuild.
+
+    Args:
+        db: Database instance
+        read_preference: Where the aggregations read from
+        batch_size: Rollup documents per insert_many
+
+    Returns:
+        Number of rollup documents written
+    """
+    from app.indexes import INDEXES
+
+    rows: Dict[str, Dict] = {}
+    for collection, pipeline in rebuild_pipelines().items():
+        source = db.get_collection(collection, read_preference=read_preference)
+        async for group in source.aggregate(pipeline, allowDiskUse=True):
+            key = group.pop("_id")
+            row = rows.setdefault(rollup_id((key["origin"], key["destination"], key["day"])), {
+                "origin": key["origin"],
+                "destination": key["destination"],
+                "day": key["day"],
+                **{field: 0 for field in ROLLUP_FIELDS}
+            })
+            row.update(group)
+        logger.info(f"Aggregated {collection} rollups ({len(rows)} route days so far)")
+
+    staging = db[f"{ROLLUP_COLLECTION}_rebuild"]
+    await staging.drop()
+    await staging.create_indexes(INDEXES[ROLLUP_COLLECTION])
+    now = datetime.utcnow()
+    documents = [{"_id": _id, **row, "updated_at": now} for _id, row in rows.items()]
+    for i in range(0, len(documents), batch_size):
+        await staging.insert_many(documents[i:i + batch_size], ordered=False)
+    await staging.rename(ROLLUP_COLLECTION, dropTarget=True)
+
+    logger.info(f"Rebuilt {len(documents)} analytics rollups")
+    return len(documents)
+
+
+if __name__ == "__main__":
+    # Scheduled/one-off entry point: python -m app.analytics --read-preference secondary
+    from app.database import client, db
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily route analytics rollups")
+    parser.add_argument("--read-preference", choices=list(READ_PREFERENCES), default="secondary", help="Where the aggregations run")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild_rollups(db, read_preference=READ_PREFERENCES[args.read_preference]))
+    client.close()
@@ -0,0 +1,136 @@
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne
+from typing import Dict, Iterable
+from app.utils.batch import find_by_ids
+from app.utils.flight_snapshot import TOMBSTONES_COLLECTION
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLLECTION = "flights_archive"
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# Flights are kept in the hot collection for this long after departure
+ARCHIVE_GRACE_HOURS = int(os.getenv("ARCHIVE_GRACE_HOURS", "24"))
+
+
+def archivable_query(cutoff: datetime) -> dict:
+    """Flights that no longer belong in the searchable collection"""
+    return {
+        "$or": [
+            {"departure_time": {"$lt": cutoff}},
+            {"status": {"$in": ["departed", "arrived"]}}
+        ]
+    }
+
+
+async def archive_past_flights(
+    db: AsyncIOMotorDatabase,
+    cutoff: datetime = None,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    pause_seconds: float = 0.0
+) -> int:
+    """
+    Move departed, arrived and past-dated flights into the archive collection
+
+    Each batch is upserted into the archive by _id and tombstoned (so flight
+    snapshot deltas drop it) before being deleted from ``flights``, so an
+    interrupted run can simply be repeated. The delete re-applies the archive
+    predicate; flights that stopped matching it in the meantime stay in
+    ``flights`` and their archive copy and tombstone are removed again.
+
+    Args:
+        db: Database instance
+        cutoff: Flights departing before this time are archived
+            (default: now minus ARCHIVE_GRACE_HOURS)
+        batch_size: Flights moved per batch
+        pause_seconds: Sleep between batches to limit load on the primary
+
+    Returns:
+        Number of flights archived
+    """
+    if cutoff is None:
+        cutoff = datetime.utcnow() - timedelta(hours=ARCHIVE_GRACE_HOURS)
+
+    query = archivable_query(cutoff)
+    archived = 0
+
+    while True:
+        batch = await db.flights.find(query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        ids = [flight["_id"] for flight in batch]
+        await db[ARCHIVE_COLLECTION].bulk_write(
+            [ReplaceOne({"_id": flight["_id"]}, flight, upsert=True) for flight in batch],
+            ordered=False
+        )
+        deleted_at = datetime.utcnow()
+        await db[TOMBSTONES_COLLECTION].bulk_write(
+            [ReplaceOne({"_id": _id}, {"_id": _id, "deleted_at": deleted_at}, upsert=True) for _id in ids],
+            ordered=False
+        )
+        # Re-check the predicate: a flight rescheduled since it was read stays
+        result = await db.flights.delete_many({"_id": {"$in": ids}, **query})
+        if result.deleted_count != len(ids):
+            kept = await db.flights.distinct("_id", {"_id": {"$in": ids}})
+            if kept:
+                # Undo the archive copy and tombstone of flights no longer archivable
+                await db[ARCHIVE_COLLECTION].delete_many({"_id": {"$in": kept}})
+                await db[TOMBSTONES_COLLECTION].delete_many({"_id": {"$in": kept}})
+                logger.info(f"Skipped {len(kept)} flights changed since they were read")
+
+        archived += result.deleted_count
+        logger.info(f"Archived batch of {result.deleted_count} flights ({archived} total)")
+
+        if pause_seconds:
+            await asyncio.sleep(pause_seconds)
+
+    logger.info(f"Archived {archived} flights departing before {cutoff.isoformat()}")
+    return archived
+
+
+async def find_flight(db: AsyncIOMotorDatabase, query: dict):
+    """Find a flight in the hot collection, falling back to the archive"""
+    flight = await db.flights.find_one(query)
+    if flight is None:
+        flight = await db[ARCHIVE_COLLECTION].find_one(query)
+    return flight
+
+
+async def find_flights_by_ids(db: AsyncIOMotorDatabase, ids: Iterable) -> Dict:
+    """
+    Load flights by _id with $in queries, then query the archive for any missing
+
+    Returns:
+        Mapping of _id to flight document
+    """
+    ids = list(dict.fromkeys(ids))
+    flights = await find_by_ids(db.flights, ids)
+    missing = [i for i in ids if i not in flights]
+    if missing:
+        flights.update(await find_by_ids(db[ARCHIVE_COLLECTION], missing))
+    return flights
+
+
+if __name__ == "__main__":
+    # Scheduled entry point: python -m app.archive_flights
+    from app.database import client, db
+
+    parser = argparse.ArgumentParser(description="Archive past flights out of the search collection")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Flights moved per batch")
+    parser.add_argument("--grace-hours", type=int, default=ARCHIVE_GRACE_HOURS, help="Hours after departure to keep flights")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(archive_past_flights(
+        db,
+        cutoff=datetime.utcnow() - timedelta(hours=args.grace_hours),
+        batch_size=args.batch_size,
+        pause_seconds=args.pause
+    ))
+    client.close()
@@ -0,0 +1,61 @@
+import argparse
+import time
+from datetime import datetime
+from typing import Dict, List
+import numpy as np
+from bson import ObjectId
+from app.compression import available_encodings, compress
+from app.seed_data import columns_to_documents, generate_flight_columns
+from app.utils.responses import FastJSONResponse
+
+# Levels compared per coding
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 6, 11]}
+
+
+def sample_search_results(num_results: int, seed: int = 7) -> List[Dict]:
+    """Search-shaped results (half direct, half two-segment connections) from generated flights"""
+    rng = np.random.default_rng(seed)
+    flights = columns_to_documents(generate_flight_columns(rng, num_results * 3, [str(ObjectId()) for _ in range(12)], datetime(2026, 1, 1)))
+    for flight in flights:
+        flight["_id"] = str(ObjectId())
+    results = []
+    for i in range(num_results):
+        if i % 2 == 0:
+            flight = flights[i]
+            results.append({**flight, "type": "direct", "total_price": flight["price"], "segments": [dict(flight)]})
+        else:
+            first, second = flights[num_results + i], flights[2 * num_results + i]
+            results.append({
+                "type": "connection",
+                "segments": [first, second],
+                "total_price": first["price"] + second["price"],
+                "layover_hours": 2.5,
+            })
+    return results
+
+
+def measure(body: bytes, encoding: str, level: int, repeat: int) -> Dict:
+    """Compressed size and CPU milliseconds per response for one coding and level"""
+    kwargs = {"gzip_level": level} if encoding == "gzip" else {"brotli_quality": level}
+    compressed = compress(body, encoding, **kwargs)
+    started = time.process_time()
+    for _ in range(repeat):
+        compress(body, encoding, **kwargs)
+    cpu_ms = (time.process_time() - started) * 1000 / repeat
+    return {"bytes": len(compressed), "ratio": len(body) / max(len(compressed), 1), "cpu_ms": cpu_ms}
+
+
+if __name__ == "__main__":
+    # Bytes on the wire and CPU cost per coding/level: python -m app.bench_compression
+    parser = argparse.ArgumentParser(description="Measure response compression size and CPU per level")
+    parser.add_argument("--results", type=int, nargs="+", default=[2, 20, 100], help="Search result counts to encode")
+    parser.add_argument("--repeat", type=int, default=50, help="Compressions timed per measurement")
+    args = parser.parse_args()
+
+    print(f"{'results':>7} {'identity':>9} {'coding':>6} {'level':>5} {'bytes':>9} {'ratio':>6} {'cpu ms':>7}")
+    for n in args.results:
+        body = FastJSONResponse(sample_search_results(n)).body
+        for encoding in available_encodings():
+            for level in LEVELS[encoding]:
+                r = measure(body, encoding, level, args.repeat)
+                print(f"{n:>7} {len(body):>9} {encoding:>6} {level:>5} {r['bytes']:>9} {r['ratio']:>6.1f} {r['cpu_ms']:>7.2f}")
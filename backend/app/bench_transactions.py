@@ -0,0 +1,127 @@
+import asyncio
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import HTTPException
+from typing import Dict
+from app.utils import transactions
+from app.utils.checkout import place_booking
+
+BENCH_DATABASE = "flight_booking_bench"
+
+
+async def seed_hot_flight(db, seats: int) -> str:
+    """Reset the bench collections and insert the one contended flight"""
+    for name in ("flights", "bookings", "payments", "jobs"):
+        await db[name].drop()
+    departure = datetime.utcnow() + timedelta(days=30)
+    result = await db.flights.insert_one({
+        "flight_number": "HOT1",
+        "airline_id": "bench",
+        "origin": "JFK",
+        "destination": "LAX",
+        "departure_time": departure,
+        "arrival_time": departure + timedelta(hours=6),
+        "price": 199.0,
+        "available_seats": seats,
+        "total_seats": seats,
+        "status": "scheduled",
+    })
+    # Collections must exist before they are written in a transaction
+    for name in ("bookings", "payments", "jobs"):
+        await db.create_collection(name)
+    return str(result.inserted_id)
+
+
+async def run(client, db, flight_id: str, transactional: bool, concurrency: int, duration: float, cancel_rate: float) -> Dict:
+    """
+    Book one seat at a time from ``concurrency`` clients for ``duration`` seconds
+
+    ``cancel_rate`` of the requests are cancelled part way through (like a
+    client disconnect or a timeout), which leaves partial writes behind on the
+    non-transactional path.
+    """
+    counts = {"booked": 0, "sold_out": 0, "busy": 0, "cancelled": 0, "errors": 0}
+    transactions.TRANSACTION_STATS.update({key: 0 for key in transactions.TRANSACTION_STATS})
+    deadline = time.monotonic() + duration
+
+    async def book():
+        booking = {
+            "booking_reference": f"B{random.getrandbits(40):010X}",
+            "user_id": "bench",
+            "flight_id": flight_id,
+            "passenger_ids": ["bench"],
+            "seats": 1,
+            "total_price": 199.0,
+            "status": "pending",
+        }
+        payment = {"payment_method": "card", "status": "completed", "transaction_id": None}
+        await place_booking(client, db, booking, payment, transactional=transactional)
+
+    async def worker():
+        while time.monotonic() < deadline:
+            try:
+                if random.random() < cancel_rate:
+                    await asyncio.wait_for(book(), timeout=random.uniform(0.0005, 0.005))
+                else:
+                    await book()
+                counts["booked"] += 1
+            except asyncio.TimeoutError:
+                counts["cancelled"] += 1
+            except HTTPException as e:
+                counts["sold_out" if e.status_code == 409 else "busy"] += 1
+            except Exception:
+                counts["errors"] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.monotonic() - started
+
+    flight = await db.flights.find_one({}, {"available_seats": 1, "total_seats": 1})
+    booked_seats = await db.bookings.count_documents({})
+    stats = transactions.TRANSACTION_STATS
+    return {
+        **counts,
+        "per_second": counts["booked"] / elapsed,
+        "aborts": stats["aborted"],
+        # Each transaction attempt ends in a commit or an abort
+        "abort_rate": stats["aborted"] / max(stats["committed"] + stats["aborted"], 1),
+        "exhausted": stats["exhausted"],
+        # Seats taken without a booking, or bookings without a payment or jobs
+        "orphan_seats": flight["total_seats"] - flight["available_seats"] - booked_seats,
+        "bookings_without_payment": booked_seats - await db.payments.count_documents({}),
+        "bookings_without_jobs": booked_seats - await db.jobs.count_documents({"type": "booking_analytics"}),
+    }
+
+
+async def main(args):
+    client = AsyncIOMotorClient(args.uri)
+    db = client[BENCH_DATABASE]
+    try:
+        print(f"{'path':>14} {'clients':>7} {'booked/s':>9} {'aborts':>7} {'abort %':>7} {'busy':>5} {'orphans':>7} {'no pay':>6} {'no jobs':>7}")
+        for concurrency in args.concurrency:
+            for transactional in (False, True):
+                flight_id = await seed_hot_flight(db, args.seats)
+                r = await run(client, db, flight_id, transactional, concurrency, args.duration, args.cancel_rate)
+                path = "transaction" if transactional else "separate"
+                print(
+                    f"{path:>14} {concurrency:>7} {r['per_second']:>9.1f} {r['aborts']:>7} {r['abort_rate'] * 100:>7.1f} "
+                    f"{r['busy']:>5} {r['orphan_seats']:>7} {r['bookings_without_payment']:>6} {r['bookings_without_jobs']:>7}"
+                )
+    finally:
+        await client.drop_database(BENCH_DATABASE)
+        client.close()
+
+
+if __name__ == "__main__":
+    # Needs a replica set, e.g. mongod --replSet rs0 and rs.initiate():
+    # python -m app.bench_transactions --uri mongodb://localhost:27017/?replicaSet=rs0
+    parser = argparse.ArgumentParser(description="Compare transactional and separate booking writes on one hot flight")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/?replicaSet=rs0", help="Replica set connection string")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64], help="Concurrent booking clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per run")
+    parser.add_argument("--seats", type=int, default=1_000_000, help="Seats on the hot flight")
+    parser.add_argument("--cancel-rate", type=float, default=0.01, help="Fraction of requests cancelled mid-write")
+    asyncio.run(main(parser.parse_args()))
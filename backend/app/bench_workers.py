@@ -0,0 +1,118 @@
+import asyncio
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_pids(master_pid: int) -> List[int]:
+    """Direct children of the gunicorn master (Linux /proc)"""
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    """Rss, Pss and private dirty memory of a process from smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Private_Dirty:"):
+                values[parts[0].rstrip(":").lower()] = int(parts[1])
+    return values
+
+
+async def _wait_ready(base_url: str, path: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as http:
+        while time.monotonic() < deadline:
+            try:
+                await http.get(path)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.5)
+    raise TimeoutError(f"Server at {base_url} not ready after {timeout}s")
+
+
+async def _load(base_url: str, path: str, concurrency: int, duration: float) -> Dict:
+    """Issue requests from `concurrency` clients for `duration` seconds"""
+    completed = 0
+    errors = 0
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as http:
+        async def client_loop():
+            nonlocal completed, errors
+            while time.monotonic() < deadline:
+                try:
+                    response = await http.get(path)
+                    if response.status_code >= 500:
+                        errors += 1
+                    else:
+                        completed += 1
+                except httpx.HTTPError:
+                    errors += 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+        elapsed = time.monotonic() - start
+
+    return {"requests": completed, "errors": errors, "rps": completed / elapsed}
+
+
+def run_benchmark(workers: int, path: str, port: int, concurrency: int, duration: float, snapshot: bool) -> Dict:
+    """Start gunicorn with N workers, measure throughput, then per-worker memory"""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}", FLIGHT_SNAPSHOT=str(snapshot).lower())
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(_wait_ready(base_url, path, timeout=120))
+        load = asyncio.run(_load(base_url, path, concurrency, duration))
+        memory = [_memory_kb(pid) for pid in _worker_pids(server.pid)]
+        master = _memory_kb(server.pid)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    n = max(len(memory), 1)
+    return {
+        "workers": workers,
+        **load,
+        "master_rss_mb": master.get("rss", 0) / 1024,
+        "worker_rss_mb": sum(m.get("rss", 0) for m in memory) / n / 1024,
+        "worker_pss_mb": sum(m.get("pss", 0) for m in memory) / n / 1024,
+        "worker_private_mb": sum(m.get("private_dirty", 0) for m in memory) / n / 1024,
+    }
+
+
+if __name__ == "__main__":
+    # Memory vs throughput per worker count: python -m app.bench_workers --workers 1 2 4
+    parser = argparse.ArgumentParser(description="Benchmark RSS per worker against throughput")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--path", default="/search/popular-routes?limit=10", help="Request path to load")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind gunicorn to")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per run")
+    parser.add_argument("--no-snapshot", action="store_true", help="Disable the preloaded flight snapshot")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"{'workers':>7} {'req/s':>9} {'errors':>6} {'master RSS':>10} {'worker RSS':>10} {'worker PSS':>10} {'private':>8}")
+    for n in args.workers:
+        r = run_benchmark(n, args.path, args.port, args.concurrency, args.duration, not args.no_snapshot)
+        print(
+            f"{r['workers']:>7} {r['rps']:>9.1f} {r['errors']:>6} {r['master_rss_mb']:>9.1f}M "
+            f"{r['worker_rss_mb']:>9.1f}M {r['worker_pss_mb']:>9.1f}M {r['worker_private_mb']:>7.1f}M"
+        )
@@ -0,0 +1,35 @@
+import asyncio
+import argparse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.utils.flight_snapshot import FLIGHT_SNAPSHOT_PATH, build_flight_snapshot, write_snapshot_file
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def build_snapshot_file(db: AsyncIOMotorDatabase, path: str) -> int:
+    """
+    Export the searchable flight fields to a columnar snapshot file
+
+    API processes map the file and only read the flights changed since it was
+    built, so rebuilding it regularly keeps their startup catch-up small.
+
+    Returns:
+        Number of flights in the snapshot
+    """
+    snapshot = await build_flight_snapshot(db)
+    write_snapshot_file(snapshot, path)
+    return len(snapshot)
+
+
+if __name__ == "__main__":
+    # Scheduled entry point: python -m app.build_flight_snapshot --output /data/flights.snap
+    from app.database import client, db
+
+    parser = argparse.ArgumentParser(description="Build the memory-mapped flight snapshot file")
+    parser.add_argument("--output", default=FLIGHT_SNAPSHOT_PATH or "flights.snap", help="Snapshot file path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(build_snapshot_file(db, args.output))
+    client.close()
@@ -0,0 +1,176 @@
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION", "true").lower() in ("1", "true", "yes")
+# Complete responses smaller than this are sent as-is; below a few hundred
+# bytes the framing overhead and CPU outweigh the saving
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+# Quality 4-5 is the usual sweet spot for dynamic content (11 is for static assets)
+BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "+json", "+xml")
+
+
+def available_encodings() -> List[str]:
+    """Supported content codings, in server preference order"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str, supported: Optional[List[str]] = None) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header
+
+    The highest q-value wins; ties go to the server preference order
+    (brotli before gzip). Codings with q=0 are refused.
+    """
+    supported = supported if supported is not None else available_encodings()
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _Compressor:
+    """Incremental gzip or brotli encoder"""
+
+    def __init__(self, encoding: str, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> bytes:
+    """Compress a complete body"""
+    compressor = _Compressor(encoding, gzip_level, brotli_quality)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _with_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return headers + [(b"vary", b"Accept-Encoding")]
+    if b"accept-encoding" in vary.lower() or vary == b"*":
+        return headers
+    return [(k, v) for k, v in headers if k.lower() != b"vary"] + [(b"vary", vary + b", Accept-Encoding")]
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with the negotiated coding
+
+    Complete responses below ``minimum_size`` bytes are passed through.
+    Streaming responses (e.g. exports) are compressed chunk by chunk, so they
+    are never buffered. Already-encoded bodies and non-text content types
+    (such as Parquet) are left alone.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = negotiate_encoding(accept) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                if _header(headers, b"content-encoding") is not None or not any(t in content_type for t in COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Held until the first body chunk shows the size
+                start_message = {**message, "headers": _with_vary(headers)}
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = [(k, v) for k, v in start_message["headers"] if k.lower() != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                if not more_body:
+                    body = compressor.compress(body) + compressor.flush()
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start_message, "headers": headers})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start_message, "headers": headers})
+
+            data = compressor.compress(body)
+            if not more_body:
+                data += compressor.flush()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -1,6 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.tracing import TRACING_ENABLED, MongoCommandTracer
 import os
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URI)
-db = client["flight_booking"]
\ No newline at end of file
+MONGO_DATABASE = os.getenv("MONGO_DATABASE", "flight_booking")
+# connect=False: no monitor threads until first use, so the app can be
+# imported in the gunicorn master and forked safely (see gunicorn.conf.py)
+# Command spans are only collected when tracing is on (no listener otherwise)
+client = AsyncIOMotorClient(MONGO_URI, connect=False, event_listeners=[MongoCommandTracer()] if TRACING_ENABLED else [])
+db = client[MONGO_DATABASE]
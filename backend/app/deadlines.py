@@ -0,0 +1,177 @@
+from contextvars import ContextVar
+from dataclasses import dataclass
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Optional, Set, Tuple
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DEADLINES = os.getenv("REQUEST_DEADLINES", "true").lower() in ("1", "true", "yes")
+# Whole-request budget for searches; keep it below the ingress timeout so
+# Mongo stops working on a request before the proxy gives up on it
+SEARCH_DEADLINE_MS = int(os.getenv("SEARCH_DEADLINE_MS", "5000"))
+# Paths that get a deadline and are cancelled when the client disconnects
+DEADLINE_PATH_PREFIXES = ("/search/",)
+# A query is not started with less time than this left
+MIN_QUERY_MS = int(os.getenv("MIN_QUERY_MS", "50"))
+
+
+@dataclass
+class Deadline:
+    expires_at: float  # time.monotonic()
+    # Tags the request's commands ($comment) so they can be found and killed
+    comment: str
+
+    def remaining_ms(self) -> int:
+        return int((self.expires_at - time.monotonic()) * 1000)
+
+
+_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+# Kill tasks started from cancelled requests (kept referenced until done)
+_kill_tasks: Set[asyncio.Task] = set()
+
+
+def set_deadline(timeout_ms: int, comment: Optional[str] = None):
+    """Start a deadline for the current context; returns a token for reset_deadline"""
+    return _deadline.set(Deadline(time.monotonic() + timeout_ms / 1000, comment or f"req:{uuid.uuid4().hex}"))
+
+
+def reset_deadline(token):
+    _deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _deadline.get()
+
+
+def query_budget_ms(cap_ms: Optional[int] = None) -> Optional[int]:
+    """
+    maxTimeMS for the next query: the time left before the deadline, at most ``cap_ms``
+
+    None when there is no deadline and no cap. Never less than 1, since
+    maxTimeMS=0 means no limit.
+    """
+    deadline = _deadline.get()
+    budgets = [b for b in (deadline.remaining_ms() if deadline else None, cap_ms) if b is not None]
+    return max(1, min(budgets)) if budgets else None
+
+
+def query_options(cap_ms: Optional[int] = None) -> dict:
+    """maxTimeMS and comment keyword arguments for find/aggregate under the current deadline"""
+    options = {}
+    budget = query_budget_ms(cap_ms)
+    if budget is not None:
+        options["maxTimeMS"] = budget
+    deadline = _deadline.get()
+    if deadline is not None:
+        options["comment"] = deadline.comment
+    return options
+
+
+async def kill_operations(db: AsyncIOMotorDatabase, comment: str) -> int:
+    """
+    Kill this client's server operations tagged with ``comment``
+
+    Closing the Motor cursor only stops further batches; the first batch of
+    an aggregation (where a $lookup spends its time) runs until killOp.
+    """
+    admin = db.client.admin
+    killed = 0
+    try:
+        ops = await admin.aggregate([
+            {"$currentOp": {"allUsers": False, "idleConnections": False}},
+            {"$match": {"command.comment": comment}},
+            {"$project": {"opid": 1}}
+        ]).to_list(length=None)
+        for op in ops:
+            await admin.command("killOp", op=op["opid"])
+            killed += 1
+    except Exception as e:
+        logger.warning(f"Error killing operations of {comment}: {str(e)}")
+    if killed:
+        logger.info(f"Killed {killed} operations of cancelled request {comment}")
+    return killed
+
+
+async def to_list_cancellable(db: AsyncIOMotorDatabase, cursor, length: Optional[int]):
+    """
+    cursor.to_list that kills the request's server operations when cancelled
+
+    The kill runs as its own task, since the cancelled caller cannot await it.
+    """
+    try:
+        return await cursor.to_list(length=length)
+    except asyncio.CancelledError:
+        deadline = _deadline.get()
+        if deadline is not None:
+            task = asyncio.create_task(kill_operations(db, deadline.comment))
+            _kill_tasks.add(task)
+            task.add_done_callback(_kill_tasks.discard)
+        raise
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware giving matching requests a deadline and cancelling them on disconnect
+
+    The handler runs as a task. A separate reader forwards ``receive``
+    messages to it and cancels it if the client disconnects before the
+    response is complete. Queries under a cancelled handler kill their
+    server-side operations (see to_list_cancellable).
+    """
+
+    def __init__(self, app, timeout_ms: int = SEARCH_DEADLINE_MS, path_prefixes: Tuple[str, ...] = DEADLINE_PATH_PREFIXES):
+        self.app = app
+        self.timeout_ms = timeout_ms
+        self.path_prefixes = path_prefixes
+        self.cancelled = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        token = set_deadline(self.timeout_ms)
+        messages: asyncio.Queue = asyncio.Queue()
+        response_complete = False
+        disconnected = False
+
+        async def send_tracking(message):
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        # Created after set_deadline, so the handler task sees the deadline
+        handler = asyncio.create_task(self.app(scope, messages.get, send_tracking))
+
+        async def read_messages():
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete and not handler.done():
+                        disconnected = True
+                        self.cancelled += 1
+                        logger.info(f"Client disconnected, cancelling {scope['method']} {scope['path']}")
+                        handler.cancel()
+                    return
+
+        reader = asyncio.create_task(read_messages())
+        try:
+            await handler
+        except asyncio.CancelledError:
+            # After a disconnect nobody is left to send a response to; any
+            # other cancellation (e.g. server shutdown) propagates
+            if not disconnected:
+                raise
+        finally:
+            reader.cancel()
+            if not handler.done():
+                handler.cancel()
+            reset_deadline(token)
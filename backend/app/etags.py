@@ -0,0 +1,100 @@
+from typing import List, Tuple
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ETAGS_ENABLED = os.getenv("ETAGS", "true").lower() in ("1", "true", "yes")
+# GET endpoints whose complete 200 responses get a weak ETag
+ETAG_PATH_PREFIXES = ("/search/", "/flights")
+
+# Kept on a 304 so caches can update their stored response
+_NOT_MODIFIED_HEADERS = (b"cache-control", b"content-location", b"date", b"etag", b"expires", b"vary")
+
+
+def weak_etag(body: bytes) -> bytes:
+    """Weak validator of a response body (stays valid across content codings)"""
+    return b'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest().encode() + b'"'
+
+
+def etag_matches(if_none_match: bytes, etag: bytes) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if if_none_match.strip() == b"*":
+        return True
+    opaque = etag[2:] if etag.startswith(b"W/") else etag
+    for candidate in if_none_match.split(b","):
+        candidate = candidate.strip()
+        if candidate.startswith(b"W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+class ETagMiddleware:
+    """
+    ASGI middleware adding weak ETags and answering conditional GETs with 304
+
+    Applies to GET requests under ETAG_PATH_PREFIXES whose response is a
+    complete 200 body; streaming responses are passed through untouched.
+    The hash is taken over the uncompressed body, so it must run inside the
+    compression middleware.
+    """
+
+    def __init__(self, app, path_prefixes: Tuple[str, ...] = ETAG_PATH_PREFIXES):
+        self.app = app
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.path_prefixes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = dict(scope["headers"]).get(b"if-none-match")
+        start_message = None
+        passthrough = False
+
+        async def send_with_etag(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            if message.get("more_body", False):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers: List[Tuple[bytes, bytes]] = list(start_message.get("headers", []))
+            etag = next((v for k, v in headers if k.lower() == b"etag"), None)
+            if etag is None:
+                etag = weak_etag(message.get("body", b""))
+                headers.append((b"etag", etag))
+
+            if if_none_match is not None and etag_matches(if_none_match, etag):
+                await send({
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [(k, v) for k, v in headers if k.lower() in _NOT_MODIFIED_HEADERS],
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send({**start_message, "headers": headers})
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
@@ -1,100 +1,246 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel, ASCENDING, DESCENDING, TEXT
+from typing import Dict, List
+import asyncio
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# How the API process builds indexes on startup:
+#   "blocking"   - build before accepting traffic (default, previous behaviour)
+#   "background" - schedule the build and start serving immediately
+#   "skip"       - do nothing; run `python -m app.indexes` as a migration step
+INDEX_BUILD_MODE = os.getenv("INDEX_BUILD_MODE", "blocking").lower()
 
-async def create_indexes(db: AsyncIOMotorDatabase):
-    """Create all necessary indexes for optimal query performance"""
-    
-    try:
-        # Flights collection indexes
-        await db.flights.create_index([("origin", 1), ("destination", 1)])
-        await db.flights.create_index([("departure_time", 1)])
-        await db.flights.create_index([("arrival_time", 1)])
-        await db.flights.create_index([("price", 1)])
-        await db.flights.create_index([("airline_id", 1)])
-        await db.flights.create_index([("status", 1)])
-        await db.flights.create_index([("available_seats", 1)])
-        await db.flights.create_index([("flight_number", 1)], unique=True)
-        
+
+# Declarative index specification, keyed by collection name
+INDEXES: Dict[str, List[IndexModel]] = {
+    "flights": [
+        IndexModel([("origin", ASCENDING), ("destination", ASCENDING)]),
+        IndexModel([("departure_time", ASCENDING)]),
+        IndexModel([("arrival_time", ASCENDING)]),
+        IndexModel([("price", ASCENDING)]),
+        IndexModel([("airline_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+        IndexModel([("available_seats", ASCENDING)]),
+        IndexModel([("flight_number", ASCENDING)], unique=True),
         # Compound index for common flight search queries
-        await db.flights.create_index([
-            ("origin", 1),
-            ("destination", 1),
-            ("departure_time", 1),
-            ("available_seats", 1)
-        ])
-        
+        IndexModel([
+            ("origin", ASCENDING),
+            ("destination", ASCENDING),
+            ("departure_time", ASCENDING),
+            ("available_seats", ASCENDING)
+        ]),
         # Compound index for price range searches
-        await db.flights.create_index([
-            ("origin", 1),
-            ("destination", 1),
-            ("price", 1)
-        ])
-        
-        logger.info("Flight indexes created successfully")
-        
-        # Bookings collection indexes
-        await db.bookings.create_index([("user_id", 1)])
-        await db.bookings.create_index([("flight_id", 1)])
-        await db.bookings.create_index([("booking_reference", 1)], unique=True)
-        await db.bookings.create_index([("status", 1)])
-        await db.bookings.create_index([("created_at", -1)])  # Descending for recent bookings
-        
-        # Compound index for user bookings by status
-        await db.bookings.create_index([
-            ("user_id", 1),
-            ("status", 1),
-            ("created_at", -1)
-        ])
-        
-        logger.info("Booking indexes created successfully")
-        
-        # Users collection indexes
-        await db.users.create_index([("email", 1)], unique=True)
-        await db.users.create_index([("role", 1)])
-        await db.users.create_index([("created_at", -1)])
-        
-        logger.info("User indexes created successfully")
-        
-        # Passengers collection indexes
-        await db.passengers.create_index([("user_id", 1)])
-        await db.passengers.create_index([("passport_number", 1)])
-        
-        logger.info("Passenger indexes created successfully")
-        
-        # Payments collection indexes
-        await db.payments.create_index([("booking_id", 1)])
-        await db.payments.create_index([("status", 1)])
-        await db.payments.create_index([("transaction_id", 1)])
-        await db.payments.create_index([("created_at", -1)])
-        
-        logger.info("Payment indexes created successfully")
-        
-        # Airlines collection indexes
-        await db.airlines.create_index([("code", 1)], unique=True)
-        await db.airlines.create_index([("name", 1)])
-        await db.airlines.create_index([("country", 1)])
-        
-        logger.info("Airline indexes created successfully")
-        
-        # Airports collection indexes
-        await db.airports.create_index([("code", 1)], unique=True)
-        await db.airports.create_index([("name", 1)])
-        await db.airports.create_index([("city", 1)])
-        await db.airports.create_index([("country", 1)])
-        
+        IndexModel([
+            ("origin", ASCENDING),
+            ("destination", ASCENDING),
+            ("price", ASCENDING)
+        ]),
+        # Flight snapshot delta catch-up
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    # Deleted flight ids for snapshot deltas; expire well after snapshots are rebuilt
+    "flight_tombstones": [
+        IndexModel([("deleted_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600),
+    ],
+    # Past flights moved out of "flights" by app.archive_flights
+    "flights_archive": [
+        IndexModel([("flight_number", ASCENDING)]),
+        IndexModel([("departure_time", ASCENDING)]),
+        IndexModel([("origin", ASCENDING), ("destination", ASCENDING), ("departure_time", ASCENDING)]),
+    ],
+    "bookings": [
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("flight_id", ASCENDING)]),
+        IndexModel([("booking_reference", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),  # Descending for recent bookings
+        # Compound index for user bookings by status, in keyset page order
+        IndexModel([
+            ("user_id", ASCENDING),
+            ("status", ASCENDING),
+            ("created_at", DESCENDING),
+            ("_id", DESCENDING)
+        ]),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("role", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    "passengers": [
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("passport_number", ASCENDING)]),
+    ],
+    "payments": [
+        IndexModel([("booking_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+        IndexModel([("transaction_id", ASCENDING)]),
+        IndexModel([("created_at", DESCENDING)]),
+    ],
+    # Price alert subscriptions, matched per changed flight by range on max_price
+    "price_watches": [
+        IndexModel([
+            ("origin", ASCENDING),
+            ("destination", ASCENDING),
+            ("date_bucket", ASCENDING),
+            ("max_price", ASCENDING)
+        ]),
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    # Reconciliation findings (app.reconcile_payments), keyed by transaction id
+    "payment_discrepancies": [
+        IndexModel([("issue", ASCENDING), ("seen_at", DESCENDING)]),
+    ],
+    "notification_outbox": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+    # Background jobs (app.jobs): claims by type and due time, lease expiry,
+    # and completed jobs expire after a week
+    "jobs": [
+        IndexModel([("type", ASCENDING), ("status", ASCENDING), ("run_at", ASCENDING)]),
+        IndexModel([("type", ASCENDING), ("status", ASCENDING), ("lease_until", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("run_at", ASCENDING)]),
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600),
+    ],
+    # Daily per-route analytics rollups (_id is "ORIGIN-DESTINATION-YYYY-MM-DD")
+    "analytics_route_daily": [
+        IndexModel([("day", ASCENDING), ("origin", ASCENDING), ("destination", ASCENDING)]),
+        IndexModel([("origin", ASCENDING), ("destination", ASCENDING), ("day", ASCENDING)]),
+    ],
+    "airlines": [
+        IndexModel([("code", ASCENDING)], unique=True),
+        IndexModel([("name", ASCENDING)]),
+        IndexModel([("country", ASCENDING)]),
+    ],
+    "airports": [
+        IndexModel([("code", ASCENDING)], unique=True),
+        IndexModel([("name", ASCENDING)]),
+        IndexModel([("city", ASCENDING)]),
+        IndexModel([("country", ASCENDING)]),
         # Text index for airport search
-        await db.airports.create_index([
-            ("name", "text"),
-            ("city", "text"),
-            ("code", "text")
-        ])
-        
-        logger.info("Airport indexes created successfully")
-        logger.info("All indexes created successfully")
-        
+        IndexModel([
+            ("name", TEXT),
+            ("city", TEXT),
+            ("code", TEXT)
+        ]),
+    ],
+}
+
+# Indexes replaced by one in INDEXES, dropped by the migration (python -m app.indexes)
+SUPERSEDED_INDEXES: Dict[str, List[str]] = {
+    # Replaced by the keyset page order index, which appends _id
+    "bookings": ["user_id_1_status_1_created_at_-1"],
+}
+
+
+async def _missing_indexes(db: AsyncIOMotorDatabase, collection: str, models: List[IndexModel]) -> List[IndexModel]:
+    """Return the index models of a collection that do not exist yet (matched by name)"""
+    existing = set()
+    async for index in db[collection].list_indexes():
+        existing.add(index["name"])
+    return [model for model in models if model.document["name"] not in existing]
+
+
+async def _ensure_collection_indexes(db: AsyncIOMotorDatabase, collection: str, models: List[IndexModel]) -> int:
+    """Create only the missing indexes of one collection in a single createIndexes command"""
+    missing = await _missing_indexes(db, collection, models)
+    if missing:
+        await db[collection].create_indexes(missing)
+        logger.info(f"Created {len(missing)} {collection} indexes")
+    else:
+        logger.info(f"{collection.capitalize()} indexes already up to date")
+    return len(missing)
+
+
+async def backfill_booking_created_at(db: AsyncIOMotorDatabase) -> int:
+    """Give legacy bookings without created_at their ObjectId creation time
+
+    Keyset pagination of user bookings orders and filters on created_at, so
+    bookings without it would sort last and never match a page cursor.
+    """
+    result = await db.bookings.update_many(
+        {"created_at": None},
+        [{"$set": {"created_at": {"$toDate": "$_id"}}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled created_at of {result.modified_count} bookings")
+    return result.modified_count
+
+
+async def create_indexes(db: AsyncIOMotorDatabase):
+    """Create all necessary indexes for optimal query performance
+
+    The build is idempotent: existing indexes are listed first and only the
+    missing ones are submitted, with all collections processed concurrently.
+    """
+    try:
+        created = await asyncio.gather(*(
+            _ensure_collection_indexes(db, collection, models)
+            for collection, models in INDEXES.items()
+        ))
+        logger.info(f"All indexes created successfully ({sum(created)} new)")
+
     except Exception as e:
         logger.error(f"Error creating indexes: {str(e)}")
         raise
+
+
+async def drop_superseded_indexes(db: AsyncIOMotorDatabase) -> int:
+    """Drop the indexes listed in SUPERSEDED_INDEXES that still exist"""
+    dropped = 0
+    for collection, names in SUPERSEDED_INDEXES.items():
+        existing = {index["name"] async for index in db[collection].list_indexes()}
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped superseded {collection} index {name}")
+                dropped += 1
+    return dropped
+
+
+async def migrate(db: AsyncIOMotorDatabase):
+    """Migration step: backfill data, build indexes, then drop the ones they replace
+
+    Run explicitly (python -m app.indexes) rather than on API startup, as the
+    backfill rewrites documents and dropping indexes changes query plans.
+    """
+    await backfill_booking_created_at(db)
+    await create_indexes(db)
+    await drop_superseded_indexes(db)
+
+
+def schedule_index_build(db: AsyncIOMotorDatabase, mode: str = INDEX_BUILD_MODE):
+    """
+    Start the index build according to the configured mode
+
+    Returns an awaitable for "blocking", a background task for "background"
+    and None for "skip".
+    """
+    if mode == "skip":
+        logger.info("Skipping index build (INDEX_BUILD_MODE=skip)")
+        return None
+    if mode == "background":
+        logger.info("Building indexes in the background")
+        task = asyncio.create_task(create_indexes(db))
+        task.add_done_callback(_log_background_failure)
+        return task
+    return create_indexes(db)
+
+
+def _log_background_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background index build failed: {task.exception()}")
+
+
+if __name__ == "__main__":
+    # Migration entry point: python -m app.indexes
+    from app.database import client, db
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(migrate(db))
+    finally:
+        client.close()
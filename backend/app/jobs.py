@@ -0,0 +1,381 @@
+import asyncio
+import argparse
+import random
+import socket
+import uuid
+from bson import ObjectId
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.tracing import SPAN_KIND_INTERNAL, start_trace
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+JOBS_COLLECTION = "jobs"
+
+# Run the job workers inside the API process as well. Off by default: the
+# per-type concurrency caps apply per process, so inline runners multiply
+# them by gunicorn workers and replicas; deploy the separate runner
+# (python -m app.jobs) instead and enable this only for single-process setups
+JOBS_INLINE = os.getenv("JOBS_INLINE", "false").lower() in ("1", "true", "yes")
+# A claimed job is owned for this long and renewed while its handler runs;
+# jobs of crashed workers are picked up again once their lease expires
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+# Idle workers poll for due jobs this often, backing off up to the max
+# interval while their queue stays empty
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1"))
+JOB_POLL_MAX_INTERVAL = float(os.getenv("JOB_POLL_MAX_INTERVAL_SECONDS", "10"))
+# Retry delay: base * 2^(attempt-1), capped, with +/-50% jitter
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE_SECONDS", "2"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "600"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class RetryJob(Exception):
+    """Raised by a handler to run the job again later (e.g. a payment still pending)"""
+
+    def __init__(self, detail: str = "retry requested", delay: Optional[float] = None):
+        super().__init__(detail)
+        self.delay = delay
+
+
+@dataclass
+class JobType:
+    handler: Callable[[AsyncIOMotorDatabase, Dict[str, Any]], Awaitable[None]]
+    concurrency: int
+    max_attempts: int
+
+
+# Registered handlers by job type (see job_handler)
+JOB_TYPES: Dict[str, JobType] = {}
+
+
+def job_handler(job_type: str, concurrency: int = 4, max_attempts: int = 5):
+    """
+    Register an async ``handler(db, payload)`` for a job type
+
+    Args:
+        job_type: Name stored in the job documents
+        concurrency: Jobs of this type run at once per runner process (env
+            JOBS_CONCURRENCY_<TYPE>); the total is this times the runner processes
+        max_attempts: Attempts before the job is marked failed
+    """
+    def register(handler):
+        limit = int(os.getenv(f"JOBS_CONCURRENCY_{job_type.upper()}", str(concurrency)))
+        JOB_TYPES[job_type] = JobType(handler, limit, max_attempts)
+        return handler
+    return register
+
+
+def new_job(job_type: str, payload: Dict[str, Any], run_at: Optional[datetime] = None, max_attempts: Optional[int] = None) -> Dict:
+    """Build a job document (insert several with one insert_many)"""
+    now = datetime.utcnow()
+    if max_attempts is None:
+        max_attempts = JOB_TYPES[job_type].max_attempts if job_type in JOB_TYPES else 5
+    return {
+        "type": job_type,
+        "payload": payload,
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts,
+        "run_at": run_at or now,
+        "lease_until": None,
+        "worker_id": None,
+        "last_error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def enqueue(db: AsyncIOMotorDatabase, job_type: str, payload: Dict[str, Any], run_at: Optional[datetime] = None) -> str:
+    """Queue one job; returns its id"""
+    result = await db[JOBS_COLLECTION].insert_one(new_job(job_type, payload, run_at))
+    return str(result.inserted_id)
+
+
+def backoff_delay(attempts: int, base: float = JOB_BACKOFF_BASE, cap: float = JOB_BACKOFF_MAX) -> float:
+    """Exponential backoff with jitter for the given number of attempts made"""
+    return min(cap, base * 2 ** max(attempts - 1, 0)) * random.uniform(0.5, 1.5)
+
+
+async def claim_job(db: AsyncIOMotorDatabase, job_type: str, worker_id: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[Dict]:
+    """
+    Atomically claim the oldest due job of a type
+
+    A job is due when queued with run_at in the past, or running with an
+    expired lease (its worker died). Claiming counts an attempt.
+    """
+    now = datetime.utcnow()
+    return await db[JOBS_COLLECTION].find_one_and_update(
+        {
+            "type": job_type,
+            "$or": [
+                {"status": QUEUED, "run_at": {"$lte": now}},
+                {"status": RUNNING, "lease_until": {"$lt": now}}
+            ]
+        },
+        {
+            "$set": {
+                "status": RUNNING,
+                "worker_id": worker_id,
+                "lease_until": now + timedelta(seconds=lease_seconds),
+                "started_at": now,
+                "updated_at": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+class JobRunner:
+    """
+    Pool of asyncio workers executing queued jobs
+
+    Each registered job type gets its own ``concurrency`` workers, so a slow
+    type cannot starve the others; the caps are per runner, not global.
+    Completion and retry updates are conditional on still owning the lease.
+    """
+
+    def __init__(self, db: AsyncIOMotorDatabase, job_types: Optional[Dict[str, JobType]] = None, lease_seconds: float = JOB_LEASE_SECONDS, poll_interval: float = JOB_POLL_INTERVAL, max_poll_interval: float = JOB_POLL_MAX_INTERVAL):
+        self.db = db
+        self.job_types = job_types if job_types is not None else JOB_TYPES
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(max_poll_interval, poll_interval)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self.counters: Dict[str, Dict[str, int]] = {
+            job_type: {"succeeded": 0, "retried": 0, "failed": 0, "running": 0} for job_type in self.job_types
+        }
+
+    def start(self):
+        for job_type, spec in self.job_types.items():
+            for _ in range(spec.concurrency):
+                self._tasks.append(asyncio.create_task(self._worker(job_type)))
+        logger.info(f"Started job runner {self.worker_id} ({len(self._tasks)} workers)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self):
+        self.start()
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            await self.stop()
+
+    async def _worker(self, job_type: str):
+        idle_interval = self.poll_interval
+        while True:
+            try:
+                job = await claim_job(self.db, job_type, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Error claiming {job_type} job: {str(e)}")
+                job = None
+            if job is None:
+                await asyncio.sleep(idle_interval * random.uniform(0.5, 1.5))
+                idle_interval = min(idle_interval * 2, self.max_poll_interval)
+                continue
+            idle_interval = self.poll_interval
+            try:
+                await self.run_job(job)
+            except Exception as e:
+                # The lease expires and another worker picks the job up again
+                logger.error(f"Error recording outcome of job {job['_id']}: {str(e)}")
+
+    async def _heartbeat(self, job_id):
+        """Extend the lease while the handler is still running"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.db[JOBS_COLLECTION].update_one(
+                    {"_id": job_id, "worker_id": self.worker_id, "status": RUNNING},
+                    {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                logger.warning(f"Error renewing lease of job {job_id}: {str(e)}")
+
+    async def run_job(self, job: Dict):
+        """Run a claimed job and record its outcome"""
+        job_type = job["type"]
+        counters = self.counters[job_type]
+        owned = {"_id": job["_id"], "worker_id": self.worker_id, "status": RUNNING}
+        heartbeat = asyncio.create_task(self._heartbeat(job["_id"]))
+        counters["running"] += 1
+        try:
+            with start_trace(f"job {job_type}", kind=SPAN_KIND_INTERNAL, **{"job.id": str(job["_id"]), "job.attempt": job["attempts"]}):
+                await self.job_types[job_type].handler(self.db, job["payload"])
+        except Exception as e:
+            await self._retry_or_fail(job, owned, e)
+        else:
+            now = datetime.utcnow()
+            await self.db[JOBS_COLLECTION].update_one(
+                owned,
+                {"$set": {"status": DONE, "finished_at": now, "updated_at": now, "lease_until": None}}
+            )
+            counters["succeeded"] += 1
+        finally:
+            counters["running"] -= 1
+            heartbeat.cancel()
+
+    async def _retry_or_fail(self, job: Dict, owned: Dict, error: Exception):
+        now = datetime.utcnow()
+        counters = self.counters[job["type"]]
+        if job["attempts"] >= job["max_attempts"]:
+            logger.error(f"Job {job['_id']} ({job['type']}) failed after {job['attempts']} attempts: {str(error)}")
+            await self.db[JOBS_COLLECTION].update_one(
+                owned,
+                {"$set": {"status": FAILED, "failed_at": now, "updated_at": now, "lease_until": None, "last_error": str(error)}}
+            )
+            counters["failed"] += 1
+            return
+
+        delay = error.delay if isinstance(error, RetryJob) and error.delay is not None else backoff_delay(job["attempts"])
+        log = logger.info if isinstance(error, RetryJob) else logger.warning
+        log(f"Retrying job {job['_id']} ({job['type']}) in {delay:.1f}s after attempt {job['attempts']}: {str(error)}")
+        await self.db[JOBS_COLLECTION].update_one(
+            owned,
+            {"$set": {
+                "status": QUEUED,
+                "run_at": now + timedelta(seconds=delay),
+                "updated_at": now,
+                "lease_until": None,
+                "last_error": str(error)
+            }}
+        )
+        counters["retried"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-type counters of this process"""
+        return {job_type: dict(counters) for job_type, counters in self.counters.items()}
+
+
+async def queue_stats(db: AsyncIOMotorDatabase) -> Dict[str, Dict[str, Any]]:
+    """
+    Queue depth and lag per job type
+
+    ``ready`` jobs are due now, ``scheduled`` are waiting for a retry time,
+    and ``lag_seconds`` is how long the oldest ready job has been due.
+    """
+    now = datetime.utcnow()
+    pipeline = [
+        {"$match": {"status": {"$in": [QUEUED, RUNNING, FAILED]}}},
+        {"$group": {
+            "_id": {"type": "$type", "status": "$status", "due": {"$lte": ["$run_at", now]}},
+            "count": {"$sum": 1},
+            "oldest_run_at": {"$min": "$run_at"}
+        }}
+    ]
+    stats: Dict[str, Dict[str, Any]] = {}
+    async for group in db[JOBS_COLLECTION].aggregate(pipeline):
+        key = group["_id"]
+        entry = stats.setdefault(key["type"], {"ready": 0, "scheduled": 0, "running": 0, "failed": 0, "lag_seconds": 0.0})
+        if key["status"] == QUEUED and key["due"]:
+            entry["ready"] += group["count"]
+            entry["lag_seconds"] = max(entry["lag_seconds"], (now - group["oldest_run_at"]).total_seconds())
+        elif key["status"] == QUEUED:
+            entry["scheduled"] += group["count"]
+        else:
+            entry[key["status"]] += group["count"]
+    return stats
+
+
+# Post-booking side effects, queued by create_booking. Delivery is at least
+# once, so handlers must tolerate running again after a lost lease.
+
+def _object_id(value: Any) -> Optional[ObjectId]:
+    return ObjectId(value) if isinstance(value, str) and ObjectId.is_valid(value) else None
+
+
+@job_handler("booking_confirmation_email", concurrency=4, max_attempts=8)
+async def send_booking_confirmation(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    """Queue the confirmation email in the notification outbox (idempotent per booking)"""
+    from app.price_alerts import OUTBOX_COLLECTION
+
+    booking = await db.bookings.find_one({"_id": _object_id(payload["booking_id"])})
+    if booking is None:
+        logger.warning(f"Booking {payload['booking_id']} no longer exists, skipping confirmation")
+        return
+    user_id = _object_id(booking.get("user_id"))
+    user = await db.users.find_one({"_id": user_id}, {"email": 1}) if user_id else None
+    await db[OUTBOX_COLLECTION].update_one(
+        {"_id": f"booking_confirmation:{payload['booking_id']}"},
+        {"$setOnInsert": {
+            "type": "booking_confirmation",
+            "user_id": booking.get("user_id"),
+            "email": user.get("email") if user else None,
+            "booking_id": payload["booking_id"],
+            "booking_reference": booking.get("booking_reference"),
+            "status": "pending",
+            "created_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+
+
+@job_handler("payment_status_poll", concurrency=2, max_attempts=12)
+async def poll_payment_status(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    """Confirm a pending booking once its payment completes; retried while the payment is pending"""
+    from app.analytics import update_booking_rollups
+
+    payment = await db.payments.find_one({"booking_id": payload["booking_id"]}, {"status": 1})
+    if payment is None or payment["status"] == "pending":
+        raise RetryJob("payment pending")
+    if payment["status"] != "completed":
+        logger.info(f"Payment for booking {payload['booking_id']} is {payment['status']}, not confirming")
+        return
+
+    before = await db.bookings.find_one_and_update(
+        {"_id": _object_id(payload["booking_id"]), "status": "pending"},
+        {"$set": {"status": "confirmed", "payment_id": str(payment["_id"]), "updated_at": datetime.utcnow()}},
+        projection={"flight_id": 1, "status": 1, "seats": 1}
+    )
+    if before is not None:
+        await update_booking_rollups(db, before, {**before, "status": "confirmed"})
+
+
+@job_handler("booking_analytics", concurrency=2, max_attempts=5)
+async def record_new_booking(db: AsyncIOMotorDatabase, payload: Dict[str, Any]):
+    """Add a new booking to the analytics rollups (once, however often the job runs)"""
+    from app.analytics import update_booking_rollups
+
+    # Only the run that flips rollup_counted adds the booking, so a retried
+    # or re-leased job does not count it twice
+    booking = await db.bookings.find_one_and_update(
+        {"_id": _object_id(payload["booking_id"]), "rollup_counted": {"$ne": True}},
+        {"$set": {"rollup_counted": True}},
+        projection={"flight_id": 1, "status": 1, "seats": 1}
+    )
+    if booking is not None:
+        await update_booking_rollups(db, None, booking)
+
+
+# Side effects of a new booking, in the order they are queued
+BOOKING_CREATED_JOBS = ("booking_analytics", "booking_confirmation_email", "payment_status_poll")
+
+
+if __name__ == "__main__":
+    # Dedicated worker entry point: python -m app.jobs
+    from app.database import client, db
+
+    parser = argparse.ArgumentParser(description="Run the background job workers")
+    parser.add_argument("--lease", type=float, default=JOB_LEASE_SECONDS, help="Job lease in seconds")
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL, help="Idle poll interval in seconds")
+    parser.add_argument("--max-poll-interval", type=float, default=JOB_POLL_MAX_INTERVAL, help="Longest idle poll interval in seconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(JobRunner(db, lease_seconds=args.lease, poll_interval=args.poll_interval, max_poll_interval=args.max_poll_interval).run_forever())
+    finally:
+        client.close()
@@ -0,0 +1,271 @@
+import asyncio
+import argparse
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Saturation: the offered rate at which any of these is first exceeded
+SATURATION_ERROR_RATE = 0.01
+SATURATION_THROUGHPUT_RATIO = 0.9  # Completed sessions / arrivals
+
+
+class StepFailed(Exception):
+    """A funnel step returned an unusable response; the session stops there"""
+
+
+@dataclass
+class Session:
+    """State one simulated user carries through a scenario"""
+    http: httpx.AsyncClient
+    routes: List[Tuple[str, str]]
+    think_time: float
+    recorder: "Recorder"
+    flight: Optional[Dict] = None
+    booking: Optional[Dict] = None
+
+    async def think(self):
+        if self.think_time:
+            await asyncio.sleep(random.expovariate(1 / self.think_time))
+
+    async def request(self, step: str, method: str, url: str, ok: Tuple[int, ...] = (200, 201), **kwargs) -> httpx.Response:
+        """Time one request under ``step``; statuses outside ``ok`` count as errors"""
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(step, time.perf_counter() - started, error=type(e).__name__)
+            raise StepFailed(step)
+        error = None if response.status_code in ok else str(response.status_code)
+        self.recorder.record(step, time.perf_counter() - started, error=error)
+        if error:
+            raise StepFailed(step)
+        return response
+
+
+# Funnel steps
+
+async def search(session: Session):
+    origin, destination = random.choice(session.routes)
+    departure = (datetime.utcnow() + timedelta(days=random.randint(1, 60))).strftime("%Y-%m-%d")
+    response = await session.request(
+        "search", "GET", "/search/flights",
+        params={"origin": origin, "destination": destination, "departure_date": departure, "flex_days": 3, "max_results": 20}
+    )
+    # Flexible-date searches are grouped by local day
+    results = [r for day in response.json()["days"] for r in day["results"]]
+    direct = [r for r in results if r.get("is_direct")]
+    session.flight = random.choice(direct)["segments"][0] if direct else None
+
+
+async def flight_detail(session: Session):
+    if session.flight is None:
+        return
+    await session.request("flight_detail", "GET", f"/flights/{session.flight['_id']}")
+
+
+async def book(session: Session):
+    if session.flight is None:
+        return
+    seats = random.choice([1, 1, 1, 2, 3])
+    response = await session.request("booking", "POST", "/bookings/", ok=(200, 201, 409), json={
+        "booking_reference": uuid.uuid4().hex[:8].upper(),
+        "user_id": "load-test",
+        "flight_id": session.flight["_id"],
+        "passenger_ids": [f"load-test-{i}" for i in range(seats)],
+        "seats": seats,
+        "total_price": round(session.flight["price"] * seats, 2),
+    })
+    session.booking = response.json() if response.status_code != 409 else None
+
+
+async def pay(session: Session):
+    """Record a payment from the fake gateway (no external call)"""
+    if session.booking is None:
+        return
+    await session.request("payment", "POST", "/payments/", json={
+        "booking_id": session.booking["id"],
+        "amount": session.booking["total_price"],
+        "payment_method": "fake",
+        "status": "completed",
+        "transaction_id": f"fake_{uuid.uuid4().hex}",
+    })
+
+
+@dataclass
+class Scenario:
+    name: str
+    weight: float
+    steps: List[Callable[[Session], Awaitable[None]]]
+
+
+# Most visitors only search; a few go through to payment
+SCENARIOS = [
+    Scenario("browse", 60, [search]),
+    Scenario("compare", 25, [search, flight_detail, search, flight_detail]),
+    Scenario("purchase", 15, [search, flight_detail, book, pay]),
+]
+
+
+@dataclass
+class Recorder:
+    """Latencies and errors per step, plus session outcomes"""
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    sessions: Dict[str, int] = field(default_factory=lambda: {"started": 0, "completed": 0, "failed": 0, "dropped": 0})
+
+    def record(self, step: str, seconds: float, error: Optional[str] = None):
+        self.latencies.setdefault(step, []).append(seconds)
+        if error:
+            step_errors = self.errors.setdefault(step, {})
+            step_errors[error] = step_errors.get(error, 0) + 1
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per step: request count, error rate and latency percentiles in ms"""
+        result = {}
+        for step, values in self.latencies.items():
+            ms = np.array(values) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            errors = sum(self.errors.get(step, {}).values())
+            result[step] = {
+                "requests": len(values),
+                "error_rate": errors / len(values),
+                "errors": dict(self.errors.get(step, {})),
+                "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "max_ms": float(ms.max()),
+            }
+        return result
+
+
+async def run_session(scenario: Scenario, session: Session):
+    recorder = session.recorder
+    recorder.sessions["started"] += 1
+    try:
+        for i, step in enumerate(scenario.steps):
+            if i:
+                await session.think()
+            await step(session)
+        recorder.sessions["completed"] += 1
+    except StepFailed:
+        recorder.sessions["failed"] += 1
+
+
+async def run_stage(
+    base_url: str,
+    routes: List[Tuple[str, str]],
+    rate: float,
+    duration: float,
+    think_time: float,
+    max_sessions: int,
+    transport: Optional[httpx.AsyncBaseTransport] = None
+) -> Dict:
+    """
+    Open-loop load at ``rate`` new sessions per second for ``duration`` seconds
+
+    Arrivals are a Poisson process independent of response times, so a slow
+    server accumulates concurrent sessions instead of slowing the load down
+    (which a closed loop of N clients would do, hiding the queueing).
+    Arrivals beyond ``max_sessions`` in flight are dropped and counted.
+    ``transport`` replaces the network (e.g. httpx.ASGITransport in tests).
+    """
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=max_sessions, max_keepalive_connections=max_sessions)
+    weights = [s.weight for s in SCENARIOS]
+    tasks = set()
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30, transport=transport) as http:
+        started = time.perf_counter()
+        next_arrival = started
+        while next_arrival < started + duration:
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(tasks) >= max_sessions:
+                recorder.sessions["dropped"] += 1
+            else:
+                scenario = random.choices(SCENARIOS, weights)[0]
+                task = asyncio.create_task(run_session(scenario, Session(http, routes, think_time, recorder)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            next_arrival += random.expovariate(rate)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    sessions = recorder.sessions
+    arrivals = sessions["started"] + sessions["dropped"]
+    requests = sum(len(v) for v in recorder.latencies.values())
+    errors = sum(sum(e.values()) for e in recorder.errors.values())
+    return {
+        "rate": rate,
+        "sessions": dict(sessions),
+        "completed_ratio": sessions["completed"] / arrivals if arrivals else 0.0,
+        "requests_per_second": requests / elapsed,
+        "error_rate": errors / requests if requests else 0.0,
+        "steps": recorder.summary(),
+    }
+
+
+def is_saturated(stage: Dict, slo_ms: float) -> bool:
+    """Throughput stopped tracking the offered rate, errors rose, or a step's p95 broke the SLO"""
+    return (
+        stage["completed_ratio"] < SATURATION_THROUGHPUT_RATIO
+        or stage["error_rate"] > SATURATION_ERROR_RATE
+        or any(step["p95_ms"] > slo_ms for step in stage["steps"].values())
+    )
+
+
+async def load_routes(base_url: str, limit: int = 20) -> List[Tuple[str, str]]:
+    """Routes with bookable flights, so searches find something to book"""
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        response = await http.get("/search/popular-routes", params={"limit": limit})
+        response.raise_for_status()
+        return [(r["origin"], r["destination"]) for r in response.json()]
+
+
+def print_stage(stage: Dict):
+    s = stage["sessions"]
+    print(
+        f"\nrate {stage['rate']:g}/s: {stage['requests_per_second']:.1f} req/s, "
+        f"sessions {s['completed']} ok / {s['failed']} failed / {s['dropped']} dropped, "
+        f"errors {stage['error_rate'] * 100:.2f}%"
+    )
+    print(f"  {'step':<14} {'requests':>8} {'err %':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, step in stage["steps"].items():
+        print(
+            f"  {name:<14} {step['requests']:>8} {step['error_rate'] * 100:>6.2f} "
+            f"{step['p50_ms']:>8.1f} {step['p95_ms']:>8.1f} {step['p99_ms']:>8.1f} {step['max_ms']:>8.1f}"
+        )
+
+
+async def main(args):
+    routes = await load_routes(args.base_url)
+    if not routes:
+        raise SystemExit("No bookable routes; seed the database first (python -m app.seed_data)")
+    saturation = None
+    for rate in args.rates:
+        stage = await run_stage(args.base_url, routes, rate, args.duration, args.think_time, args.max_sessions)
+        print_stage(stage)
+        if is_saturated(stage, args.slo_ms):
+            saturation = rate
+            break
+    if saturation is None:
+        print(f"\nNot saturated up to {args.rates[-1]:g} sessions/s")
+    else:
+        print(f"\nSaturated at {saturation:g} sessions/s (p95 SLO {args.slo_ms:g} ms)")
+
+
+if __name__ == "__main__":
+    # Against a running app with a local Mongo and seeded data:
+    # python -m app.load_test --base-url http://127.0.0.1:8000 --rates 5 10 20 40 80
+    parser = argparse.ArgumentParser(description="Open-loop load test of the search-to-payment funnel")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="App under test")
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 40, 80, 160], help="New sessions per second, one stage each")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of arrivals per stage")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds between a session's steps")
+    parser.add_argument("--max-sessions", type=int, default=1000, help="Concurrent sessions before arrivals are dropped")
+    parser.add_argument("--slo-ms", type=float, default=500, help="p95 latency per step counted as saturated")
+    asyncio.run(main(parser.parse_args()))
@@ -8,10 +8,23 @@ from app.routes import (
     payments,
     search,
     airlines,
-    airports
+    airports,
+    price_watches,
+    analytics,
+    exports,
+    jobs
 )
-from app.database import db
-from app.indexes import create_indexes
+from app.admission import ADMISSION_CONTROL, AdmissionControlMiddleware
+from app.compression import COMPRESSION_ENABLED, CompressionMiddleware
+from app.deadlines import REQUEST_DEADLINES, DeadlineMiddleware
+from app.etags import ETAGS_ENABLED, ETagMiddleware
+from app.tracing import TracingMiddleware, get_exporter, setup_tracing
+from app.database import client, db
+from app.indexes import schedule_index_build
+from app.jobs import JOBS_INLINE, JobRunner
+from app.utils.checkout import check_booking_transactions
+from app.utils.flight_snapshot import FLIGHT_SNAPSHOT_ENABLED, refresh_flight_snapshot
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,15 +35,54 @@ async def lifespan(app: FastAPI):
     """Initialize app on startup and cleanup on shutdown"""
     # Startup
     logger.info("Creating database indexes...")
-    await create_indexes(db)
+    index_build = schedule_index_build(db)
+    if index_build is not None and not isinstance(index_build, asyncio.Task):
+        await index_build
+    # Fall back to separate booking writes on a standalone server
+    await check_booking_transactions(client)
+    # Map the flight snapshot file if not preloaded and keep applying deltas
+    snapshot_refresh = asyncio.create_task(refresh_flight_snapshot(db)) if FLIGHT_SNAPSHOT_ENABLED else None
+    # Post-booking side effects from the job queue
+    app.state.job_runner = JobRunner(db) if JOBS_INLINE else None
+    if app.state.job_runner is not None:
+        app.state.job_runner.start()
     logger.info("Application startup complete")
     yield
     # Shutdown
+    if isinstance(index_build, asyncio.Task) and not index_build.done():
+        index_build.cancel()
+    if snapshot_refresh is not None:
+        snapshot_refresh.cancel()
+    if app.state.job_runner is not None:
+        await app.state.job_runner.stop()
+    if get_exporter() is not None:
+        get_exporter().flush()
     logger.info("Application shutdown")
 
 
 app = FastAPI(title="Flight Booking API", lifespan=lifespan)
 
+# Middleware added last runs first:
+# tracing -> deadlines -> admission -> compression -> ETags -> routes
+# (ETags hash the uncompressed body, so they sit inside compression)
+if ETAGS_ENABLED:
+    app.add_middleware(ETagMiddleware)
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Bound concurrent connection searches and keep a lane for bookings/payments
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# Searches get a deadline (maxTimeMS) that includes admission queueing, and
+# are cancelled with their Mongo operations when the client disconnects
+if REQUEST_DEADLINES:
+    app.add_middleware(DeadlineMiddleware)
+
+# Outermost, so request spans include admission queueing time
+if setup_tracing() is not None:
+    app.add_middleware(TracingMiddleware)
+
 # Include all routers
 app.include_router(users.router)
 app.include_router(flights.router)
@@ -40,3 +92,7 @@ app.include_router(payments.router)
 app.include_router(search.router)
 app.include_router(airlines.router)
 app.include_router(airports.router)
+app.include_router(price_watches.router)
+app.include_router(analytics.router)
+app.include_router(exports.router)
+app.include_router(jobs.router)
@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field, EmailStr
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
+from app.utils.batch import BATCH_GET_MAX_IDS
 
 
 class BookingStatus(str, Enum):
@@ -83,6 +84,7 @@ class Flight(BaseModel):
     total_seats: int = Field(gt=0)
     aircraft_type: Optional[str] = None
     status: FlightStatus = FlightStatus.SCHEDULED
+    updated_at: Optional[datetime] = None
 
 
 class Booking(BaseModel):
@@ -108,9 +110,35 @@ class Payment(BaseModel):
     transaction_id: Optional[str] = None
     created_at: Optional[datetime] = None
 
+class CheckoutPayment(BaseModel):
+    payment_method: str
+    status: PaymentStatus = PaymentStatus.PENDING
+    transaction_id: Optional[str] = None
+
+class CheckoutRequest(BaseModel):
+    """A booking and its payment, committed together"""
+    booking: Booking
+    payment: CheckoutPayment
+
+class PriceWatch(BaseModel):
+    id: Optional[str] = None
+    user_id: str
+    origin: str  # Airport code
+    destination: str  # Airport code
+    departure_date: str = Field(..., pattern=r"^\d{4}-\d{2}-\d{2}$")  # Local date at origin
+    max_price: float = Field(gt=0)
+    active: bool = True
+    last_notified_price: Optional[float] = None
+    created_at: Optional[datetime] = None
+
+class BatchGetRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=BATCH_GET_MAX_IDS)
+
 class StripePayment(BaseModel):
+    booking_id: str
     payment_method_id: str
-    amount: int
+    amount: int  # Cents
 
 class PayPalPayment(BaseModel):
+    booking_id: str
     order_id: str
\ No newline at end of file
@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Iterable, List
+from app.utils.airport_timezones import ensure_airport_timezones, local_date
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+WATCHES_COLLECTION = "price_watches"
+OUTBOX_COLLECTION = "notification_outbox"
+
+# Evaluate watches from the flight write routes; disable when the change
+# stream watcher (python -m app.price_alerts) is deployed instead
+PRICE_ALERTS_INLINE = os.getenv("PRICE_ALERTS_INLINE", "true").lower() in ("1", "true", "yes")
+
+# Change stream batching
+WATCH_BATCH_SIZE = int(os.getenv("PRICE_ALERTS_BATCH_SIZE", "500"))
+WATCH_BATCH_WINDOW = float(os.getenv("PRICE_ALERTS_BATCH_WINDOW_MS", "500")) / 1000
+
+# Flight fields whose change can make a watch match
+WATCHED_FIELDS = ("price", "available_seats", "status", "departure_time")
+
+
+def date_bucket(flight: Dict) -> str:
+    """Watch bucket of a flight: its departure date in the origin's local time"""
+    return local_date(flight["origin"], flight["departure_time"]).isoformat()
+
+
+def _is_bookable(flight: Dict) -> bool:
+    return flight.get("status") != "cancelled" and flight.get("available_seats", 0) > 0
+
+
+async def evaluate_flight_changes(db: AsyncIOMotorDatabase, flights: Iterable[Dict]) -> int:
+    """
+    Match changed flights against active price watches and queue notifications
+
+    Each flight costs one indexed range query on (origin, destination,
+    date_bucket, max_price) that only returns watches it satisfies. Watches
+    already notified at this price or lower are skipped. All matches of the
+    batch are written to the outbox with one insert_many.
+
+    Args:
+        db: Database instance
+        flights: Created or updated flight documents (with _id)
+
+    Returns:
+        Number of notifications queued
+    """
+    await ensure_airport_timezones(db)
+    best_price: Dict = {}
+    now = datetime.utcnow()
+
+    for flight in flights:
+        if not _is_bookable(flight):
+            continue
+        price = flight["price"]
+        query = {
+            "origin": flight["origin"],
+            "destination": flight["destination"],
+            "date_bucket": date_bucket(flight),
+            "max_price": {"$gte": price},
+            "active": True,
+            "$or": [
+                {"last_notified_price": None},
+                {"last_notified_price": {"$gt": price}}
+            ]
+        }
+        async for watch in db[WATCHES_COLLECTION].find(query, {"user_id": 1}):
+            # Within a batch only the cheapest matching flight is notified
+            if watch["_id"] in best_price and best_price[watch["_id"]]["price"] <= price:
+                continue
+            best_price[watch["_id"]] = {
+                "watch_id": str(watch["_id"]),
+                "user_id": watch["user_id"],
+                "flight_id": str(flight["_id"]),
+                "origin": flight["origin"],
+                "destination": flight["destination"],
+                "departure_time": flight["departure_time"],
+                "price": price,
+                "status": "pending",
+                "created_at": now
+            }
+
+    notifications: List[Dict] = list(best_price.values())
+    if not notifications:
+        return 0
+
+    await db[OUTBOX_COLLECTION].insert_many(notifications)
+    # Group watches by notified price so the watch updates are batched too
+    by_price: Dict[float, List] = {}
+    for watch_id, notification in best_price.items():
+        by_price.setdefault(notification["price"], []).append(watch_id)
+    for price, watch_ids in by_price.items():
+        await db[WATCHES_COLLECTION].update_many(
+            {"_id": {"$in": watch_ids}},
+            {"$set": {"last_notified_price": price, "last_notified_at": now}}
+        )
+
+    logger.info(f"Queued {len(notifications)} price alert notifications")
+    return len(notifications)
+
+
+async def evaluate_flight_change(db: AsyncIOMotorDatabase, flight: Dict):
+    """Evaluate a single flight write (used as a background task by the flight routes)"""
+    try:
+        await evaluate_flight_changes(db, [flight])
+    except Exception as e:
+        logger.error(f"Error evaluating price watches for flight {flight.get('_id')}: {str(e)}")
+
+
+async def watch_flight_changes(db: AsyncIOMotorDatabase):
+    """
+    Evaluate price watches from the flights change stream
+
+    Events are collected for up to WATCH_BATCH_WINDOW or WATCH_BATCH_SIZE
+    events and evaluated together. Requires a replica set.
+    """
+    pipeline = [
+        {"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}
+    ]
+    async with db.flights.watch(pipeline, full_document="updateLookup") as stream:
+        logger.info("Watching flight changes for price alerts")
+        while stream.alive:
+            batch: Dict = {}
+            deadline = asyncio.get_running_loop().time() + WATCH_BATCH_WINDOW
+            while len(batch) < WATCH_BATCH_SIZE:
+                change = await stream.try_next()
+                if change is not None and change.get("fullDocument"):
+                    updated = change.get("updateDescription", {}).get("updatedFields")
+                    if updated is None or any(field in updated for field in WATCHED_FIELDS):
+                        flight = change["fullDocument"]
+                        batch[flight["_id"]] = flight
+                if change is None and asyncio.get_running_loop().time() >= deadline:
+                    break
+            if batch:
+                await evaluate_flight_changes(db, batch.values())
+
+
+if __name__ == "__main__":
+    # Change stream entry point: python -m app.price_alerts
+    from app.database import client, db
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(watch_flight_changes(db))
+    finally:
+        client.close()
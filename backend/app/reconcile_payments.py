@@ -0,0 +1,171 @@
+import asyncio
+import argparse
+import time
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from typing import Dict, List, Optional
+from app.analytics import record_payment_change
+from app.utils.payment_gateways import GATEWAYS, GatewayRecord
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DISCREPANCIES_COLLECTION = "payment_discrepancies"
+# Gateway payments created in this window are reconciled by default
+RECONCILE_LOOKBACK_HOURS = int(os.getenv("RECONCILE_LOOKBACK_HOURS", "48"))
+
+# Local fields needed to compare a payment and update its rollups
+_PAYMENT_FIELDS = {"transaction_id": 1, "status": 1, "amount": 1, "booking_id": 1}
+
+
+def _new_report() -> Dict[str, float]:
+    return {
+        "checked": 0, "matched": 0, "status_updated": 0, "refund_mismatch": 0,
+        "conflicts": 0, "amount_mismatch": 0, "missing_local": 0, "pages": 0
+    }
+
+
+async def reconcile_page(db: AsyncIOMotorDatabase, records: List[GatewayRecord], report: Dict[str, float]):
+    """
+    Compare one page of gateway records with local payments and fix them
+
+    Local payments are fetched with one ``$in`` query on the transaction_id
+    index and joined in memory. Status mismatches are written back
+    concurrently, each update conditional on the status that was read so
+    concurrent writes are not overwritten; only updates that matched move the
+    revenue rollups. Gateway records report full refunds, so a refund made at
+    the gateway is applied here; a payment refunded locally but not at the
+    gateway is never reset to completed. That, amount mismatches and payments
+    unknown locally are recorded for review rather than changed.
+    """
+    now = datetime.utcnow()
+    local: Dict[str, Dict] = {}
+    cursor = db.payments.find({"transaction_id": {"$in": [r.transaction_id for r in records]}}, _PAYMENT_FIELDS)
+    async for payment in cursor:
+        local[payment["transaction_id"]] = payment
+
+    changed, discrepancies = [], []
+    for record in records:
+        report["checked"] += 1
+        payment = local.get(record.transaction_id)
+        if payment is None:
+            report["missing_local"] += 1
+            discrepancies.append(UpdateOne(
+                {"_id": record.transaction_id},
+                {"$set": {"issue": "missing_local", "gateway_status": record.status, "gateway_amount": record.amount, "seen_at": now}},
+                upsert=True
+            ))
+            continue
+
+        if abs(payment.get("amount", 0) - record.amount) > 0.005:
+            report["amount_mismatch"] += 1
+            discrepancies.append(UpdateOne(
+                {"_id": record.transaction_id},
+                {"$set": {
+                    "issue": "amount_mismatch",
+                    "payment_id": str(payment["_id"]),
+                    "local_amount": payment.get("amount"),
+                    "gateway_amount": record.amount,
+                    "seen_at": now
+                }},
+                upsert=True
+            ))
+
+        if payment.get("status") == record.status:
+            report["matched"] += 1
+            continue
+        if payment.get("status") == "refunded":
+            report["refund_mismatch"] += 1
+            discrepancies.append(UpdateOne(
+                {"_id": record.transaction_id},
+                {"$set": {
+                    "issue": "refund_mismatch",
+                    "payment_id": str(payment["_id"]),
+                    "gateway_status": record.status,
+                    "seen_at": now
+                }},
+                upsert=True
+            ))
+            continue
+        changed.append((payment, {**payment, "status": record.status}))
+
+    async def update_status(before: Dict, after: Dict):
+        result = await db.payments.update_one(
+            {"_id": before["_id"], "status": before.get("status")},
+            {"$set": {"status": after["status"], "updated_at": now, "reconciled_at": now}}
+        )
+        if not result.matched_count:
+            # Changed concurrently since it was read; the next run compares again
+            report["conflicts"] += 1
+            return
+        report["status_updated"] += 1
+        await record_payment_change(db, before, after)
+
+    if changed:
+        await asyncio.gather(*(update_status(before, after) for before, after in changed))
+    if discrepancies:
+        await db[DISCREPANCIES_COLLECTION].bulk_write(discrepancies, ordered=False)
+    report["pages"] += 1
+
+
+async def reconcile_payments(
+    db: AsyncIOMotorDatabase,
+    gateway,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Dict[str, float]:
+    """
+    Reconcile local payments with everything the gateway lists in a window
+
+    Args:
+        db: Database instance
+        gateway: Gateway with a paged ``list_payments(since, until)``
+        since: Oldest gateway creation time (default: RECONCILE_LOOKBACK_HOURS ago)
+        until: Exclusive newest creation time (default: now)
+
+    Returns:
+        Counters plus elapsed seconds and milliseconds per 1000 payments
+    """
+    if since is None:
+        since = datetime.utcnow() - timedelta(hours=RECONCILE_LOOKBACK_HOURS)
+    report = _new_report()
+    started = time.perf_counter()
+    async for records in gateway.list_payments(since, until):
+        if records:
+            await reconcile_page(db, records, report)
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["ms_per_1000"] = round(elapsed * 1000 * 1000 / report["checked"], 1) if report["checked"] else 0.0
+    logger.info(
+        f"Reconciled {report['checked']} {gateway.name} payments in {report['pages']} pages "
+        f"({report['ms_per_1000']} ms per 1000): {report['status_updated']} updated, "
+        f"{report['conflicts']} changed concurrently, {report['refund_mismatch']} refunded only locally, "
+        f"{report['amount_mismatch']} amount mismatches, {report['missing_local']} missing locally"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    # Scheduled run: python -m app.reconcile_payments --gateway stripe
+    from app.database import client, db
+
+    parser = argparse.ArgumentParser(description="Reconcile payments with gateway records")
+    parser.add_argument("--gateway", choices=["stripe", "paypal"], required=True, help="Gateway to list payments from")
+    parser.add_argument("--lookback-hours", type=int, default=RECONCILE_LOOKBACK_HOURS, help="Gateway payments created in this window")
+    args = parser.parse_args()
+
+    try:
+        # Credentials come from STRIPE_SECRET_KEY / PAYPAL_CLIENT_ID and PAYPAL_CLIENT_SECRET
+        gateway = GATEWAYS[args.gateway]()
+    except ValueError as e:
+        parser.error(str(e))
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        since = datetime.utcnow() - timedelta(hours=args.lookback_hours)
+        asyncio.run(reconcile_payments(db, gateway, since))
+    finally:
+        client.close()
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, HTTPException, status
 from app.models import Airline
+from app.database import db
+from app.utils.batch import parse_object_id
+from app.utils.reference_data import reference_data
 from typing import List
 
 router = APIRouter(prefix="/airlines", tags=["airlines"])
@@ -20,19 +23,33 @@ async def get_airline(airline_id: str):
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=Airline)
 async def create_airline(airline: Airline):
     """Create a new airline (admin only)"""
-    pass
+    result = await db.airlines.insert_one(airline.dict(exclude={"id"}))
+    airline.id = str(result.inserted_id)
+    await reference_data.refresh(db)
+    return airline
 
 
 @router.put("/{airline_id}", response_model=Airline)
 async def update_airline(airline_id: str, airline: Airline):
     """Update airline information (admin only)"""
-    pass
+    result = await db.airlines.update_one(
+        {"_id": parse_object_id(airline_id, "Airline not found")},
+        {"$set": airline.dict(exclude={"id"})}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Airline not found")
+    airline.id = airline_id
+    await reference_data.refresh(db)
+    return airline
 
 
 @router.delete("/{airline_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_airline(airline_id: str):
     """Delete an airline (admin only)"""
-    pass
+    result = await db.airlines.delete_one({"_id": parse_object_id(airline_id, "Airline not found")})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Airline not found")
+    await reference_data.refresh(db)
 
 
 @router.get("/{airline_id}/flights")
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, HTTPException, status
 from app.models import Airport
+from app.database import db
+from app.utils.batch import parse_object_id
+from app.utils.reference_data import reference_data
 from typing import List
 
 router = APIRouter(prefix="/airports", tags=["airports"])
@@ -26,19 +29,33 @@ async def get_airport_by_code(code: str):
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=Airport)
 async def create_airport(airport: Airport):
     """Create a new airport (admin only)"""
-    pass
+    result = await db.airports.insert_one(airport.dict(exclude={"id"}))
+    airport.id = str(result.inserted_id)
+    await reference_data.refresh(db)
+    return airport
 
 
 @router.put("/{airport_id}", response_model=Airport)
 async def update_airport(airport_id: str, airport: Airport):
     """Update airport information (admin only)"""
-    pass
+    result = await db.airports.update_one(
+        {"_id": parse_object_id(airport_id, "Airport not found")},
+        {"$set": airport.dict(exclude={"id"})}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Airport not found")
+    airport.id = airport_id
+    await reference_data.refresh(db)
+    return airport
 
 
 @router.delete("/{airport_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_airport(airport_id: str):
     """Delete an airport (admin only)"""
-    pass
+    result = await db.airports.delete_one({"_id": parse_object_id(airport_id, "Airport not found")})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Airport not found")
+    await reference_data.refresh(db)
 
 
 @router.get("/search/{query}")
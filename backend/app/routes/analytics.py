@@ -0,0 +1,88 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.database import db
+from app.analytics import ROLLUP_COLLECTION
+from pymongo import ReadPreference
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+# Rollups are small and tolerate replication lag; keep these reads off the primary
+rollups = db.get_collection(ROLLUP_COLLECTION, read_preference=ReadPreference.SECONDARY_PREFERRED)
+
+DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+
+async def _rollups(
+    start: Optional[str],
+    end: Optional[str],
+    origin: Optional[str],
+    destination: Optional[str],
+    limit: int
+) -> List[Dict[str, Any]]:
+    """Load rollup rows of a day range (default: the last 30 days), optionally for one route"""
+    try:
+        # DATE_PATTERN only checks the shape; this rejects days like 2026-02-30
+        end_day = date.fromisoformat(end) if end else date.today()
+        start_day = date.fromisoformat(start) if start else end_day - timedelta(days=30)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {str(e)}")
+    if start_day > end_day:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    start, end = start_day.isoformat(), end_day.isoformat()
+
+    query: Dict[str, Any] = {"day": {"$gte": start, "$lte": end}}
+    if origin:
+        query["origin"] = origin.upper()
+    if destination:
+        query["destination"] = destination.upper()
+    return await rollups.find(query, {"_id": 0, "updated_at": 0}).sort(
+        [("day", 1), ("origin", 1), ("destination", 1)]
+    ).to_list(length=limit)
+
+
+@router.get("/revenue")
+async def get_revenue(
+    start: Optional[str] = Query(default=None, pattern=DATE_PATTERN, description="First local departure day"),
+    end: Optional[str] = Query(default=None, pattern=DATE_PATTERN, description="Last local departure day"),
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    limit: int = Query(default=500, ge=1, le=5000)
+) -> List[Dict[str, Any]]:
+    """Revenue from completed payments and confirmed bookings per route per day"""
+    rows = await _rollups(start, end, origin, destination, limit)
+    return [
+        {
+            "origin": row["origin"],
+            "destination": row["destination"],
+            "day": row["day"],
+            "revenue": round(row.get("revenue", 0), 2),
+            "bookings": row.get("bookings", 0),
+            "seats_booked": row.get("seats_booked", 0)
+        }
+        for row in rows
+    ]
+
+
+@router.get("/load-factor")
+async def get_load_factor(
+    start: Optional[str] = Query(default=None, pattern=DATE_PATTERN, description="First local departure day"),
+    end: Optional[str] = Query(default=None, pattern=DATE_PATTERN, description="Last local departure day"),
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    limit: int = Query(default=500, ge=1, le=5000)
+) -> List[Dict[str, Any]]:
+    """Seat load factor, (total_seats - available_seats) / total_seats, per route per day"""
+    rows = await _rollups(start, end, origin, destination, limit)
+    return [
+        {
+            "origin": row["origin"],
+            "destination": row["destination"],
+            "day": row["day"],
+            "flights": row.get("flights", 0),
+            "total_seats": row.get("total_seats", 0),
+            "sold_seats": row.get("sold_seats", 0),
+            "load_factor": round(row["sold_seats"] / row["total_seats"], 4) if row.get("total_seats") else None
+        }
+        for row in rows
+    ]
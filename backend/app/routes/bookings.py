@@ -1,33 +1,88 @@
-from fastapi import APIRouter, HTTPException
-from app.models import Booking
-from app.database import db
-from bson import ObjectId
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from app.models import Booking, BatchGetRequest, CheckoutRequest
+from app.database import client, db
+from app.analytics import record_booking_change, record_flight_change, record_payment_change
+from app.utils.checkout import change_booking, place_booking
+from app.utils.batch import BATCH_GET_MAX_IDS, find_by_ids, parse_ids, parse_object_id, ordered_batch_response
+from app.utils.responses import json_response
+from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
 @router.post("/", response_model=Booking)
-async def create_booking(booking: Booking):
-    result = await db.bookings.insert_one(booking.dict(exclude={"id"}))
-    booking.id = str(result.inserted_id)
+async def create_booking(booking: Booking, background_tasks: BackgroundTasks):
+    # created_at drives the user bookings index and keyset pagination
+    booking.created_at = booking.created_at or datetime.utcnow()
+    booking.updated_at = booking.updated_at or booking.created_at
+    document = booking.dict(exclude={"id"})
+    # Seats, booking and its queued jobs (email, payment polling, analytics) commit together
+    flight_before, flight_after = await place_booking(client, db, document)
+    background_tasks.add_task(record_flight_change, db, flight_before, flight_after)
+    booking.id = str(document["_id"])
     return booking
 
+@router.post("/checkout")
+async def checkout(request: CheckoutRequest, background_tasks: BackgroundTasks):
+    """Book seats and record the payment atomically"""
+    booking = request.booking
+    booking.created_at = booking.created_at or datetime.utcnow()
+    booking.updated_at = booking.updated_at or booking.created_at
+    document = booking.dict(exclude={"id"})
+    payment = request.payment.dict()
+    flight_before, flight_after = await place_booking(client, db, document, payment)
+    background_tasks.add_task(record_flight_change, db, flight_before, flight_after)
+    background_tasks.add_task(record_payment_change, db, None, payment)
+    document["id"] = str(document.pop("_id"))
+    payment["id"] = str(payment.pop("_id"))
+    return json_response({"booking": document, "payment": payment})
+
+async def _batch_get_bookings(ids: List[str]):
+    if len(ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_GET_MAX_IDS} ids per request")
+    object_ids, _ = parse_ids(ids)
+    bookings = await find_by_ids(db.bookings, object_ids)
+    return json_response(ordered_batch_response(ids, bookings, "bookings"))
+
+@router.get("/")
+async def get_bookings(ids: Optional[str] = Query(default=None, description="Comma-separated booking ids")):
+    """Get several bookings by id in request order, reporting missing and invalid ids"""
+    requested = [i.strip() for i in ids.split(",") if i.strip()] if ids else []
+    return await _batch_get_bookings(requested)
+
+@router.post("/batch-get")
+async def batch_get_bookings(request: BatchGetRequest):
+    """Get several bookings by id (for id lists too long for a query string)"""
+    return await _batch_get_bookings(request.ids)
+
 @router.get("/{booking_id}", response_model=Booking)
 async def get_booking(booking_id: str):
-    booking = await db.bookings.find_one({"_id": ObjectId(booking_id)})
+    booking = await db.bookings.find_one({"_id": parse_object_id(booking_id, "Booking not found")})
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     booking["id"] = str(booking["_id"])
     return booking
 
 @router.put("/{booking_id}", response_model=Booking)
-async def update_booking(booking_id: str, booking: Booking):
-    await db.bookings.update_one({"_id": ObjectId(booking_id)}, {"$set": booking.dict(exclude={"id"})})
+async def update_booking(booking_id: str, booking: Booking, background_tasks: BackgroundTasks):
+    _id = parse_object_id(booking_id, "Booking not found")
+    document = booking.dict(exclude={"id"})
+    if document.get("created_at") is None:
+        # Keep the stored created_at (it orders the user bookings pages)
+        document.pop("created_at", None)
+    # Cancelling gives the seats back; seat count and flight changes move them
+    before, flight_changes = await change_booking(client, db, _id, document)
     booking.id = booking_id
+    # Status changes move the booking in or out of the analytics rollups
+    background_tasks.add_task(record_booking_change, db, before, {"_id": _id, **document})
+    for flight_before, flight_after in flight_changes:
+        background_tasks.add_task(record_flight_change, db, flight_before, flight_after)
     return booking
 
 @router.delete("/{booking_id}")
-async def delete_booking(booking_id: str):
-    result = await db.bookings.delete_one({"_id": ObjectId(booking_id)})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    return {"message": "Booking deleted"}
\ No newline at end of file
+async def delete_booking(booking_id: str, background_tasks: BackgroundTasks):
+    before, flight_changes = await change_booking(client, db, parse_object_id(booking_id, "Booking not found"), None)
+    background_tasks.add_task(record_booking_change, db, before, None)
+    for flight_before, flight_after in flight_changes:
+        background_tasks.add_task(record_flight_change, db, flight_before, flight_after)
+    return {"message": "Booking deleted"}
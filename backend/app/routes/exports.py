@@ -0,0 +1,60 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.database import db
+from app.models import BookingStatus, PaymentStatus
+from app.utils.exports import EXPORT_COLUMNS, export_query, parse_export_time, stream_csv, stream_parquet
+from pymongo import ReadPreference
+from typing import Optional
+
+router = APIRouter(prefix="/exports", tags=["exports"])
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+
+def _export(collection: str, statuses_enum, start: Optional[str], end: Optional[str], status: Optional[str], format: str) -> StreamingResponse:
+    try:
+        start_time = parse_export_time(start)
+        end_time = parse_export_time(end, end=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be ISO dates or datetimes")
+
+    statuses = [s.strip() for s in status.split(",") if s.strip()] if status else []
+    valid = {s.value for s in statuses_enum}
+    unknown = [s for s in statuses if s not in valid]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown status(es): {', '.join(unknown)}")
+
+    # Long scans stay off the primary when a secondary is available
+    source = db.get_collection(collection, read_preference=ReadPreference.SECONDARY_PREFERRED)
+    query = export_query(start_time, end_time, statuses)
+    columns = EXPORT_COLUMNS[collection]
+    body = stream_parquet(source, query, columns) if format == "parquet" else stream_csv(source, query, columns)
+
+    filename = "-".join(part for part in (collection, start, end) if part) + f".{format}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/bookings")
+async def export_bookings(
+    start: Optional[str] = Query(default=None, description="Created at or after (date or ISO datetime)"),
+    end: Optional[str] = Query(default=None, description="Created before; a date includes the whole day"),
+    status: Optional[str] = Query(default=None, description="Comma-separated booking statuses"),
+    format: str = Query(default="csv", pattern="^(csv|parquet)$")
+):
+    """Stream bookings created in a date range as CSV or Parquet"""
+    return _export("bookings", BookingStatus, start, end, status, format)
+
+
+@router.get("/payments")
+async def export_payments(
+    start: Optional[str] = Query(default=None, description="Created at or after (date or ISO datetime)"),
+    end: Optional[str] = Query(default=None, description="Created before; a date includes the whole day"),
+    status: Optional[str] = Query(default=None, description="Comma-separated payment statuses"),
+    format: str = Query(default="csv", pattern="^(csv|parquet)$")
+):
+    """Stream payments created in a date range as CSV or Parquet"""
+    return _export("payments", PaymentStatus, start, end, status, format)
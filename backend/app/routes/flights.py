@@ -1,33 +1,82 @@
-from fastapi import APIRouter, HTTPException
-from app.models import Flight
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from pymongo import ReturnDocument
+from app.models import Flight, BatchGetRequest
 from app.database import db
-from bson import ObjectId
+from app.archive_flights import find_flight, find_flights_by_ids
+from app.analytics import FLIGHT_FIELDS, record_flight_change
+from app.price_alerts import PRICE_ALERTS_INLINE, evaluate_flight_change
+from app.utils.flight_snapshot import TOMBSTONES_COLLECTION
+from app.utils.batch import BATCH_GET_MAX_IDS, parse_ids, parse_object_id, ordered_batch_response
+from app.utils.responses import json_response
+from typing import List, Optional
+from datetime import datetime
 
 router = APIRouter(prefix="/flights", tags=["flights"])
 
 @router.post("/", response_model=Flight)
-async def create_flight(flight: Flight):
-    result = await db.flights.insert_one(flight.dict(exclude={"id"}))
+async def create_flight(flight: Flight, background_tasks: BackgroundTasks):
+    # updated_at drives the flight snapshot delta (see app.utils.flight_snapshot)
+    flight.updated_at = datetime.utcnow()
+    document = flight.dict(exclude={"id"})
+    result = await db.flights.insert_one(document)
     flight.id = str(result.inserted_id)
+    if PRICE_ALERTS_INLINE:
+        background_tasks.add_task(evaluate_flight_change, db, document)
+    background_tasks.add_task(record_flight_change, db, None, document)
     return flight
 
+async def _batch_get_flights(ids: List[str]):
+    if len(ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_GET_MAX_IDS} ids per request")
+    object_ids, _ = parse_ids(ids)
+    flights = await find_flights_by_ids(db, object_ids)
+    return json_response(ordered_batch_response(ids, flights, "flights"))
+
+@router.get("/")
+async def get_flights(ids: Optional[str] = Query(default=None, description="Comma-separated flight ids")):
+    """Get several flights by id in request order, reporting missing and invalid ids"""
+    requested = [i.strip() for i in ids.split(",") if i.strip()] if ids else []
+    return await _batch_get_flights(requested)
+
+@router.post("/batch-get")
+async def batch_get_flights(request: BatchGetRequest):
+    """Get several flights by id (for id lists too long for a query string)"""
+    return await _batch_get_flights(request.ids)
+
 @router.get("/{flight_id}", response_model=Flight)
 async def get_flight(flight_id: str):
-    flight = await db.flights.find_one({"_id": ObjectId(flight_id)})
+    # Departed and arrived flights live in the archive collection
+    flight = await find_flight(db, {"_id": parse_object_id(flight_id, "Flight not found")})
     if not flight:
         raise HTTPException(status_code=404, detail="Flight not found")
     flight["id"] = str(flight["_id"])
     return flight
 
 @router.put("/{flight_id}", response_model=Flight)
-async def update_flight(flight_id: str, flight: Flight):
-    await db.flights.update_one({"_id": ObjectId(flight_id)}, {"$set": flight.dict(exclude={"id"})})
+async def update_flight(flight_id: str, flight: Flight, background_tasks: BackgroundTasks):
+    _id = parse_object_id(flight_id, "Flight not found")
+    flight.updated_at = datetime.utcnow()
+    document = flight.dict(exclude={"id"})
+    # The previous seat counts and route/day move out of the analytics rollups
+    before = await db.flights.find_one_and_update(
+        {"_id": _id}, {"$set": document}, projection=FLIGHT_FIELDS, return_document=ReturnDocument.BEFORE
+    )
     flight.id = flight_id
+    if PRICE_ALERTS_INLINE:
+        background_tasks.add_task(evaluate_flight_change, db, {"_id": _id, **document})
+    if before is not None:
+        background_tasks.add_task(record_flight_change, db, before, {"_id": _id, **document})
     return flight
 
 @router.delete("/{flight_id}")
-async def delete_flight(flight_id: str):
-    result = await db.flights.delete_one({"_id": ObjectId(flight_id)})
-    if result.deleted_count == 0:
+async def delete_flight(flight_id: str, background_tasks: BackgroundTasks):
+    _id = parse_object_id(flight_id, "Flight not found")
+    before = await db.flights.find_one_and_delete({"_id": _id}, projection=FLIGHT_FIELDS)
+    if before is None:
         raise HTTPException(status_code=404, detail="Flight not found")
+    # Lets snapshot deltas drop the flight
+    await db[TOMBSTONES_COLLECTION].replace_one(
+        {"_id": _id}, {"_id": _id, "deleted_at": datetime.utcnow()}, upsert=True
+    )
+    background_tasks.add_task(record_flight_change, db, before, None)
     return {"message": "Flight deleted"}
\ No newline at end of file
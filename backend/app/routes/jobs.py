@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Request
+from app.database import db
+from app.jobs import queue_stats
+from typing import Any, Dict
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/stats")
+async def get_job_stats(request: Request) -> Dict[str, Any]:
+    """Queue depth and lag per job type, plus this process's worker counters"""
+    runner = getattr(request.app.state, "job_runner", None)
+    return {
+        "queue": await queue_stats(db),
+        "workers": runner.stats() if runner is not None else {}
+    }
@@ -1,19 +1,44 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status
+from pymongo import ReturnDocument
 from app.models import Payment, PaymentStatus, StripePayment, PayPalPayment
-import stripe
-import paypalrestsdk
-import os
-from typing import List
-
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
-paypalrestsdk.configure({
-    "mode": "sandbox",
-    "client_id": os.getenv("PAYPAL_CLIENT_ID"),
-    "client_secret": os.getenv("PAYPAL_CLIENT_SECRET")
-})
+from app.database import db
+from app.analytics import record_payment_change
+from app.utils.batch import parse_object_id
+from app.utils.payment_gateways import GatewayRecord, PayPalGateway, RefundFailed, StripeGateway
+from datetime import datetime
+from typing import Dict, List
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/payments", tags=["payments"])
 
+# Payment methods whose transaction_id is looked up at the gateway
+PAYMENT_GATEWAYS = {"stripe": StripeGateway, "paypal": PayPalGateway}
+
+
+def _gateway(method: str):
+    """The gateway client for a payment method (credentials from the environment)"""
+    try:
+        return PAYMENT_GATEWAYS[method]()
+    except ValueError as e:
+        logger.error(f"Payment gateway {method} is not configured: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Payment gateway {method} is not configured")
+
+
+async def _gateway_record(method: str, transaction_id: str) -> GatewayRecord:
+    try:
+        return await _gateway(method).get_payment(transaction_id)
+    except LookupError:
+        raise HTTPException(status_code=400, detail=f"Unknown {method} transaction {transaction_id}")
+
+
+async def _store_payment(document: Dict, background_tasks: BackgroundTasks) -> Dict:
+    document["created_at"] = document.get("created_at") or datetime.utcnow()
+    result = await db.payments.insert_one(document)
+    background_tasks.add_task(record_payment_change, db, None, document)
+    return {**document, "id": str(result.inserted_id)}
+
 @router.get("/", response_model=List[Payment])
 async def get_payments():
     """Get all payments (admin only)"""
@@ -27,22 +52,74 @@ async def get_payment(payment_id: str):
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED, response_model=Payment)
-async def process_payment(payment: Payment):
-    """Process a new payment"""
-    # TODO: Integrate with payment gateway
-    pass
+async def process_payment(payment: Payment, background_tasks: BackgroundTasks):
+    """
+    Process a new payment
+
+    Stripe and PayPal payments must carry the gateway's transaction_id (the
+    PaymentIntent or payment id); their status is taken from the gateway so
+    reconciliation can match them later.
+    """
+    if payment.payment_method in PAYMENT_GATEWAYS:
+        if not payment.transaction_id:
+            raise HTTPException(status_code=400, detail=f"transaction_id is required for {payment.payment_method} payments")
+        record = await _gateway_record(payment.payment_method, payment.transaction_id)
+        payment.status = PaymentStatus(record.status)
+    return await _store_payment(payment.dict(exclude={"id"}), background_tasks)
+
+
+async def _set_payment_status(payment_id: str, new_status: PaymentStatus, background_tasks: BackgroundTasks, expected=None):
+    """Change a payment's status and move its amount in or out of the revenue rollups"""
+    query = {"_id": parse_object_id(payment_id, "Payment not found")}
+    if expected is not None:
+        query["status"] = expected.value
+    before = await db.payments.find_one_and_update(
+        query,
+        {"$set": {"status": new_status.value, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        if expected is not None and await db.payments.count_documents({"_id": query["_id"]}, limit=1):
+            raise HTTPException(status_code=409, detail=f"Payment is not {expected.value}")
+        raise HTTPException(status_code=404, detail="Payment not found")
+    after = {**before, "status": new_status.value}
+    background_tasks.add_task(record_payment_change, db, before, after)
+    after["id"] = str(after["_id"])
+    return after
 
 
 @router.put("/{payment_id}/status", response_model=Payment)
-async def update_payment_status(payment_id: str, status: PaymentStatus):
+async def update_payment_status(payment_id: str, status: PaymentStatus, background_tasks: BackgroundTasks):
     """Update payment status"""
-    pass
+    return await _set_payment_status(payment_id, status, background_tasks)
 
 
 @router.post("/{payment_id}/refund", response_model=Payment)
-async def refund_payment(payment_id: str):
-    """Process a refund for a payment"""
-    pass
+async def refund_payment(payment_id: str, background_tasks: BackgroundTasks):
+    """
+    Refund a completed payment
+
+    Stripe and PayPal payments are refunded at the gateway first and only
+    marked refunded once the gateway accepted the refund.
+    """
+    payment = await db.payments.find_one(
+        {"_id": parse_object_id(payment_id, "Payment not found")},
+        {"status": 1, "payment_method": 1, "transaction_id": 1}
+    )
+    if payment is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    if payment["status"] != PaymentStatus.COMPLETED.value:
+        raise HTTPException(status_code=409, detail=f"Payment is not {PaymentStatus.COMPLETED.value}")
+    method = payment.get("payment_method")
+    if method in PAYMENT_GATEWAYS:
+        if not payment.get("transaction_id"):
+            raise HTTPException(status_code=409, detail=f"Payment has no {method} transaction to refund")
+        try:
+            await _gateway(method).refund(payment["transaction_id"])
+        except RefundFailed as e:
+            logger.error(f"Refund of payment {payment_id} failed at {method}: {str(e)}")
+            raise HTTPException(status_code=502, detail=f"Refund failed at {method}")
+    return await _set_payment_status(payment_id, PaymentStatus.REFUNDED, background_tasks, expected=PaymentStatus.COMPLETED)
 
 
 @router.get("/booking/{booking_id}", response_model=Payment)
@@ -51,18 +128,25 @@ async def get_payment_by_booking(booking_id: str):
     pass
 
 @router.post("/stripe")
-async def stripe_payment(data: StripePayment):
-    intent = stripe.PaymentIntent.create(
-        amount=data.amount,
-        currency="usd",
-        payment_method=data.payment_method_id,
-        confirm=True
-    )
-    return {"status": intent.status}
+async def stripe_payment(data: StripePayment, background_tasks: BackgroundTasks):
+    record = await _gateway("stripe").charge(data.amount, data.payment_method_id)
+    payment = await _store_payment({
+        "booking_id": data.booking_id,
+        "amount": record.amount,
+        "payment_method": "stripe",
+        "status": record.status,
+        "transaction_id": record.transaction_id,
+    }, background_tasks)
+    return {"status": record.gateway_status, "payment_id": payment["id"]}
 
 @router.post("/paypal")
-async def paypal_payment(data: PayPalPayment):
-    payment = paypalrestsdk.Payment.find(data.order_id)
-    if payment.state == "approved":
-        return {"status": "success"}
-    return {"status": "failed"}
+async def paypal_payment(data: PayPalPayment, background_tasks: BackgroundTasks):
+    record = await _gateway_record("paypal", data.order_id)
+    payment = await _store_payment({
+        "booking_id": data.booking_id,
+        "amount": record.amount,
+        "payment_method": "paypal",
+        "status": record.status,
+        "transaction_id": record.transaction_id,
+    }, background_tasks)
+    return {"status": "success" if record.gateway_status == "approved" else "failed", "payment_id": payment["id"]}
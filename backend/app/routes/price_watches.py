@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, status
+from app.models import PriceWatch
+from app.database import db
+from app.price_alerts import WATCHES_COLLECTION
+from app.utils.batch import parse_object_id
+from datetime import datetime
+from typing import List
+
+router = APIRouter(prefix="/price-watches", tags=["price-watches"])
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=PriceWatch)
+async def create_price_watch(watch: PriceWatch):
+    """Subscribe to price drops on a route and date"""
+    watch.origin = watch.origin.upper()
+    watch.destination = watch.destination.upper()
+    watch.created_at = datetime.utcnow()
+    document = watch.dict(exclude={"id"})
+    document["date_bucket"] = watch.departure_date
+    result = await db[WATCHES_COLLECTION].insert_one(document)
+    watch.id = str(result.inserted_id)
+    return watch
+
+
+@router.get("/{watch_id}", response_model=PriceWatch)
+async def get_price_watch(watch_id: str):
+    """Get price watch by ID"""
+    watch = await db[WATCHES_COLLECTION].find_one({"_id": parse_object_id(watch_id, "Price watch not found")})
+    if not watch:
+        raise HTTPException(status_code=404, detail="Price watch not found")
+    watch["id"] = str(watch["_id"])
+    return watch
+
+
+@router.delete("/{watch_id}")
+async def delete_price_watch(watch_id: str):
+    """Unsubscribe from a price watch"""
+    result = await db[WATCHES_COLLECTION].delete_one({"_id": parse_object_id(watch_id, "Price watch not found")})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Price watch not found")
+    return {"message": "Price watch deleted"}
+
+
+@router.get("/user/{user_id}", response_model=List[PriceWatch])
+async def get_user_price_watches(user_id: str):
+    """Get all price watches of a user"""
+    watches = await db[WATCHES_COLLECTION].find({"user_id": user_id}).to_list(length=None)
+    for watch in watches:
+        watch["id"] = str(watch["_id"])
+    return watches
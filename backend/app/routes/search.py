@@ -1,41 +1,81 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Response
+from pymongo.errors import ExecutionTimeout
 from app.models import Flight
 from app.database import db
-from app.utils.flight_search import search_flights_with_connections
-from typing import List, Optional, Dict, Any
+from app.utils.flight_search import (
+    parse_fields,
+    search_flights_with_connections,
+    compact_search_results,
+    group_results_by_day
+)
+from app.utils.airport_timezones import local_day_windows
+from app.utils.flight_snapshot import get_flight_snapshot
+from app.utils.reference_data import parse_expand, reference_data
+from app.utils.responses import json_response
+from app.utils.single_flight import SingleFlight
+from app.tracing import span
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
+import os
 
 router = APIRouter(prefix="/search", tags=["search"])
 
+# Identical concurrent searches share one database call
+SEARCH_COALESCING = os.getenv("SEARCH_COALESCING", "true").lower() in ("1", "true", "yes")
+search_single_flight = SingleFlight("search")
+
+
+def _search_response(degraded: List[str], response: Response, content: Any):
+    """json_response with an X-Search-Degraded header naming skipped phases"""
+    result = json_response(content)
+    if degraded:
+        (result if isinstance(result, Response) else response).headers["X-Search-Degraded"] = ",".join(degraded)
+    return result
+
 
 @router.get("/flights")
 async def search_flights(
+    response: Response,
     origin: str,
     destination: str,
     departure_date: Optional[str] = None,
+    flex_days: int = Query(default=0, ge=0, le=7, description="Also search +/- this many days"),
     include_connections: bool = Query(default=True, description="Include connecting flights"),
     max_layover_hours: int = Query(default=6, ge=1, le=24),
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     min_seats: Optional[int] = Query(default=1, ge=1),
-    max_results: int = Query(default=50, le=100)
-) -> List[Dict[str, Any]]:
+    max_results: int = Query(default=50, le=100),
+    fields: Optional[str] = Query(default=None, description="Comma-separated flight fields to return"),
+    format: str = Query(default="v1", pattern="^v[12]$", description="v2 returns a shared flight table"),
+    sort: Optional[str] = Query(default=None, pattern="^(price|duration|best)$", description="Ranking of results"),
+    expand: Optional[str] = Query(default=None, description="Comma-separated details to include: airline, airport")
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Search for flights including direct and connecting options
     
     Args:
         origin: Origin airport code (e.g., LAX)
         destination: Destination airport code (e.g., DXB)
-        departure_date: Departure date in YYYY-MM-DD format
+        departure_date: Departure date in YYYY-MM-DD format, in the origin airport's local time
+        flex_days: Search a window of +/- this many days around departure_date
         include_connections: Whether to include connecting flights
         max_layover_hours: Maximum layover time for connections
         min_price: Minimum price filter
         max_price: Maximum price filter
         min_seats: Minimum available seats required
         max_results: Maximum number of results to return
+        fields: Comma-separated flight fields to fetch (e.g. flight_number,price)
+        format: Response format; v2 de-duplicates flights referenced by segments
+        sort: price, duration or best (weighted score, Pareto-optimal first);
+            direct flights first by price when omitted
+        expand: airline and/or airport details to embed, from the in-process
+            reference data (no per-result lookups)
     
     Returns:
-        List of flight options (direct and connecting)
+        List of flight options (direct and connecting), or for v2 a dict with
+        a ``flights`` table and ``results`` whose segments are flight ids.
+        With flex_days, results are grouped under ``days`` (per-day max_results).
     """
     # Parse departure date
     parsed_date = None
@@ -44,17 +84,58 @@ async def search_flights(
             parsed_date = datetime.strptime(departure_date, "%Y-%m-%d")
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    elif flex_days:
+        raise HTTPException(status_code=400, detail="flex_days requires departure_date")
+
+    try:
+        expand_options = parse_expand(expand)
+        field_list = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Search for flights
-    results = await search_flights_with_connections(
-        db=db,
-        origin=origin,
-        destination=destination,
-        departure_date=parsed_date,
-        max_layover_hours=max_layover_hours,
-        include_connections=include_connections,
-        max_results=max_results
+    if field_list and "airline" in expand_options and "airline_id" not in field_list:
+        field_list = sorted(field_list + ["airline_id"])
+
+    async def run_search():
+        results = await search_flights_with_connections(
+            db=db,
+            origin=origin,
+            destination=destination,
+            departure_date=parsed_date,
+            max_layover_hours=max_layover_hours,
+            include_connections=include_connections,
+            max_results=max_results,
+            fields=field_list,
+            flex_days=flex_days,
+            sort=sort
+        )
+        # A dict, so the skipped phases survive SingleFlight's copy
+        return {"results": results, "degraded": results.degraded}
+
+    # Normalized coalescing key: filters applied below are not part of it
+    key = (
+        origin.upper(),
+        destination.upper(),
+        parsed_date.date().isoformat() if parsed_date else None,
+        flex_days,
+        include_connections,
+        max_layover_hours,
+        max_results,
+        tuple(field_list) if field_list else None,
+        sort
     )
+    try:
+        if SEARCH_COALESCING:
+            # Followers of an in-flight search show up as a span with no children
+            with span("search.query", coalescing=True):
+                outcome = await search_single_flight.do(key, run_search)
+        else:
+            with span("search.query", coalescing=False):
+                outcome = await run_search()
+    except ExecutionTimeout:
+        raise HTTPException(status_code=504, detail="Search timed out")
+    results, degraded = outcome["results"], outcome["degraded"]
     
     # Apply additional filters
     filtered_results = results
@@ -75,8 +156,31 @@ async def search_flights(
                 return all(seg.get("available_seats", 0) >= min_seats for seg in result.get("segments", []))
         
         filtered_results = [r for r in filtered_results if has_enough_seats(r)]
+
+    if expand_options:
+        await reference_data.ensure_fresh(db)
+        reference_data.expand_results(filtered_results, expand_options)
     
-    return filtered_results[:max_results]
+    if flex_days:
+        windows = local_day_windows(origin, parsed_date, flex_days)
+        days = group_results_by_day(filtered_results, max_results, windows)
+        if format == "v2":
+            compact = compact_search_results([r for day in days for r in day["results"]])
+            compact["days"] = group_results_by_day(compact.pop("results"), max_results, windows)
+            return _search_response(degraded, response, compact)
+        return _search_response(degraded, response, {"days": days})
+
+    filtered_results = filtered_results[:max_results]
+
+    if format == "v2":
+        return _search_response(degraded, response, compact_search_results(filtered_results))
+    return _search_response(degraded, response, filtered_results)
+
+
+@router.get("/coalescing-stats")
+async def get_coalescing_stats() -> Dict[str, int]:
+    """Get counters of searches served by a shared in-flight database call"""
+    return search_single_flight.stats()
 
 
 @router.get("/flights/by-route")
@@ -85,13 +189,47 @@ async def search_flights_by_route(origin: str, destination: str):
     pass
 
 
+def _bookable_query(now: datetime) -> Dict[str, Any]:
+    return {
+        "departure_time": {"$gte": now},
+        "available_seats": {"$gt": 0},
+        "status": {"$ne": "cancelled"}
+    }
+
+
 @router.get("/available-destinations")
 async def get_available_destinations(origin: str):
     """Get all available destinations from a given origin"""
-    pass
+    now = datetime.utcnow()
+    snapshot = get_flight_snapshot()
+    if snapshot is not None:
+        return snapshot.destinations_from(origin, after=now)
+
+    pipeline = [
+        {"$match": {"origin": origin.upper(), **_bookable_query(now)}},
+        {"$group": {"_id": "$destination", "flights": {"$sum": 1}, "min_price": {"$min": "$price"}}},
+        {"$sort": {"_id": 1}}
+    ]
+    results = await db.flights.aggregate(pipeline).to_list(length=None)
+    return [
+        {"destination": r["_id"], "flights": r["flights"], "min_price": r["min_price"]}
+        for r in results
+    ]
 
 
 @router.get("/popular-routes")
 async def get_popular_routes(limit: int = Query(default=10, le=50)):
     """Get most popular flight routes"""
-    pass
+    now = datetime.utcnow()
+    snapshot = get_flight_snapshot()
+    if snapshot is not None:
+        return snapshot.popular_routes(limit, after=now)
+
+    pipeline = [
+        {"$match": _bookable_query(now)},
+        {"$group": {"_id": {"origin": "$origin", "destination": "$destination"}, "flights": {"$sum": 1}}},
+        {"$sort": {"flights": -1, "_id.origin": 1, "_id.destination": 1}},
+        {"$limit": limit}
+    ]
+    results = await db.flights.aggregate(pipeline).to_list(length=limit)
+    return [{**r["_id"], "flights": r["flights"]} for r in results]
@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException, status
-from app.models import User, UserRole
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, status
+from app.models import User, UserRole, BookingStatus
+from app.database import db
+from app.archive_flights import find_flights_by_ids
+from app.utils.pagination import encode_cursor, keyset_filter
+from app.utils.responses import json_response
+from bson import ObjectId
+from typing import List, Optional
+import asyncio
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
+def _with_id(document: dict) -> dict:
+    """Replace a document's ObjectId _id with a string id"""
+    document["id"] = str(document.pop("_id"))
+    return document
+
+
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register_user(user: User):
     """Register a new user"""
@@ -46,6 +58,52 @@ async def delete_user(user_id: str):
 
 
 @router.get("/{user_id}/bookings")
-async def get_user_bookings(user_id: str):
-    """Get all bookings for a user"""
-    pass
+async def get_user_bookings(
+    user_id: str,
+    booking_status: Optional[BookingStatus] = Query(default=None, alias="status"),
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page")
+):
+    """
+    Get a page of bookings for a user, newest first, with their flight and payment
+
+    Pages are served from the (user_id, status, created_at, _id) index; without a
+    status filter every status is listed explicitly so the index still
+    provides the created_at order. Related flights and payments are loaded
+    with one $in query each per page.
+    """
+    statuses = [booking_status.value] if booking_status else [s.value for s in BookingStatus]
+    query = {"user_id": user_id, "status": {"$in": statuses}}
+    try:
+        query.update(keyset_filter(cursor))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    cursor_query = db.bookings.find(query).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1)
+    bookings = await cursor_query.to_list(length=limit + 1)
+    has_more = len(bookings) > limit
+    bookings = bookings[:limit]
+
+    flight_ids = [ObjectId(b["flight_id"]) for b in bookings if ObjectId.is_valid(b.get("flight_id", ""))]
+    booking_ids = [str(b["_id"]) for b in bookings]
+    flights, payments = await asyncio.gather(
+        find_flights_by_ids(db, flight_ids),
+        db.payments.find({"booking_id": {"$in": booking_ids}}).to_list(length=None)
+    )
+    flights_by_id = {str(_id): _with_id(flight) for _id, flight in flights.items()}
+    payments_by_booking = {p["booking_id"]: _with_id(p) for p in payments}
+
+    for booking in bookings:
+        booking["id"] = str(booking.pop("_id"))
+        booking["flight"] = flights_by_id.get(booking.get("flight_id"))
+        booking["payment"] = payments_by_booking.get(booking["id"])
+
+    next_cursor = None
+    if has_more and bookings:
+        last = bookings[-1]
+        last_id = ObjectId(last["id"])
+        # Legacy bookings get created_at from their ObjectId (see backfill_booking_created_at)
+        created_at = last.get("created_at") or last_id.generation_time.replace(tzinfo=None)
+        next_cursor = encode_cursor(created_at, last_id)
+
+    return json_response({"bookings": bookings, "next_cursor": next_cursor})
@@ -1,10 +1,12 @@
 import asyncio
-import random
-from datetime import datetime, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
+import argparse
+import time
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 from faker import Faker
+import numpy as np
 import os
-from typing import List
+from typing import Dict, List, Optional
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -69,18 +71,162 @@ AIRCRAFT_TYPES = [
 ]
 
 STATUSES = ["scheduled", "delayed", "boarding", "departed", "arrived", "cancelled"]
+STATUS_WEIGHTS = [70, 10, 5, 5, 5, 5]  # Most flights are scheduled
 
+SEAT_CONFIGURATIONS = [150, 180, 200, 250, 300, 350]
 
-async def seed_database(num_flights: int = 10000):
+# Relative traffic weight per airport; major hubs see far more departures and
+# arrivals than regional airports. Airports not listed default to 1.
+HUB_WEIGHTS = {
+    "ATL": 10, "LHR": 9, "DXB": 9, "ORD": 8, "LAX": 8, "DFW": 7, "JFK": 7,
+    "CDG": 7, "FRA": 6, "AMS": 6, "SIN": 6, "HKG": 6, "DEN": 5, "NRT": 5,
+    "ICN": 5, "YYZ": 5, "SFO": 4, "SEA": 3, "MIA": 3, "LAS": 3, "SYD": 3,
+    "GRU": 3, "MEX": 3, "YVR": 3,
+}
+
+AIRPORT_CODES = np.array([a["code"] for a in AIRPORTS])
+AIRPORT_PROBABILITIES = np.array([HUB_WEIGHTS.get(a["code"], 1) for a in AIRPORTS], dtype=np.float64)
+AIRPORT_PROBABILITIES /= AIRPORT_PROBABILITIES.sum()
+
+# Rows generated per vectorized chunk; bounds memory for multi-million seeds
+GENERATION_CHUNK_SIZE = 100_000
+
+
+def generate_flight_columns(
+    rng: np.random.Generator,
+    num_flights: int,
+    airline_ids: List[str],
+    start: datetime,
+    offset: int = 0
+) -> Dict[str, np.ndarray]:
+    """
+    Generate flight attributes as NumPy columns
+
+    Args:
+        rng: Seeded random generator
+        num_flights: Number of rows to generate
+        airline_ids: Inserted airline ids, aligned with AIRLINES
+        start: Reference time; departures fall within the following 90 days
+        offset: Global row offset, used to keep flight numbers unique across chunks
+
+    Returns:
+        Mapping of field name to column array
+    """
+    n_airports = len(AIRPORTS)
+
+    # Hub-weighted origin/destination pairs; redraw destinations equal to the origin
+    origin_idx = rng.choice(n_airports, size=num_flights, p=AIRPORT_PROBABILITIES)
+    destination_idx = rng.choice(n_airports, size=num_flights, p=AIRPORT_PROBABILITIES)
+    same = origin_idx == destination_idx
+    while same.any():
+        destination_idx[same] = rng.choice(n_airports, size=int(same.sum()), p=AIRPORT_PROBABILITIES)
+        same = origin_idx == destination_idx
+
+    airline_idx = rng.integers(0, len(AIRLINES), size=num_flights)
+
+    # Departure within the next 90 days on a quarter-hour, duration 1-16 hours
+    departure_minutes = (
+        rng.integers(0, 91, size=num_flights) * 1440
+        + rng.integers(0, 24, size=num_flights) * 60
+        + rng.choice([0, 15, 30, 45], size=num_flights)
+    )
+    duration_hours = rng.integers(1, 17, size=num_flights)
+    arrival_minutes = departure_minutes + duration_hours * 60 + rng.integers(0, 60, size=num_flights)
+
+    start_ms = np.datetime64(start.replace(minute=0, second=0, microsecond=0), "ms")
+    departure_time = start_ms + departure_minutes.astype("timedelta64[m]")
+    arrival_time = start_ms + arrival_minutes.astype("timedelta64[m]")
+
+    # Longer flights are more expensive
+    price = (100 + duration_hours * 50 + rng.integers(-50, 151, size=num_flights)).astype(np.float64)
+
+    total_seats = rng.choice(SEAT_CONFIGURATIONS, size=num_flights)
+    available_seats = (rng.random(num_flights) * (total_seats + 1)).astype(np.int64)
+
+    status_p = np.array(STATUS_WEIGHTS, dtype=np.float64) / sum(STATUS_WEIGHTS)
+    status_idx = rng.choice(len(STATUSES), size=num_flights, p=status_p)
+
+    airline_codes = np.array([a["code"] for a in AIRLINES])
+    sequence = np.arange(100 + offset, 100 + offset + num_flights).astype(str)
+
+    return {
+        "flight_number": np.char.add(airline_codes[airline_idx], sequence),
+        "airline_id": np.array(airline_ids)[airline_idx],
+        "origin": AIRPORT_CODES[origin_idx],
+        "destination": AIRPORT_CODES[destination_idx],
+        "departure_time": departure_time,
+        "arrival_time": arrival_time,
+        "price": price,
+        "available_seats": available_seats,
+        "total_seats": total_seats,
+        "aircraft_type": np.array(AIRCRAFT_TYPES)[rng.integers(0, len(AIRCRAFT_TYPES), size=num_flights)],
+        "status": np.array(STATUSES)[status_idx],
+    }
+
+
+def columns_to_documents(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """Transpose generated columns into Mongo documents"""
+    fields = list(columns.keys())
+    # tolist() converts to native Python types (datetime64[ms] -> datetime) in C
+    values = [columns[field].tolist() for field in fields]
+    return [dict(zip(fields, row)) for row in zip(*values)]
+
+
+async def _insert_worker(collection: AsyncIOMotorCollection, queue: asyncio.Queue, counter: Dict[str, int]):
+    """Drain document batches from the queue into the collection"""
+    while True:
+        batch = await queue.get()
+        try:
+            if batch is None:
+                return
+            await collection.insert_many(batch, ordered=False)
+            counter["inserted"] += len(batch)
+        finally:
+            queue.task_done()
+
+
+async def _put_batch(queue: asyncio.Queue, batch: Optional[List[Dict]], workers: List[asyncio.Task]):
+    """
+    queue.put that fails fast when the insert workers die
+
+    A worker only returns after taking its None sentinel, so one that stops
+    early has raised; its error is re-raised here instead of the put blocking
+    forever on a queue nobody drains.
+    """
+    put = asyncio.ensure_future(queue.put(batch))
+    try:
+        while not put.done():
+            failed = [w for w in workers if w.done() and (w.cancelled() or w.exception() is not None)]
+            running = [w for w in workers if not w.done()]
+            if failed:
+                failed[0].result()
+            if not running:
+                raise RuntimeError("Insert workers exited before loading finished")
+            await asyncio.wait([put, *running], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        put.cancel()
+
+
+async def seed_database(
+    num_flights: int = 10000,
+    seed: int = 42,
+    concurrency: int = 4,
+    batch_size: int = 1000,
+    build_indexes: bool = False
+):
     """
     Seed the database with mock data
-    
+
     Args:
         num_flights: Number of flights to generate
+        seed: Random seed, so datasets are reproducible between runs
+        concurrency: Number of concurrent insert_many pipelines
+        batch_size: Documents per insert_many call
+        build_indexes: Create indexes once loading has finished
     """
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
     client = AsyncIOMotorClient(MONGO_URI)
-    db = client["flight_booking"]
+    db = client[os.getenv("MONGO_DATABASE", "flight_booking")]
     
     logger.info(f"Starting database seeding with {num_flights} flights...")
     
@@ -88,86 +234,63 @@ async def seed_database(num_flights: int = 10000):
     logger.info("Clearing existing data...")
     await db.airports.delete_many({})
     await db.airlines.delete_many({})
-    await db.flights.delete_many({})
+    if build_indexes:
+        # Load into an unindexed collection; indexes are built once at the end
+        await db.flights.drop()
+    else:
+        await db.flights.delete_many({})
     
-    # Insert airports
+    # Insert airports (copies, insert_many adds _id to the documents)
     logger.info(f"Inserting {len(AIRPORTS)} airports...")
-    airport_result = await db.airports.insert_many(AIRPORTS)
+    airport_result = await db.airports.insert_many([dict(a) for a in AIRPORTS])
     airport_ids = airport_result.inserted_ids
     logger.info(f"Inserted {len(airport_ids)} airports")
     
     # Insert airlines
     logger.info(f"Inserting {len(AIRLINES)} airlines...")
-    airline_result = await db.airlines.insert_many(AIRLINES)
-    airline_ids = airline_result.inserted_ids
+    airline_result = await db.airlines.insert_many([dict(a) for a in AIRLINES])
+    airline_ids = [str(_id) for _id in airline_result.inserted_ids]
     logger.info(f"Inserted {len(airline_ids)} airlines")
     
-    # Generate flights
-    logger.info(f"Generating {num_flights} flights...")
-    flights = []
-    batch_size = 1000
-    
-    for i in range(num_flights):
-        # Random origin and destination (ensure they're different)
-        origin_airport = random.choice(AIRPORTS)
-        destination_airport = random.choice([a for a in AIRPORTS if a["code"] != origin_airport["code"]])
-        
-        airline = random.choice(AIRLINES)
-        
-        # Generate departure time (next 90 days)
-        departure_time = datetime.now() + timedelta(
-            days=random.randint(0, 90),
-            hours=random.randint(0, 23),
-            minutes=random.choice([0, 15, 30, 45])
-        )
-        
-        # Calculate flight duration based on rough distance categories
-        duration_hours = random.randint(1, 16)
-        arrival_time = departure_time + timedelta(hours=duration_hours, minutes=random.randint(0, 59))
-        
-        # Generate flight number
-        flight_number = f"{airline['code']}{random.randint(100, 9999)}"
-        
-        # Generate pricing (longer flights = more expensive)
-        base_price = 100 + (duration_hours * 50) + random.randint(-50, 150)
-        
-        # Seat availability
-        total_seats = random.choice([150, 180, 200, 250, 300, 350])
-        available_seats = random.randint(0, total_seats)
-        
-        flight = {
-            "flight_number": flight_number,
-            "airline_id": str(random.choice(airline_ids)),
-            "origin": origin_airport["code"],
-            "destination": destination_airport["code"],
-            "departure_time": departure_time,
-            "arrival_time": arrival_time,
-            "price": round(base_price, 2),
-            "available_seats": available_seats,
-            "total_seats": total_seats,
-            "aircraft_type": random.choice(AIRCRAFT_TYPES),
-            "status": random.choices(
-                STATUSES,
-                weights=[70, 10, 5, 5, 5, 5],  # Most flights are scheduled
-                k=1
-            )[0]
-        }
-        
-        flights.append(flight)
-        
-        # Insert in batches
-        if len(flights) >= batch_size:
-            await db.flights.insert_many(flights)
-            logger.info(f"Inserted batch of {len(flights)} flights ({i+1}/{num_flights} total)")
-            flights = []
-    
-    # Insert remaining flights
-    if flights:
-        await db.flights.insert_many(flights)
-        logger.info(f"Inserted final batch of {len(flights)} flights")
+    # Generate flights in vectorized chunks, fed to concurrent insert pipelines
+    logger.info(f"Generating {num_flights} flights (seed={seed}, concurrency={concurrency})...")
+    rng = np.random.default_rng(seed)
+    start = datetime.now()
+    started = time.perf_counter()
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    counter = {"inserted": 0}
+    workers = [
+        asyncio.create_task(_insert_worker(db.flights, queue, counter))
+        for _ in range(concurrency)
+    ]
+
+    try:
+        for offset in range(0, num_flights, GENERATION_CHUNK_SIZE):
+            size = min(GENERATION_CHUNK_SIZE, num_flights - offset)
+            documents = columns_to_documents(generate_flight_columns(rng, size, airline_ids, start, offset))
+            for i in range(0, len(documents), batch_size):
+                await _put_batch(queue, documents[i:i + batch_size], workers)
+            logger.info(f"Queued {offset + size}/{num_flights} flights ({counter['inserted']} inserted)")
+
+        for _ in workers:
+            await _put_batch(queue, None, workers)
+        await asyncio.gather(*workers)
+    except BaseException:
+        for worker in workers:
+            worker.cancel()
+        raise
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Inserted {counter['inserted']} flights in {elapsed:.1f}s ({counter['inserted'] / max(elapsed, 1e-9):.0f} docs/s)")
+
+    if build_indexes:
+        from app.indexes import create_indexes
+        logger.info("Building indexes after load...")
+        await create_indexes(db)
     
     # Generate some statistics
-    total_flights = await db.flights.count_documents({})
+    total_flights = await db.flights.estimated_document_count()
     total_airports = await db.airports.count_documents({})
     total_airlines = await db.airlines.count_documents({})
     
@@ -182,9 +305,18 @@ async def seed_database(num_flights: int = 10000):
 
 
 if __name__ == "__main__":
-    import sys
-    
-    # Get number of flights from command line argument, default to 10000
-    num_flights = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
-    
-    asyncio.run(seed_database(num_flights))
+    parser = argparse.ArgumentParser(description="Seed the flight booking database")
+    parser.add_argument("num_flights", nargs="?", type=int, default=10000, help="Number of flights to generate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent insert pipelines")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per insert_many")
+    parser.add_argument("--build-indexes", action="store_true", help="Create indexes after loading")
+    args = parser.parse_args()
+
+    asyncio.run(seed_database(
+        args.num_flights,
+        seed=args.seed,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        build_indexes=args.build_indexes
+    ))
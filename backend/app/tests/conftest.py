@@ -0,0 +1,32 @@
+import os
+
+# Route tests run against their own database, set before app.database is imported
+os.environ["MONGO_DATABASE"] = os.getenv("MONGO_TEST_DATABASE", "flight_booking_test")
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient for the app against the test database, dropped afterwards
+
+    Skipped when no MongoDB is reachable at MONGO_URI.
+    """
+    from app.database import MONGO_DATABASE, MONGO_URI
+    from app.main import app
+
+    sync_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
+    try:
+        sync_client.admin.command("ping")
+    except PyMongoError as e:
+        sync_client.close()
+        pytest.skip(f"MongoDB is not reachable at {MONGO_URI}: {e}")
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        sync_client.drop_database(MONGO_DATABASE)
+        sync_client.close()
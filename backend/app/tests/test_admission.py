@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from app.admission import Lane, Rejected, classify
+
+
+def _scope(path: str, query: str = "") -> dict:
+    return {"type": "http", "path": path, "query_string": query.encode()}
+
+
+class TestAdmission:
+    """Test suite for admission control lanes"""
+
+    def test_classify_requests(self):
+        """Test requests are routed to the right lane"""
+        assert classify(_scope("/search/flights", "origin=JFK&destination=LAX")) == "search"
+        assert classify(_scope("/search/flights", "include_connections=false")) is None
+        assert classify(_scope("/bookings/")) == "priority"
+        assert classify(_scope("/payments/stripe")) == "priority"
+        assert classify(_scope("/airports/")) is None
+
+    def test_queue_overflow_rejected_with_retry_after(self):
+        """Test requests beyond limit and queue are shed with 429"""
+        async def run():
+            lane = Lane("search", limit=1, max_queue=1, queue_timeout=1)
+            await lane.acquire()
+            queued = asyncio.create_task(lane.acquire())
+            await asyncio.sleep(0)
+            with pytest.raises(Rejected) as e:
+                await lane.acquire()
+            assert e.value.status_code == 429
+            assert e.value.retry_after >= 1
+            lane.release(0.01)
+            await queued
+            assert lane.in_flight == 1
+
+        asyncio.run(run())
+
+    def test_queue_deadline_returns_503(self):
+        """Test queued requests time out with 503"""
+        async def run():
+            lane = Lane("search", limit=1, max_queue=10, queue_timeout=0.01)
+            await lane.acquire()
+            with pytest.raises(Rejected) as e:
+                await lane.acquire()
+            assert e.value.status_code == 503
+            assert lane.stats()["queued"] == 0
+
+        asyncio.run(run())
+
+    def test_aimd_limit_adapts_to_latency(self):
+        """Test the limit grows when fast and backs off when slow"""
+        lane = Lane("search", limit=10, max_limit=20, max_queue=10, queue_timeout=1,
+                    adaptive=True, target_latency=0.1, cooldown=0)
+        lane.in_flight = 1
+        lane.release(0.05)
+        assert lane.limit > 10
+        grown = lane.limit
+        lane.in_flight = 1
+        lane.release(1.0)
+        assert lane.limit == pytest.approx(grown * 0.9)
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+class TestAnalytics:
+    """Test suite for analytics routes"""
+
+    def test_get_revenue(self, client: TestClient):
+        """Test revenue per route per day for a date range"""
+        response = client.get("/analytics/revenue?start=2025-11-01&end=2025-11-30")
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+
+    def test_get_revenue_for_route(self, client: TestClient):
+        """Test revenue filtered to one route"""
+        response = client.get("/analytics/revenue?origin=jfk&destination=lax")
+        assert response.status_code == 200
+        for row in response.json():
+            assert row["origin"] == "JFK"
+            assert row["destination"] == "LAX"
+
+    def test_get_load_factor(self, client: TestClient):
+        """Test seat load factor rows are within [0, 1]"""
+        response = client.get("/analytics/load-factor?start=2025-11-01&end=2025-11-30")
+        assert response.status_code == 200
+        for row in response.json():
+            assert row["load_factor"] is None or 0 <= row["load_factor"] <= 1
+
+    def test_invalid_date_range(self, client: TestClient):
+        """Test a start date after the end date"""
+        response = client.get("/analytics/revenue?start=2025-12-01&end=2025-11-01")
+        assert response.status_code == 400
+
+    def test_malformed_date(self, client: TestClient):
+        """Test a malformed date parameter"""
+        response = client.get("/analytics/load-factor?start=11/01/2025")
+        assert response.status_code == 422
+
+    def test_impossible_date(self, client: TestClient):
+        """Test a well-formed date that does not exist"""
+        response = client.get("/analytics/revenue?start=2025-02-30&end=2025-03-31")
+        assert response.status_code == 400
@@ -1,5 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
+from app.utils.checkout import held_seats
 
 
 class TestBookings:
@@ -41,3 +42,66 @@ class TestBookings:
         booking_id = "test_booking_id"
         response = client.delete(f"/bookings/{booking_id}")
         assert response.status_code in [200, 204, 404]
+
+    def test_get_bookings_by_ids(self, client: TestClient):
+        """Test getting several bookings by id"""
+        response = client.get("/bookings/?ids=507f1f77bcf86cd799439011,not_an_id")
+        assert response.status_code == 200
+        assert response.json()["invalid"] == ["not_an_id"]
+
+    def test_batch_get_bookings(self, client: TestClient):
+        """Test batch-getting bookings with a request body"""
+        response = client.post("/bookings/batch-get", json={"ids": ["507f1f77bcf86cd799439011"]})
+        assert response.status_code == 200
+
+    def test_checkout(self, client: TestClient):
+        """Test booking and paying in one request"""
+        checkout_data = {
+            "booking": {
+                "booking_reference": "ABC123",
+                "user_id": "507f1f77bcf86cd799439011",
+                "flight_id": "507f1f77bcf86cd799439012",
+                "passenger_ids": ["507f1f77bcf86cd799439013"],
+                "seats": 1,
+                "total_price": 199.0
+            },
+            "payment": {"payment_method": "card", "status": "completed"}
+        }
+        response = client.post("/bookings/checkout", json=checkout_data)
+        assert response.status_code in [200, 404, 409]
+        if response.status_code == 200:
+            data = response.json()
+            assert data["payment"]["booking_id"] == data["booking"]["id"]
+            assert data["booking"]["status"] == "confirmed"
+
+    def test_checkout_unknown_flight(self, client: TestClient):
+        """Test checkout for a flight id that is not an ObjectId"""
+        checkout_data = {
+            "booking": {
+                "booking_reference": "ABC124",
+                "user_id": "507f1f77bcf86cd799439011",
+                "flight_id": "not_an_id",
+                "passenger_ids": [],
+                "seats": 1,
+                "total_price": 199.0
+            },
+            "payment": {"payment_method": "card"}
+        }
+        response = client.post("/bookings/checkout", json=checkout_data)
+        assert response.status_code == 404
+
+
+class TestSeatHolds:
+    """Test suite for the seats a booking holds on its flight"""
+
+    def test_active_booking_holds_seats(self):
+        """Test pending and confirmed bookings hold their seats"""
+        booking = {"flight_id": "507f1f77bcf86cd799439012", "seats": 2, "status": "confirmed"}
+        assert held_seats(booking) == {"507f1f77bcf86cd799439012": 2}
+
+    def test_cancelled_or_missing_booking_holds_none(self):
+        """Test cancelled, deleted and invalid-flight bookings hold no seats"""
+        assert held_seats({"flight_id": "507f1f77bcf86cd799439012", "seats": 2, "status": "cancelled"}) == {}
+        assert held_seats(None) == {}
+        assert held_seats({"flight_id": "not_an_id", "seats": 2, "status": "pending"}) == {}
+
@@ -0,0 +1,86 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from app.compression import CompressionMiddleware, negotiate_encoding
+from app.etags import ETagMiddleware
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/search/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/search/large")
+    async def large():
+        return [{"origin": "JFK", "destination": "LAX", "price": i} for i in range(500)]
+
+    @app.get("/exports/stream")
+    async def stream():
+        async def rows():
+            for i in range(100):
+                yield f"{i},row\n".encode()
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    app.add_middleware(ETagMiddleware)
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return app
+
+
+@pytest.fixture
+def http() -> TestClient:
+    return TestClient(_app())
+
+
+class TestCompression:
+    """Test suite for response compression and conditional GET"""
+
+    def test_negotiate_encoding(self):
+        """Test Accept-Encoding negotiation honours q-values and server preference"""
+        assert negotiate_encoding("gzip, br", ["br", "gzip"]) == "br"
+        assert negotiate_encoding("gzip;q=1.0, br;q=0.5", ["br", "gzip"]) == "gzip"
+        assert negotiate_encoding("br;q=0, gzip", ["br", "gzip"]) == "gzip"
+        assert negotiate_encoding("identity", ["br", "gzip"]) is None
+        assert negotiate_encoding("*", ["gzip"]) == "gzip"
+
+    def test_small_response_not_compressed(self, http: TestClient):
+        """Test responses under the size threshold are sent as-is"""
+        response = http.get("/search/small", headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"] == "Accept-Encoding"
+
+    def test_large_response_compressed(self, http: TestClient):
+        """Test responses over the threshold are gzip-encoded"""
+        response = http.get("/search/large", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()) == 500
+
+    def test_streaming_response_compressed(self, http: TestClient):
+        """Test streaming responses are compressed chunk by chunk"""
+        response = http.get("/exports/stream", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        assert response.text.splitlines()[99] == "99,row"
+
+    def test_etag_not_modified(self, http: TestClient):
+        """Test a repeat poll with the ETag answers 304 without a body"""
+        first = http.get("/search/large")
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')
+        repeat = http.get("/search/large", headers={"If-None-Match": etag})
+        assert repeat.status_code == 304
+        assert repeat.content == b""
+        assert repeat.headers["etag"] == etag
+
+    def test_etag_same_across_encodings(self, http: TestClient):
+        """Test the weak ETag does not depend on the content coding"""
+        plain = http.get("/search/large", headers={"Accept-Encoding": "identity"})
+        compressed = http.get("/search/large", headers={"Accept-Encoding": "gzip"})
+        assert plain.headers["etag"] == compressed.headers["etag"]
+
+    def test_no_etag_outside_prefixes(self, http: TestClient):
+        """Test only configured read endpoints get ETags"""
+        response = http.get("/exports/stream")
+        assert "etag" not in response.headers
@@ -0,0 +1,106 @@
+import asyncio
+from app.deadlines import DeadlineMiddleware, current_deadline, query_budget_ms, query_options, reset_deadline, set_deadline
+from app.utils.single_flight import SingleFlight
+
+
+def _scope(path: str) -> dict:
+    return {"type": "http", "path": path, "method": "GET", "headers": []}
+
+
+class TestDeadlines:
+    """Test suite for search deadlines and cancellation"""
+
+    def test_query_options_follow_deadline(self):
+        """Test maxTimeMS is the time left, capped, and the comment tags the request"""
+        assert query_options() == {}
+        assert query_budget_ms(200) == 200
+
+        token = set_deadline(1000, comment="req:test")
+        try:
+            options = query_options()
+            assert options["comment"] == "req:test"
+            assert 900 < options["maxTimeMS"] <= 1000
+            assert query_options(200)["maxTimeMS"] == 200
+        finally:
+            reset_deadline(token)
+        assert current_deadline() is None
+
+    def test_expired_deadline_never_means_unlimited(self):
+        """Test an expired deadline gives maxTimeMS 1, not 0"""
+        token = set_deadline(-100)
+        try:
+            assert query_budget_ms() == 1
+        finally:
+            reset_deadline(token)
+
+    def test_disconnect_cancels_search(self):
+        """Test a client disconnect cancels the handler, which sees the deadline"""
+        async def run():
+            state = {}
+
+            async def app(scope, receive, send):
+                state["deadline"] = current_deadline()
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    state["cancelled"] = True
+                    raise
+
+            async def receive():
+                await asyncio.sleep(0.01)
+                return {"type": "http.disconnect"}
+
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            middleware = DeadlineMiddleware(app, timeout_ms=1000)
+            await middleware(_scope("/search/flights"), receive, send)
+            assert middleware.cancelled == 1
+            assert state["cancelled"]
+            assert state["deadline"] is not None
+            assert sent == []
+
+        asyncio.run(run())
+
+    def test_other_paths_pass_through(self):
+        """Test requests outside the search paths get no deadline"""
+        async def run():
+            seen = []
+
+            async def app(scope, receive, send):
+                seen.append(current_deadline())
+
+            middleware = DeadlineMiddleware(app)
+            await middleware(_scope("/bookings/"), None, None)
+            assert seen == [None]
+
+        asyncio.run(run())
+
+    def test_single_flight_cancels_when_all_callers_gone(self):
+        """Test shared work keeps running for remaining callers and stops after the last"""
+        async def run():
+            flight = SingleFlight("test")
+            started = asyncio.Event()
+            cancelled = asyncio.Event()
+
+            async def work():
+                started.set()
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+
+            first = asyncio.create_task(flight.do("k", work))
+            second = asyncio.create_task(flight.do("k", work))
+            await started.wait()
+            first.cancel()
+            await asyncio.sleep(0.01)
+            assert not cancelled.is_set()
+            second.cancel()
+            await asyncio.wait_for(cancelled.wait(), 1)
+            assert flight.stats()["in_flight"] == 0
+
+        asyncio.run(run())
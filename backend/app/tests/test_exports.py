@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+class TestExports:
+    """Test suite for export routes"""
+
+    def test_export_bookings_csv(self, client: TestClient):
+        """Test streaming bookings as CSV"""
+        response = client.get("/exports/bookings?start=2025-11-01&end=2025-11-30&status=confirmed")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.text.splitlines()[0].startswith("id,booking_reference")
+
+    def test_export_payments_parquet(self, client: TestClient):
+        """Test streaming payments as Parquet"""
+        response = client.get("/exports/payments?format=parquet")
+        assert response.status_code == 200
+        assert response.content[:4] == b"PAR1"
+
+    def test_export_unknown_status(self, client: TestClient):
+        """Test filtering by a status that does not exist"""
+        response = client.get("/exports/bookings?status=shipped")
+        assert response.status_code == 400
+
+    def test_export_invalid_date(self, client: TestClient):
+        """Test a malformed date bound"""
+        response = client.get("/exports/payments?start=yesterday")
+        assert response.status_code == 400
+
+    def test_export_invalid_format(self, client: TestClient):
+        """Test an unsupported export format"""
+        response = client.get("/exports/bookings?format=xlsx")
+        assert response.status_code == 422
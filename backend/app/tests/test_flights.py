@@ -1,5 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
+from app.utils.batch import BATCH_GET_MAX_IDS
 
 
 class TestFlights:
@@ -42,3 +43,26 @@ class TestFlights:
         flight_id = "test_flight_id"
         response = client.delete(f"/flights/{flight_id}")
         assert response.status_code in [200, 204, 404]
+
+    def test_get_flights_by_ids(self, client: TestClient):
+        """Test getting several flights by id"""
+        response = client.get("/flights/?ids=507f1f77bcf86cd799439011,not_an_id")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["invalid"] == ["not_an_id"]
+        assert "missing" in body
+
+    def test_batch_get_flights(self, client: TestClient):
+        """Test batch-getting flights with a request body"""
+        response = client.post("/flights/batch-get", json={"ids": ["507f1f77bcf86cd799439011"]})
+        assert response.status_code == 200
+
+    def test_batch_get_flights_too_many_ids(self, client: TestClient):
+        """Test the request body is capped at BATCH_GET_MAX_IDS ids"""
+        response = client.post("/flights/batch-get", json={"ids": ["507f1f77bcf86cd799439011"] * (BATCH_GET_MAX_IDS + 1)})
+        assert response.status_code == 422
+
+    def test_get_flight_invalid_id(self, client: TestClient):
+        """Test a malformed flight id returns 404 rather than an error"""
+        response = client.get("/flights/not-an-object-id")
+        assert response.status_code == 404
@@ -0,0 +1,73 @@
+import pytest
+import asyncio
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from app import analytics
+from app.jobs import BOOKING_CREATED_JOBS, JOB_TYPES, backoff_delay, new_job, record_new_booking
+
+
+class FakeBookings:
+    """In-memory bookings supporting the conditional flag update"""
+
+    def __init__(self, bookings):
+        self.bookings = {b["_id"]: b for b in bookings}
+
+    async def find_one_and_update(self, query, update, projection=None):
+        booking = self.bookings.get(query["_id"])
+        if booking is None or booking.get("rollup_counted") == query["rollup_counted"]["$ne"]:
+            return None
+        before = dict(booking)
+        booking.update(update["$set"])
+        return before
+
+
+class FakeDB:
+    def __init__(self, bookings):
+        self.bookings = FakeBookings(bookings)
+
+
+class TestJobs:
+    """Test suite for the background job queue"""
+
+    def test_get_job_stats(self, client: TestClient):
+        """Test queue depth and worker counters"""
+        response = client.get("/jobs/stats")
+        assert response.status_code == 200
+        data = response.json()
+        assert "queue" in data
+        assert "workers" in data
+
+    def test_booking_jobs_registered(self):
+        """Test every post-booking job type has a handler"""
+        for job_type in BOOKING_CREATED_JOBS:
+            assert job_type in JOB_TYPES
+            assert JOB_TYPES[job_type].concurrency > 0
+
+    def test_new_job(self):
+        """Test a new job is queued and due immediately"""
+        job = new_job("booking_analytics", {"booking_id": "abc"})
+        assert job["status"] == "queued"
+        assert job["attempts"] == 0
+        assert job["max_attempts"] == JOB_TYPES["booking_analytics"].max_attempts
+        assert job["run_at"] <= job["created_at"]
+
+    def test_backoff_delay(self):
+        """Test backoff grows exponentially and is capped"""
+        assert 1 <= backoff_delay(1, base=2, cap=600) <= 3
+        assert 8 <= backoff_delay(4, base=2, cap=600) <= 24
+        assert backoff_delay(30, base=2, cap=600) <= 900
+
+    def test_booking_analytics_counts_once(self, monkeypatch):
+        """Test a re-run of the analytics job does not add the booking again"""
+        added = []
+
+        async def update_booking_rollups(db, before, after):
+            added.append(after["_id"])
+
+        monkeypatch.setattr(analytics, "update_booking_rollups", update_booking_rollups)
+        booking_id = ObjectId()
+        db = FakeDB([{"_id": booking_id, "flight_id": "f1", "status": "confirmed", "seats": 2}])
+        for _ in range(3):
+            asyncio.run(record_new_booking(db, {"booking_id": str(booking_id)}))
+        assert added == [booking_id]
+        assert db.bookings.bookings[booking_id]["rollup_counted"] is True
@@ -0,0 +1,69 @@
+import pytest
+import asyncio
+import random
+import httpx
+from fastapi import FastAPI
+from app.load_test import Recorder, is_saturated, run_stage
+
+# Stand-in for the funnel endpoints, so the runner can be tested without Mongo
+funnel = FastAPI()
+
+
+def _flight(_id: str, origin: str, destination: str, price: float) -> dict:
+    return {
+        "_id": _id, "origin": origin, "destination": destination, "price": price,
+        "departure_time": "2026-01-10T08:00:00", "arrival_time": "2026-01-10T14:00:00", "available_seats": 10
+    }
+
+
+@funnel.get("/search/flights")
+async def search_flights(origin: str, destination: str, departure_date: str, flex_days: int = 0):
+    """Same shape as the real route for a flexible-date search"""
+    direct = _flight("507f1f77bcf86cd799439011", origin, destination, 120.0)
+    first, second = _flight("507f1f77bcf86cd799439013", origin, "ORD", 60.0), _flight("507f1f77bcf86cd799439014", "ORD", destination, 50.0)
+    return {"days": [{"date": "2026-01-10", "results": [
+        {**direct, "is_direct": True, "total_duration": 360.0, "total_price": 120.0, "segments": [direct]},
+        {"is_direct": False, "total_duration": 480.0, "total_price": 110.0, "departure_time": first["departure_time"], "segments": [first, second]},
+    ]}]}
+
+
+@funnel.get("/flights/{flight_id}")
+async def get_flight(flight_id: str):
+    return {"_id": flight_id}
+
+
+@funnel.post("/bookings/")
+async def create_booking(booking: dict):
+    return {**booking, "id": "507f1f77bcf86cd799439012"}
+
+
+@funnel.post("/payments/")
+async def process_payment(payment: dict):
+    return payment
+
+
+class TestLoadTest:
+    """Test suite for the load test scenario runner"""
+
+    def test_recorder_summary(self):
+        """Test per-step percentiles and error rates"""
+        recorder = Recorder()
+        for i in range(100):
+            recorder.record("search", (i + 1) / 1000, error="500" if i < 5 else None)
+        summary = recorder.summary()["search"]
+        assert summary["requests"] == 100
+        assert summary["error_rate"] == 0.05
+        assert 49 <= summary["p50_ms"] <= 52
+        assert summary["max_ms"] == pytest.approx(100)
+
+    def test_run_stage(self):
+        """Test an open-loop stage runs every funnel step"""
+        random.seed(0)
+        stage = asyncio.run(run_stage(
+            "http://funnel", [("JFK", "LAX")], rate=200, duration=0.5, think_time=0,
+            max_sessions=50, transport=httpx.ASGITransport(app=funnel)
+        ))
+        assert stage["sessions"]["failed"] == 0
+        assert stage["error_rate"] == 0
+        assert set(stage["steps"]) == {"search", "flight_detail", "booking", "payment"}
+        assert not is_saturated(stage, slo_ms=10_000)
@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+class TestPriceWatches:
+    """Test suite for price watch routes"""
+
+    def test_create_price_watch(self, client: TestClient):
+        """Test subscribing to a route price"""
+        watch_data = {
+            "user_id": "test_user_id",
+            "origin": "jfk",
+            "destination": "lax",
+            "departure_date": "2025-11-05",
+            "max_price": 250.0
+        }
+        response = client.post("/price-watches/", json=watch_data)
+        assert response.status_code == 201
+        assert response.json()["origin"] == "JFK"
+
+    def test_create_price_watch_invalid_date(self, client: TestClient):
+        """Test creating a watch with a malformed date"""
+        watch_data = {
+            "user_id": "test_user_id",
+            "origin": "JFK",
+            "destination": "LAX",
+            "departure_date": "05/11/2025",
+            "max_price": 250.0
+        }
+        response = client.post("/price-watches/", json=watch_data)
+        assert response.status_code == 422
+
+    def test_get_user_price_watches(self, client: TestClient):
+        """Test listing a user's price watches"""
+        response = client.get("/price-watches/user/test_user_id")
+        assert response.status_code == 200
+
+    def test_delete_price_watch(self, client: TestClient):
+        """Test deleting a price watch"""
+        watch_id = "test_watch_id"
+        response = client.delete(f"/price-watches/{watch_id}")
+        assert response.status_code in [200, 404]
+
+    def test_malformed_watch_id(self, client: TestClient):
+        """Test a malformed id is a 404, not a server error"""
+        assert client.get("/price-watches/not-an-id").status_code == 404
+        assert client.delete("/price-watches/not-an-id").status_code == 404
@@ -0,0 +1,184 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from app import reconcile_payments as reconcile
+from app.utils.payment_gateways import FakeGateway, GatewayRecord, StripeGateway, STRIPE_STATUSES, _stripe_record
+
+
+def _records(n: int):
+    base = datetime(2026, 1, 1)
+    return [GatewayRecord(f"pi_{i}", "completed", 100.0, base + timedelta(minutes=i)) for i in range(n)]
+
+
+async def _collect(gateway, since=None, until=None):
+    return [page async for page in gateway.list_payments(since, until)]
+
+
+class FakePayments:
+    """In-memory payments supporting the calls reconciliation makes"""
+
+    def __init__(self, payments, concurrent_writes=None):
+        self.payments = {p["_id"]: p for p in payments}
+        # Status changes applied right after the read, as if written concurrently
+        self.concurrent_writes = concurrent_writes or {}
+
+    async def find(self, query, projection=None):
+        wanted = set(query["transaction_id"]["$in"])
+        for payment in list(self.payments.values()):
+            if payment["transaction_id"] in wanted:
+                yield dict(payment)
+        for _id, status in self.concurrent_writes.items():
+            self.payments[_id]["status"] = status
+
+    async def update_one(self, query, update):
+        payment = self.payments.get(query["_id"])
+        if payment is None or payment["status"] != query["status"]:
+            return SimpleNamespace(matched_count=0)
+        payment.update(update["$set"])
+        return SimpleNamespace(matched_count=1)
+
+
+class FakeDiscrepancies:
+    def __init__(self):
+        self.issues = {}
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            self.issues[operation._filter["_id"]] = operation._doc["$set"]["issue"]
+
+
+class FakeDB:
+    def __init__(self, payments, concurrent_writes=None):
+        self.payments = FakePayments(payments, concurrent_writes)
+        self.discrepancies = FakeDiscrepancies()
+
+    def __getitem__(self, name):
+        assert name == reconcile.DISCREPANCIES_COLLECTION
+        return self.discrepancies
+
+
+def _payment(i: int, status: str = "completed", amount: float = 100.0) -> dict:
+    return {"_id": f"p{i}", "transaction_id": f"pi_{i}", "status": status, "amount": amount, "booking_id": f"b{i}"}
+
+
+@pytest.fixture
+def rollup_changes(monkeypatch):
+    changes = []
+
+    async def record(db, before, after):
+        changes.append((before["status"], after["status"]))
+
+    monkeypatch.setattr(reconcile, "record_payment_change", record)
+    return changes
+
+
+class TestReconcilePayments:
+    """Test suite for reconciling local payments with gateway pages"""
+
+    def test_reconcile_outcomes(self, rollup_changes):
+        """Test matched, updated, amount mismatch and missing local payments"""
+        db = FakeDB([_payment(0), _payment(1, status="pending"), _payment(2, amount=90.0)])
+        records = [
+            GatewayRecord("pi_0", "completed", 100.0, datetime(2026, 1, 1)),
+            GatewayRecord("pi_1", "completed", 100.0, datetime(2026, 1, 1)),
+            GatewayRecord("pi_2", "completed", 100.0, datetime(2026, 1, 1)),
+            GatewayRecord("pi_3", "completed", 50.0, datetime(2026, 1, 1)),
+        ]
+        report = asyncio.run(reconcile.reconcile_payments(db, FakeGateway(records), since=datetime(2025, 1, 1)))
+
+        assert report["checked"] == 4
+        assert report["matched"] == 2
+        assert report["status_updated"] == 1
+        assert report["amount_mismatch"] == 1
+        assert report["missing_local"] == 1
+        assert db.payments.payments["p1"]["status"] == "completed"
+        assert rollup_changes == [("pending", "completed")]
+        assert db.discrepancies.issues == {"pi_2": "amount_mismatch", "pi_3": "missing_local"}
+
+    def test_local_refund_not_reset(self, rollup_changes):
+        """Test a payment refunded locally but not at the gateway is flagged, not reset"""
+        db = FakeDB([_payment(0, status="refunded")])
+        report = reconcile._new_report()
+        asyncio.run(reconcile.reconcile_page(db, [GatewayRecord("pi_0", "completed", 100.0, datetime(2026, 1, 1))], report))
+
+        assert report["refund_mismatch"] == 1
+        assert report["status_updated"] == 0
+        assert db.payments.payments["p0"]["status"] == "refunded"
+        assert db.discrepancies.issues == {"pi_0": "refund_mismatch"}
+        assert rollup_changes == []
+
+    def test_gateway_refund_applied(self, rollup_changes):
+        """Test a refund made at the gateway moves the local payment out of revenue"""
+        db = FakeDB([_payment(0)])
+        report = reconcile._new_report()
+        asyncio.run(reconcile.reconcile_page(db, [GatewayRecord("pi_0", "refunded", 100.0, datetime(2026, 1, 1))], report))
+
+        assert report["status_updated"] == 1
+        assert db.payments.payments["p0"]["status"] == "refunded"
+        assert rollup_changes == [("completed", "refunded")]
+
+    def test_concurrent_change_skips_rollups(self, rollup_changes):
+        """Test an update whose status guard no longer matches does not move rollups"""
+        db = FakeDB([_payment(0, status="pending")], concurrent_writes={"p0": "failed"})
+        report = reconcile._new_report()
+        asyncio.run(reconcile.reconcile_page(db, [GatewayRecord("pi_0", "completed", 100.0, datetime(2026, 1, 1))], report))
+
+        assert report["conflicts"] == 1
+        assert report["status_updated"] == 0
+        assert db.payments.payments["p0"]["status"] == "failed"
+        assert rollup_changes == []
+
+
+class TestPaymentGateways:
+    """Test suite for the gateway list adapters used by reconciliation"""
+
+    def test_fake_gateway_pages(self):
+        """Test records are served in full pages, one call per page"""
+        gateway = FakeGateway(_records(250), page_size=100)
+        pages = asyncio.run(_collect(gateway))
+        assert [len(page) for page in pages] == [100, 100, 50]
+        assert gateway.list_calls == 3
+
+    def test_fake_gateway_window(self):
+        """Test the since/until creation window"""
+        gateway = FakeGateway(_records(100))
+        pages = asyncio.run(_collect(gateway, datetime(2026, 1, 1, 0, 10), datetime(2026, 1, 1, 0, 20)))
+        ids = [r.transaction_id for page in pages for r in page]
+        assert ids == [f"pi_{i}" for i in range(10, 20)]
+
+    def test_stripe_status_mapping(self):
+        """Test gateway states map onto payment statuses"""
+        assert STRIPE_STATUSES["succeeded"] == "completed"
+        assert STRIPE_STATUSES["canceled"] == "failed"
+        assert STRIPE_STATUSES["processing"] == "pending"
+
+    def test_stripe_gateway_credentials(self, monkeypatch):
+        """Test the Stripe key comes from the environment and is sent on every call"""
+        import stripe
+
+        monkeypatch.delenv("STRIPE_SECRET_KEY", raising=False)
+        with pytest.raises(ValueError):
+            StripeGateway()
+
+        calls = []
+
+        def list_intents(**params):
+            calls.append(params)
+            intent = SimpleNamespace(id="pi_0", status="succeeded", amount=12345, created=1767225600)
+            return SimpleNamespace(data=[intent], has_more=False)
+
+        monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_env")
+        monkeypatch.setattr(stripe.PaymentIntent, "list", list_intents)
+        pages = asyncio.run(_collect(StripeGateway()))
+        assert calls[0]["api_key"] == "sk_test_env"
+        assert pages == [[GatewayRecord("pi_0", "completed", 123.45, datetime(2026, 1, 1), "succeeded")]]
+        assert calls[0]["expand"] == ["data.latest_charge"]
+
+    def test_stripe_refund_visible_on_charge(self):
+        """Test a fully refunded charge marks its succeeded PaymentIntent refunded"""
+        charge = SimpleNamespace(id="ch_0", refunded=True)
+        intent = SimpleNamespace(id="pi_0", status="succeeded", amount=100, created=1767225600, latest_charge=charge)
+        assert _stripe_record(intent).status == "refunded"
+        intent.latest_charge = "ch_0"
+        assert _stripe_record(intent).status == "completed"
@@ -0,0 +1,105 @@
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.models import Flight, FlightStatus
+from app.utils.responses import FastJSONResponse, json_response
+
+
+def _standard_body(content) -> bytes:
+    """Render content the way FastAPI does without the fast path"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def _search_result(i: int, departure: datetime) -> dict:
+    flight = {
+        "_id": str(ObjectId()),
+        "flight_number": f"AA{100 + i}",
+        "airline_id": str(ObjectId()),
+        "origin": "JFK",
+        "destination": "LAX",
+        "departure_time": departure,
+        "arrival_time": departure + timedelta(hours=5, minutes=37),
+        "price": 199.99 + i,
+        "available_seats": 42,
+        "total_seats": 180,
+        "aircraft_type": "Airbus A320",
+        "status": "scheduled",
+        "is_direct": True,
+        "total_duration": 337.0,
+        "total_price": 199.99 + i,
+    }
+    flight["segments"] = [dict(flight)]
+    return flight
+
+
+class TestFastJSONResponse:
+    """Equivalence suite for the orjson response path"""
+
+    @pytest.mark.parametrize("departure", [
+        datetime(2025, 11, 5, 10, 0),
+        datetime(2025, 11, 5, 10, 0, 0, 123456),
+        datetime(2025, 11, 5, 10, 0, tzinfo=timezone.utc),
+        datetime(2025, 11, 5, 10, 0, tzinfo=timezone(timedelta(hours=-5))),
+    ])
+    def test_search_results_match_standard_encoder(self, departure: datetime):
+        """Test search results render byte-identically to the standard path"""
+        content = [_search_result(i, departure) for i in range(100)]
+        assert FastJSONResponse(content).body == _standard_body(content)
+
+    def test_connection_result_matches_standard_encoder(self):
+        """Test nested connection results render identically"""
+        first = _search_result(0, datetime(2025, 11, 5, 8, 0))
+        second = _search_result(1, datetime(2025, 11, 5, 15, 30))
+        content = [{
+            "_id": f"{first['_id']}-{second['_id']}",
+            "is_direct": False,
+            "origin": "JFK",
+            "destination": "DXB",
+            "departure_time": first["departure_time"],
+            "arrival_time": second["arrival_time"],
+            "total_price": 1234.5,
+            "total_duration": 812.0,
+            "segments": [first, second],
+            "layover": {"airport": "LHR", "duration": 112.5},
+            "stops": 1,
+        }]
+        assert FastJSONResponse(content).body == _standard_body(content)
+
+    def test_unicode_and_special_values(self):
+        """Test non-ASCII text, None and nested empty containers"""
+        content = {"city": "São Paulo", "name": "Montréal", "logo_url": None, "tags": [], "meta": {}}
+        assert FastJSONResponse(content).body == _standard_body(content)
+
+    def test_enum_and_model_values(self):
+        """Test enums and Pydantic models are encoded like jsonable_encoder"""
+        flight = Flight(
+            id="abc",
+            flight_number="AA123",
+            airline_id="1",
+            origin="JFK",
+            destination="LAX",
+            departure_time=datetime(2025, 11, 5, 10, 0),
+            arrival_time=datetime(2025, 11, 5, 13, 0),
+            price=250.0,
+            available_seats=10,
+            total_seats=180,
+            status=FlightStatus.DELAYED
+        )
+        content = [flight, {"status": FlightStatus.CANCELLED}]
+        assert json.loads(FastJSONResponse(content).body) == json.loads(_standard_body(content))
+
+    def test_object_id_encoded_as_string(self):
+        """Test raw ObjectId values are rendered as strings"""
+        oid = ObjectId()
+        assert json.loads(FastJSONResponse({"_id": oid}).body) == {"_id": str(oid)}
+
+    def test_json_response_opt_in(self):
+        """Test the helper only wraps content when enabled"""
+        content = [{"a": 1}]
+        assert json_response(content, enabled=False) is content
+        response = json_response(content, enabled=True)
+        assert isinstance(response, FastJSONResponse)
+        assert response.media_type == "application/json"
@@ -1,5 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
+from app.utils.flight_search import parse_fields, pareto_front, rank_results
 
 
 class TestSearch:
@@ -43,3 +44,99 @@ class TestSearch:
         """Test getting popular routes with default limit"""
         response = client.get("/search/popular-routes")
         assert response.status_code == 200
+
+    def test_search_flights_with_fields(self, client: TestClient):
+        """Test searching flights with a field projection"""
+        response = client.get(
+            "/search/flights?origin=JFK&destination=LAX&fields=flight_number,airline_id"
+        )
+        assert response.status_code == 200
+
+    def test_search_flights_compact_format(self, client: TestClient):
+        """Test searching flights in the compact v2 format"""
+        response = client.get("/search/flights?origin=JFK&destination=LAX&format=v2")
+        assert response.status_code == 200
+        body = response.json()
+        assert "flights" in body
+        assert all(
+            segment_id in body["flights"]
+            for result in body["results"]
+            for segment_id in result["segments"]
+        )
+
+    def test_search_flights_flexible_dates(self, client: TestClient):
+        """Test searching flights across a flexible date window"""
+        response = client.get(
+            "/search/flights?origin=JFK&destination=LAX&departure_date=2025-11-05&flex_days=3"
+        )
+        assert response.status_code == 200
+        assert "days" in response.json()
+
+    def test_search_flights_flexible_dates_requires_date(self, client: TestClient):
+        """Test flex_days without a departure date is rejected"""
+        response = client.get("/search/flights?origin=JFK&destination=LAX&flex_days=2")
+        assert response.status_code == 400
+
+    def test_get_coalescing_stats(self, client: TestClient):
+        """Test getting search coalescing counters"""
+        response = client.get("/search/coalescing-stats")
+        assert response.status_code == 200
+        assert "saved" in response.json()
+
+    @pytest.mark.parametrize("sort", ["price", "duration", "best"])
+    def test_search_flights_sorted(self, client: TestClient, sort: str):
+        """Test searching flights with a ranking order"""
+        response = client.get(f"/search/flights?origin=JFK&destination=LAX&sort={sort}")
+        assert response.status_code == 200
+
+    def test_search_flights_expanded(self, client: TestClient):
+        """Test searching flights with airline and airport details"""
+        response = client.get("/search/flights?origin=JFK&destination=LAX&expand=airline,airport")
+        assert response.status_code == 200
+
+    def test_search_flights_invalid_expand(self, client: TestClient):
+        """Test an unknown expand option is rejected"""
+        response = client.get("/search/flights?origin=JFK&destination=LAX&expand=aircraft")
+        assert response.status_code == 400
+
+
+def _option(price: float, duration: int, stops: int, score: float) -> dict:
+    return {"total_price": price, "total_duration": duration, "stops": stops, "score": score}
+
+
+class TestRanking:
+    """Test suite for merging and ranking search results"""
+
+    def test_pareto_front(self):
+        """Test dominated options are excluded and equal options are kept"""
+        cheap = _option(100, 600, 1, 3)
+        fast = _option(300, 120, 0, 2)
+        twin = _option(300, 120, 0, 2)
+        dominated = _option(350, 130, 0, 1)
+        slow_direct = _option(200, 700, 0, 4)
+        front = pareto_front([dominated, cheap, fast, twin, slow_direct])
+        assert {id(o) for o in front} == {id(cheap), id(fast), id(twin), id(slow_direct)}
+
+    def test_best_sort_puts_front_first(self):
+        """Test best ranking returns the front by score, then the rest up to limit"""
+        direct = [_option(350, 130, 0, 1), _option(300, 120, 0, 2)]
+        connections = [_option(100, 600, 1, 3), _option(400, 650, 1, 4)]
+        ranked = rank_results(direct, connections, "best", 3)
+        assert [o["score"] for o in ranked] == [2, 3, 1]
+
+
+class TestFields:
+    """Test suite for the fields parameter of flight search"""
+
+    def test_parse_fields(self):
+        """Test known flight fields are de-duplicated and sorted"""
+        assert parse_fields("price, flight_number,price") == ["flight_number", "price"]
+        assert parse_fields(None) is None
+        assert parse_fields(" , ") is None
+
+    def test_unknown_fields_rejected(self):
+        """Test operators, nested paths and unknown names are rejected"""
+        for fields in ("$where", "price.amount", "a..b", "password"):
+            with pytest.raises(ValueError):
+                parse_fields(fields)
+
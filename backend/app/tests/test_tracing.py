@@ -0,0 +1,84 @@
+import pytest
+import json
+from app import tracing
+from app.tracing import (
+    FileSpanExporter,
+    InMemorySpanExporter,
+    configure_tracing,
+    parse_traceparent,
+    should_sample,
+    span,
+    start_trace,
+)
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemorySpanExporter()
+    configure_tracing(exporter)
+    yield exporter
+    configure_tracing(None)
+
+
+class TestTracing:
+    """Test suite for request tracing"""
+
+    def test_parse_traceparent(self):
+        """Test W3C traceparent parsing"""
+        parsed = parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+        assert parsed == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)
+        assert parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00")[2] is False
+        assert parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+        assert parse_traceparent("garbage") is None
+
+    def test_sampling_ratio(self):
+        """Test ratio sampling is deterministic per trace id"""
+        assert should_sample("0" * 32, 0.5)
+        assert not should_sample("f" * 32, 0.5)
+        assert not should_sample("0" * 31 + "1", 0.0)
+
+    def test_child_spans(self, exporter):
+        """Test nested spans share the trace and point at their parent"""
+        with start_trace("GET /search/flights", ratio=1.0) as root:
+            with span("search.direct", origin="JFK") as child:
+                pass
+        spans = {s.name: s for s in exporter.get_finished_spans()}
+        assert child.parent_span_id == root.span_id
+        assert spans["search.direct"].trace_id == root.trace_id
+        assert spans["search.direct"].attributes["origin"] == "JFK"
+
+    def test_unsampled_is_noop(self, exporter):
+        """Test nothing is recorded for unsampled traces"""
+        with start_trace("GET /flights", ratio=0.0) as root:
+            with span("search.direct") as child:
+                assert root is None
+                assert child is None
+        assert exporter.get_finished_spans() == []
+
+    def test_continues_incoming_trace(self, exporter):
+        """Test the caller's trace id and sampled flag are used"""
+        with start_trace("GET /flights", "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01", ratio=0.0) as root:
+            pass
+        assert root.trace_id == "0af7651916cd43dd8448eb211c80319c"
+        assert root.parent_span_id == "b7ad6b7169203331"
+
+    def test_error_status(self, exporter):
+        """Test an exception marks the span as failed"""
+        with pytest.raises(ValueError):
+            with start_trace("job", ratio=1.0):
+                raise ValueError("boom")
+        assert exporter.get_finished_spans()[0].status == tracing.STATUS_ERROR
+
+    def test_file_exporter(self, tmp_path):
+        """Test spans are written as OTLP/JSON when the server span ends"""
+        path = tmp_path / "traces.jsonl"
+        configure_tracing(FileSpanExporter(str(path)))
+        try:
+            with start_trace("GET /flights", ratio=1.0):
+                with span("search.direct"):
+                    pass
+        finally:
+            configure_tracing(None)
+        request = json.loads(path.read_text().splitlines()[0])
+        spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert [s["name"] for s in spans] == ["search.direct", "GET /flights"]
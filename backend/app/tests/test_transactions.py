@@ -0,0 +1,106 @@
+import pytest
+import asyncio
+from pymongo.errors import OperationFailure
+from app.utils import checkout
+from app.utils.transactions import run_in_transaction, supports_transactions
+
+
+class FakeSession:
+    """Records the transaction calls made on it"""
+
+    def __init__(self):
+        self.in_transaction = False
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def start_transaction(self, **kwargs):
+        self.in_transaction = True
+        self.calls.append("start")
+
+    async def abort_transaction(self):
+        self.in_transaction = False
+        self.calls.append("abort")
+
+    async def commit_transaction(self):
+        self.in_transaction = False
+        self.calls.append("commit")
+
+
+class FakeAdmin:
+    def __init__(self, hello):
+        self.hello = hello
+
+    async def command(self, name):
+        return self.hello
+
+
+class FakeClient:
+    def __init__(self, hello=None):
+        self.session = FakeSession()
+        self.admin = FakeAdmin(hello or {})
+
+    async def start_session(self):
+        return self.session
+
+
+def _write_conflict():
+    error = OperationFailure("WriteConflict", 112)
+    error._add_error_label("TransientTransactionError")
+    return error
+
+
+class TestTransactions:
+    """Test suite for the bounded transaction retry loop"""
+
+    def test_retries_transient_errors(self):
+        """Test a write conflict is retried until the commit succeeds"""
+        client, attempts = FakeClient(), []
+
+        async def callback(session):
+            attempts.append(session)
+            if len(attempts) < 3:
+                raise _write_conflict()
+            return "booked"
+
+        assert asyncio.run(run_in_transaction(client, callback)) == "booked"
+        assert client.session.calls == ["start", "abort", "start", "abort", "start", "commit"]
+
+    def test_retry_budget_exhausted(self):
+        """Test retries stop after max_attempts"""
+        client = FakeClient()
+
+        async def callback(session):
+            raise _write_conflict()
+
+        with pytest.raises(OperationFailure):
+            asyncio.run(run_in_transaction(client, callback, max_attempts=2))
+        assert client.session.calls == ["start", "abort", "start", "abort"]
+
+    def test_other_errors_abort_once(self):
+        """Test non-transient errors are not retried"""
+        client = FakeClient()
+
+        async def callback(session):
+            raise ValueError("sold out")
+
+        with pytest.raises(ValueError):
+            asyncio.run(run_in_transaction(client, callback))
+        assert client.session.calls == ["start", "abort"]
+
+    def test_standalone_falls_back_to_separate_writes(self):
+        """Test transactions are only used against a replica set or mongos"""
+        assert asyncio.run(supports_transactions(FakeClient({"setName": "rs0"})))
+        assert asyncio.run(supports_transactions(FakeClient({"msg": "isdbgrid"})))
+        assert not asyncio.run(supports_transactions(FakeClient({"isWritablePrimary": True})))
+
+    def test_startup_check_disables_booking_transactions(self, monkeypatch):
+        """Test BOOKING_TRANSACTIONS is turned off on a standalone server"""
+        monkeypatch.setattr(checkout, "BOOKING_TRANSACTIONS", True)
+        assert asyncio.run(checkout.check_booking_transactions(FakeClient({"setName": "rs0"})))
+        assert not asyncio.run(checkout.check_booking_transactions(FakeClient({})))
+        assert checkout.BOOKING_TRANSACTIONS is False
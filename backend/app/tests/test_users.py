@@ -57,3 +57,16 @@ class TestUsers:
         user_id = "test_user_id"
         response = client.get(f"/users/{user_id}/bookings")
         assert response.status_code in [200, 404]
+
+    def test_get_user_bookings_paginated(self, client: TestClient):
+        """Test paging through a user's bookings"""
+        user_id = "test_user_id"
+        response = client.get(f"/users/{user_id}/bookings?status=confirmed&limit=10")
+        assert response.status_code == 200
+        assert "next_cursor" in response.json()
+
+    def test_get_user_bookings_invalid_cursor(self, client: TestClient):
+        """Test a malformed pagination cursor is rejected"""
+        user_id = "test_user_id"
+        response = client.get(f"/users/{user_id}/bookings?cursor=not-a-cursor")
+        assert response.status_code == 400
@@ -0,0 +1,375 @@
+from contextvars import ContextVar
+from pymongo import monitoring
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING", "false").lower() in ("1", "true", "yes")
+# Fraction of new traces recorded; requests carrying a traceparent follow
+# the caller's sampled flag instead
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "0.01"))
+# "file" (OTLP/JSON lines, readable by the collector's otlpjsonfile
+# receiver) or "memory" (kept in-process, for tests and ad-hoc debugging)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "file")
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "flight-booking-backend")
+
+# Spans buffered before the file exporter writes a line
+TRACE_EXPORT_BATCH = 256
+
+SPAN_KIND_SERVER, SPAN_KIND_INTERNAL, SPAN_KIND_CLIENT = 2, 1, 3
+STATUS_UNSET, STATUS_OK, STATUS_ERROR = 0, 1, 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+class Span:
+    """A timed operation; field names follow the OTLP span model"""
+
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "kind", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, trace_id: str, parent_span_id: Optional[str], name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = attributes or {}
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def end(self, end_ns: Optional[int] = None):
+        self.end_ns = end_ns or time.time_ns()
+        if _exporter is not None:
+            _exporter.export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, **({"message": self.status_message} if self.status_message else {})},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class InMemorySpanExporter:
+    """Keeps finished spans in a list"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def get_finished_spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            return [s for s in self.spans if trace_id is None or s.trace_id == trace_id]
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def flush(self):
+        pass
+
+
+class FileSpanExporter:
+    """Appends batches of finished spans to a file, one OTLP/JSON ExportTraceServiceRequest per line"""
+
+    def __init__(self, path: str = TRACE_FILE, batch_size: int = TRACE_EXPORT_BATCH):
+        self.path = path
+        self.batch_size = batch_size
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._buffer.append(span)
+            # Flush at batch size or when a request's server span ends
+            if len(self._buffer) < self.batch_size and span.kind != SPAN_KIND_SERVER:
+                return
+            batch, self._buffer = self._buffer, []
+        self._write(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch: List[Span]):
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": [s.to_otlp() for s in batch]}],
+        }]}
+        try:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(request, separators=(",", ":")) + "\n")
+        except OSError as e:
+            logger.warning(f"Error writing {len(batch)} spans to {self.path}: {str(e)}")
+
+
+_exporter = None
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def configure_tracing(exporter=None):
+    """Install the exporter spans are sent to (None stops recording)"""
+    global _exporter
+    if _exporter is not None:
+        _exporter.flush()
+    _exporter = exporter
+
+
+def get_exporter():
+    return _exporter
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def should_sample(trace_id: str, ratio: float = TRACE_SAMPLE_RATIO) -> bool:
+    """Deterministic ratio sampling on the low 64 bits of the trace id"""
+    return int(trace_id[16:], 16) < ratio * (1 << 64)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace id, parent span id, sampled) from a W3C traceparent header"""
+    match = _TRACEPARENT.match(header.strip().lower()) if header else None
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+class _SpanContext:
+    """Context manager making a span current for its duration"""
+
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: Span):
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.span.set_error(f"{exc_type.__name__}: {exc}")
+        self.span.end()
+        return False
+
+
+class _NoopSpanContext:
+    """Returned when the current request is not sampled; costs one context lookup"""
+
+    span = None
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpanContext()
+
+
+def span(name: str, **attributes):
+    """
+    Child span of the current span, as a context manager
+
+    Outside a sampled trace this is a shared no-op, so phases can be
+    instrumented unconditionally.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP
+    return _SpanContext(Span(parent.trace_id, parent.span_id, name, SPAN_KIND_INTERNAL, attributes))
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, kind: int = SPAN_KIND_SERVER, ratio: float = TRACE_SAMPLE_RATIO, **attributes):
+    """
+    Root span of a request or job, continuing an incoming traceparent
+
+    Returns a no-op context when tracing is not configured or the trace is
+    not sampled.
+    """
+    if _exporter is None:
+        return _NOOP
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_span_id, sampled = parent
+    else:
+        trace_id, parent_span_id = f"{random.getrandbits(128):032x}", None
+        sampled = should_sample(trace_id, ratio)
+    if not sampled:
+        return _NOOP
+    return _SpanContext(Span(trace_id, parent_span_id, name, kind, attributes))
+
+
+def format_traceparent(span: Span) -> str:
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+
+def install_log_correlation():
+    """
+    Give every log record the trace_id and span_id of the current span
+
+    Set on the record factory rather than a handler filter, so formats of
+    any handler (uvicorn's and gunicorn's included) can use %(trace_id)s.
+    """
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "_adds_trace_context", False):
+        return
+
+    def record_with_trace(*args, **kwargs) -> logging.LogRecord:
+        record = factory(*args, **kwargs)
+        current = _current_span.get()
+        record.trace_id = current.trace_id if current else ""
+        record.span_id = current.span_id if current else ""
+        return record
+
+    record_with_trace._adds_trace_context = True
+    logging.setLogRecordFactory(record_with_trace)
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """
+    Client span per MongoDB command of a sampled request
+
+    Motor runs commands on executor threads with a copy of the caller's
+    context, so the current span is visible here. Command bodies are not
+    recorded, only their name and collection.
+    """
+
+    def __init__(self):
+        self._spans: Dict[Tuple, Span] = {}
+
+    def started(self, event):
+        parent = _current_span.get()
+        if parent is None:
+            return
+        collection = event.command.get(event.command_name)
+        attributes = {
+            "db.system": "mongodb",
+            "db.operation.name": event.command_name,
+            "db.namespace": event.database_name,
+        }
+        if isinstance(collection, str):
+            attributes["db.collection.name"] = collection
+        if event.connection_id:
+            attributes["server.address"] = str(event.connection_id[0])
+        self._spans[(event.connection_id, event.request_id)] = Span(
+            parent.trace_id, parent.span_id, f"{event.command_name} {collection if isinstance(collection, str) else event.database_name}",
+            SPAN_KIND_CLIENT, attributes
+        )
+
+    def succeeded(self, event):
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.end(span.start_ns + event.duration_micros * 1000)
+
+    def failed(self, event):
+        span = self._spans.pop((event.connection_id, event.request_id), None)
+        if span is not None:
+            span.set_error(str(getattr(event, "failure", {}).get("errmsg", "command failed")))
+            span.end(span.start_ns + event.duration_micros * 1000)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware starting a server span per request
+
+    Continues an incoming W3C traceparent, names the span after the matched
+    route template and returns the trace id in ``X-Trace-Id`` so a slow
+    response can be looked up.
+    """
+
+    def __init__(self, app, ratio: float = TRACE_SAMPLE_RATIO):
+        self.app = app
+        self.ratio = ratio
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = dict(scope["headers"]).get(b"traceparent")
+        context = start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent.decode("latin-1") if traceparent else None,
+            ratio=self.ratio,
+            **{"http.request.method": scope["method"], "url.path": scope["path"]}
+        )
+        with context as root:
+            if root is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        root.set_error(f"HTTP {message['status']}")
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"x-trace-id", root.trace_id.encode())]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    root.name = f"{scope['method']} {route.path}"
+                    root.set_attribute("http.route", route.path)
+
+
+def setup_tracing() -> Optional[Any]:
+    """Configure the exporter and log correlation from the environment"""
+    if not TRACING_ENABLED:
+        return None
+    exporter = InMemorySpanExporter() if TRACE_EXPORTER == "memory" else FileSpanExporter(TRACE_FILE)
+    configure_tracing(exporter)
+    install_log_correlation()
+    logger.info(f"Tracing {TRACE_SAMPLE_RATIO:.2%} of requests to the {TRACE_EXPORTER} exporter")
+    return exporter
@@ -0,0 +1,108 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Snapshot of airport code -> IANA timezone name, loaded from the airports collection
+_airport_timezones: Dict[str, str] = {}
+_loaded = False
+
+DayWindow = Tuple[date, datetime, datetime]
+
+
+async def load_airport_timezones(db: AsyncIOMotorDatabase) -> Dict[str, str]:
+    """(Re)load the airport timezone snapshot from the database"""
+    global _airport_timezones, _loaded
+    snapshot = {}
+    async for airport in db.airports.find({}, {"code": 1, "timezone": 1}):
+        if airport.get("code") and airport.get("timezone"):
+            snapshot[airport["code"].upper()] = airport["timezone"]
+    _airport_timezones = snapshot
+    _loaded = True
+    logger.info(f"Loaded timezones for {len(snapshot)} airports")
+    return snapshot
+
+
+def set_airport_timezones(snapshot: Dict[str, str]):
+    """Replace the snapshot (used when reference data is reloaded)"""
+    global _airport_timezones, _loaded
+    _airport_timezones = dict(snapshot)
+    _loaded = True
+
+
+async def ensure_airport_timezones(db: AsyncIOMotorDatabase):
+    """Load the snapshot on first use"""
+    if not _loaded:
+        await load_airport_timezones(db)
+
+
+def get_airport_timezone(code: str) -> str:
+    """Return the timezone of an airport, UTC when unknown"""
+    return _airport_timezones.get(code.upper(), "UTC")
+
+
+@lru_cache(maxsize=1024)
+def _zone(tz_name: str):
+    try:
+        return ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown timezone {tz_name}, using UTC")
+        return timezone.utc
+
+
+def local_date(code: str, utc_time: datetime) -> date:
+    """Local calendar date at an airport of a UTC time (naive values are taken as UTC)"""
+    if utc_time.tzinfo is None:
+        utc_time = utc_time.replace(tzinfo=timezone.utc)
+    return utc_time.astimezone(_zone(get_airport_timezone(code))).date()
+
+
+@lru_cache(maxsize=16384)
+def _utc_window(tz_name: str, day: date) -> Tuple[datetime, datetime]:
+    """
+    UTC bounds of a local calendar day, as naive datetimes (how Mongo stores them)
+
+    Cached per (timezone, day) so repeated searches do no zoneinfo work.
+    """
+    tz = _zone(tz_name)
+    start = datetime(day.year, day.month, day.day, tzinfo=tz)
+    next_day = day + timedelta(days=1)
+    end = datetime(next_day.year, next_day.month, next_day.day, tzinfo=tz)
+    return (
+        start.astimezone(timezone.utc).replace(tzinfo=None),
+        end.astimezone(timezone.utc).replace(tzinfo=None),
+    )
+
+
+def local_day_windows(code: str, departure_date: datetime, flex_days: int = 0) -> List[DayWindow]:
+    """
+    UTC windows of the local days around a departure date at an airport
+
+    Args:
+        code: Airport IATA code whose local time defines the days
+        departure_date: Requested local departure date
+        flex_days: Number of days before and after to include
+
+    Returns:
+        List of (local date, utc_start, utc_end) in date order
+    """
+    tz_name = get_airport_timezone(code)
+    center = departure_date.date()
+    windows = []
+    for offset in range(-flex_days, flex_days + 1):
+        day = center + timedelta(days=offset)
+        start, end = _utc_window(tz_name, day)
+        windows.append((day, start, end))
+    return windows
+
+
+def local_day_of(departure_time: datetime, windows: List[DayWindow]) -> Optional[date]:
+    """Return the local date whose window contains a UTC departure time"""
+    for day, start, end in windows:
+        if start <= departure_time < end:
+            return day
+    return None
@@ -0,0 +1,73 @@
+from fastapi import HTTPException
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from typing import Dict, Iterable, List, Tuple
+import asyncio
+import os
+
+# Large id lists are split into $in queries of this size, run with bounded concurrency
+BATCH_GET_CHUNK_SIZE = int(os.getenv("BATCH_GET_CHUNK_SIZE", "500"))
+BATCH_GET_CONCURRENCY = int(os.getenv("BATCH_GET_CONCURRENCY", "4"))
+BATCH_GET_MAX_IDS = int(os.getenv("BATCH_GET_MAX_IDS", "1000"))
+
+
+def parse_object_id(value: str, detail: str = "Not found") -> ObjectId:
+    """Parse a path id, answering 404 instead of failing on malformed ids"""
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=404, detail=detail)
+    return ObjectId(value)
+
+
+def parse_ids(ids: Iterable[str]) -> Tuple[List[ObjectId], List[str]]:
+    """Split ids into unique valid ObjectIds (in first-seen order) and invalid strings"""
+    valid: Dict[ObjectId, None] = {}
+    invalid = []
+    for value in ids:
+        if ObjectId.is_valid(value):
+            valid.setdefault(ObjectId(value), None)
+        else:
+            invalid.append(value)
+    return list(valid), invalid
+
+
+async def find_by_ids(
+    collection: AsyncIOMotorCollection,
+    ids: List[ObjectId],
+    chunk_size: int = BATCH_GET_CHUNK_SIZE,
+    concurrency: int = BATCH_GET_CONCURRENCY
+) -> Dict[ObjectId, Dict]:
+    """Load documents by _id with chunked $in queries; returns a mapping of _id to document"""
+    if not ids:
+        return {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(chunk: List[ObjectId]) -> List[Dict]:
+        async with semaphore:
+            return await collection.find({"_id": {"$in": chunk}}).to_list(length=len(chunk))
+
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    results = await asyncio.gather(*(load(chunk) for chunk in chunks))
+    return {doc["_id"]: doc for docs in results for doc in docs}
+
+
+def ordered_batch_response(requested: List[str], found: Dict[ObjectId, Dict], key: str) -> Dict:
+    """
+    Build a batch-get response in request order
+
+    Returns:
+        ``{key: [...], "missing": [...], "invalid": [...]}`` where missing ids
+        are well-formed but not found
+    """
+    items, missing, invalid = [], [], []
+    for value in requested:
+        if not ObjectId.is_valid(value):
+            invalid.append(value)
+            continue
+        document = found.get(ObjectId(value))
+        if document is None:
+            missing.append(value)
+            continue
+        item = {k: v for k, v in document.items() if k != "_id"}
+        item["id"] = value
+        items.append(item)
+    return {key: items, "missing": missing, "invalid": invalid}
@@ -0,0 +1,210 @@
+from bson import ObjectId
+from datetime import datetime
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from typing import Dict, List, Optional, Tuple
+from app.analytics import FLIGHT_FIELDS
+from app.jobs import BOOKING_CREATED_JOBS, JOBS_COLLECTION, new_job
+from app.utils.batch import parse_object_id
+from app.utils.transactions import is_transient, run_in_transaction, supports_transactions
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Commit seat decrement, booking, payment and jobs in one transaction (needs a
+# replica set or sharded cluster, checked at startup by
+# check_booking_transactions); when disabled they are separate writes in that order
+BOOKING_TRANSACTIONS = os.getenv("BOOKING_TRANSACTIONS", "false").lower() in ("1", "true", "yes")
+
+
+async def check_booking_transactions(client: AsyncIOMotorClient) -> bool:
+    """Turn BOOKING_TRANSACTIONS off if the server cannot run transactions"""
+    global BOOKING_TRANSACTIONS
+    if BOOKING_TRANSACTIONS and not await supports_transactions(client):
+        logger.warning("BOOKING_TRANSACTIONS is set but MongoDB is not a replica set, using separate writes")
+        BOOKING_TRANSACTIONS = False
+    return BOOKING_TRANSACTIONS
+
+
+async def _place_booking_writes(
+    db: AsyncIOMotorDatabase,
+    booking: Dict,
+    payment: Optional[Dict],
+    session=None
+) -> Tuple[Dict, Dict]:
+    """The writes of one booking; returns the flight before and after the seat decrement"""
+    flight_id = parse_object_id(booking["flight_id"], "Flight not found")
+    seats = booking["seats"]
+    # Conditional decrement: the only write to the (possibly hot) flight, first,
+    # so a conflicting transaction fails before doing anything else
+    before = await db.flights.find_one_and_update(
+        {"_id": flight_id, "available_seats": {"$gte": seats}},
+        {"$inc": {"available_seats": -seats}, "$set": {"updated_at": booking["created_at"]}},
+        projection=FLIGHT_FIELDS,
+        return_document=ReturnDocument.BEFORE,
+        session=session
+    )
+    if before is None:
+        if await db.flights.count_documents({"_id": flight_id}, limit=1, session=session):
+            raise HTTPException(status_code=409, detail="Not enough seats available")
+        raise HTTPException(status_code=404, detail="Flight not found")
+
+    await db.bookings.insert_one(booking, session=session)
+    if payment is not None:
+        await db.payments.insert_one(payment, session=session)
+    await db[JOBS_COLLECTION].insert_many(
+        [new_job(job_type, {"booking_id": str(booking["_id"])}) for job_type in BOOKING_CREATED_JOBS],
+        session=session
+    )
+    return before, {**before, "available_seats": before["available_seats"] - seats}
+
+
+async def place_booking(
+    client: AsyncIOMotorClient,
+    db: AsyncIOMotorDatabase,
+    booking: Dict,
+    payment: Optional[Dict] = None,
+    transactional: Optional[bool] = None
+) -> Tuple[Dict, Dict]:
+    """
+    Take the seats, store the booking (and its payment) and queue its jobs
+
+    Ids are assigned up front so the booking and payment reference each
+    other without a follow-up update. A completed payment confirms the
+    booking.
+
+    Args:
+        client: Client owning ``db`` (for the session)
+        db: Database instance
+        booking: Booking document without ``_id``
+        payment: Payment document without ``_id`` and ``booking_id``, if any
+        transactional: All-or-nothing writes, retried on transient conflicts
+            (default BOOKING_TRANSACTIONS)
+
+    Returns:
+        The flight before and after the seat decrement (for the rollups)
+
+    Raises:
+        HTTPException: 404 unknown flight, 409 sold out, 503 contention
+            outlasted the retry budget
+    """
+    booking["_id"] = ObjectId()
+    booking["created_at"] = booking.get("created_at") or datetime.utcnow()
+    if payment is not None:
+        payment["_id"] = ObjectId()
+        payment["booking_id"] = str(booking["_id"])
+        payment["amount"] = payment.get("amount") or booking["total_price"]
+        payment.setdefault("created_at", booking["created_at"])
+        booking["payment_id"] = str(payment["_id"])
+        if payment.get("status") == "completed":
+            booking["status"] = "confirmed"
+
+    if not (BOOKING_TRANSACTIONS if transactional is None else transactional):
+        return await _place_booking_writes(db, booking, payment)
+    try:
+        return await run_in_transaction(client, lambda session: _place_booking_writes(db, booking, payment, session))
+    except PyMongoError as e:
+        if is_transient(e):
+            raise HTTPException(status_code=503, detail="Flight is busy, please retry")
+        raise
+
+
+def held_seats(booking: Optional[Dict]) -> Dict[str, int]:
+    """Seats a booking holds, by flight id (cancelled bookings hold none)"""
+    if not booking or booking.get("status") == "cancelled" or not ObjectId.is_valid(booking.get("flight_id") or ""):
+        return {}
+    return {booking["flight_id"]: booking.get("seats", 0)}
+
+
+async def _adjust_seats(
+    db: AsyncIOMotorDatabase,
+    before: Optional[Dict],
+    after: Optional[Dict],
+    now: datetime,
+    session=None
+) -> List[Tuple[Dict, Dict]]:
+    """
+    Move seats between flights as a booking goes from ``before`` to ``after``
+
+    Seats are taken before any are released, so a failed take leaves the
+    flights untouched. Returns the (before, after) of each flight changed.
+    """
+    old, new = held_seats(before), held_seats(after)
+    changes = {flight_id: old.get(flight_id, 0) - new.get(flight_id, 0) for flight_id in old.keys() | new.keys()}
+    changed = []
+    for flight_id, delta in sorted(changes.items(), key=lambda item: item[1]):
+        if not delta:
+            continue
+        query = {"_id": ObjectId(flight_id)}
+        if delta < 0:
+            query["available_seats"] = {"$gte": -delta}
+        flight = await db.flights.find_one_and_update(
+            query,
+            {"$inc": {"available_seats": delta}, "$set": {"updated_at": now}},
+            projection=FLIGHT_FIELDS,
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+        if flight is None:
+            if delta < 0:
+                raise HTTPException(status_code=409, detail="Not enough seats available")
+            # Seats of a deleted or archived flight have nowhere to go back to
+            continue
+        changed.append((flight, {**flight, "available_seats": flight["available_seats"] + delta}))
+    return changed
+
+
+async def change_booking(
+    client: AsyncIOMotorClient,
+    db: AsyncIOMotorDatabase,
+    booking_id: ObjectId,
+    document: Optional[Dict],
+    transactional: Optional[bool] = None
+) -> Tuple[Dict, List[Tuple[Dict, Dict]]]:
+    """
+    Update (``document``) or delete (None) a booking and adjust its flight's seats
+
+    Cancelling or deleting a booking gives its seats back, reinstating one
+    takes them again, and changing the seat count or flight moves the
+    difference. In a transaction the booking write and the seat changes
+    commit together; otherwise a failed seat take restores the booking.
+
+    Returns:
+        The booking before the write, and the (before, after) of each flight
+        whose seats changed (for the rollups)
+
+    Raises:
+        HTTPException: 404 unknown booking, 409 not enough seats for the
+            change, 503 contention outlasted the retry budget
+    """
+    now = datetime.utcnow()
+
+    async def writes(session=None):
+        if document is None:
+            before = await db.bookings.find_one_and_delete({"_id": booking_id}, session=session)
+        else:
+            before = await db.bookings.find_one_and_update(
+                {"_id": booking_id}, {"$set": document},
+                return_document=ReturnDocument.BEFORE, session=session
+            )
+        if before is None:
+            raise HTTPException(status_code=404, detail="Booking not found")
+        after = None if document is None else {**before, **document}
+        try:
+            return before, await _adjust_seats(db, before, after, now, session=session)
+        except HTTPException:
+            if session is None:
+                await db.bookings.replace_one({"_id": booking_id}, before, upsert=True)
+            raise
+
+    if not (BOOKING_TRANSACTIONS if transactional is None else transactional):
+        return await writes()
+    try:
+        return await run_in_transaction(client, writes)
+    except PyMongoError as e:
+        if is_transient(e):
+            raise HTTPException(status_code=503, detail="Flight is busy, please retry")
+        raise
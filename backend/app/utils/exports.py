@@ -0,0 +1,176 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import csv
+import io
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Documents fetched per cursor round trip
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+# Rows per Parquet row group; memory is bounded by one row group
+PARQUET_ROW_GROUP_SIZE = int(os.getenv("EXPORT_PARQUET_ROW_GROUP_SIZE", "10000"))
+
+# Exported columns and their Parquet types, in output order
+EXPORT_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "bookings": [
+        ("id", "string"),
+        ("booking_reference", "string"),
+        ("user_id", "string"),
+        ("flight_id", "string"),
+        ("passenger_ids", "list<string>"),
+        ("seats", "int64"),
+        ("total_price", "float64"),
+        ("status", "string"),
+        ("payment_id", "string"),
+        ("created_at", "timestamp"),
+        ("updated_at", "timestamp"),
+    ],
+    "payments": [
+        ("id", "string"),
+        ("booking_id", "string"),
+        ("amount", "float64"),
+        ("payment_method", "string"),
+        ("status", "string"),
+        ("transaction_id", "string"),
+        ("created_at", "timestamp"),
+    ],
+}
+
+
+def parse_export_time(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """
+    Parse a date (YYYY-MM-DD) or ISO datetime bound; raises ValueError
+
+    A date-only end bound covers the whole day, as the range end is exclusive.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def export_query(start: Optional[datetime], end: Optional[datetime], statuses: List[str]) -> Dict[str, Any]:
+    """Filter on the created_at index, plus statuses"""
+    query: Dict[str, Any] = {}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    if statuses:
+        query["status"] = {"$in": statuses}
+    return query
+
+
+def _row(document: Dict, columns: List[Tuple[str, str]]) -> Dict[str, Any]:
+    row = {}
+    for name, _ in columns:
+        value = document.get("_id") if name == "id" else document.get(name)
+        row[name] = str(value) if isinstance(value, ObjectId) else value
+    return row
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(str(v) for v in value)
+    return value
+
+
+async def _batches(collection: AsyncIOMotorCollection, query: Dict, columns: List[Tuple[str, str]], size: int) -> AsyncIterator[List[Dict]]:
+    """Yield rows in lists of at most `size`, never holding more than one list"""
+    projection = {name: 1 for name, _ in columns if name != "id"}
+    cursor = collection.find(query, projection).sort("created_at", 1).batch_size(EXPORT_BATCH_SIZE)
+    batch = []
+    async for document in cursor:
+        batch.append(_row(document, columns))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def stream_csv(collection: AsyncIOMotorCollection, query: Dict, columns: List[Tuple[str, str]]) -> AsyncIterator[bytes]:
+    """Encode matching documents as CSV, one chunk per cursor batch"""
+    names = [name for name, _ in columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    yield buffer.getvalue().encode()
+
+    async for batch in _batches(collection, query, columns, EXPORT_BATCH_SIZE):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(row[name]) for name in names] for row in batch)
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # Parquet records absolute offsets in the footer
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema(columns: List[Tuple[str, str]]):
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(),
+        "list<string>": pa.list_(pa.string()),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "timestamp": pa.timestamp("ms"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+async def stream_parquet(
+    collection: AsyncIOMotorCollection,
+    query: Dict,
+    columns: List[Tuple[str, str]],
+    row_group_size: int = PARQUET_ROW_GROUP_SIZE
+) -> AsyncIterator[bytes]:
+    """Encode matching documents as Parquet, one row group per chunk"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        async for batch in _batches(collection, query, columns, row_group_size):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema), row_group_size=row_group_size)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
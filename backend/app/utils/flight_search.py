@@ -1,10 +1,161 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import datetime
+from itertools import chain, islice
+from typing import Awaitable, List, Dict, Optional, Iterable, Tuple
+from app.utils.airport_timezones import (
+    DayWindow,
+    ensure_airport_timezones,
+    local_day_of,
+    local_day_windows
+)
+from app.models import Flight
+from app.deadlines import MIN_QUERY_MS, query_budget_ms, query_options, to_list_cancellable
+from app.tracing import span
+from pymongo.errors import ExecutionTimeout
+import asyncio
+import heapq
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Weights of the "best" ranking score, expressed in price units:
+# score = total_price + duration_hours * VALUE_OF_TIME_PER_HOUR + stops * STOP_PENALTY
+VALUE_OF_TIME_PER_HOUR = float(os.getenv("SEARCH_VALUE_OF_TIME_PER_HOUR", "30"))
+STOP_PENALTY = float(os.getenv("SEARCH_STOP_PENALTY", "75"))
+
+# maxTimeMS cap of the connections aggregation; when it runs out the search
+# returns direct flights only rather than failing
+SEARCH_CONNECTIONS_BUDGET_MS = int(os.getenv("SEARCH_CONNECTIONS_BUDGET_MS", "2000"))
+
+# Supported sort orders and the result field each one ranks on
+SORT_FIELDS = {
+    "price": "total_price",
+    "duration": "total_duration",
+    "best": "score",
+}
+
+# Flight fields the search itself needs (matching, pricing, durations, seat filters)
+SEARCH_REQUIRED_FIELDS = (
+    "origin",
+    "destination",
+    "departure_time",
+    "arrival_time",
+    "price",
+    "available_seats",
+)
+
+# Flight fields a search may ask for (?fields=); anything else is rejected
+# before it reaches the projection
+PROJECTABLE_FIELDS = frozenset(
+    name for name in Flight.model_fields if name != "id"
+) | {"_id"}
+
+# Keys added to direct results on top of the flight document
+_RESULT_KEYS = ("is_direct", "total_duration", "total_price", "score", "segments")
+
+
+class SearchResults(list):
+    """Search results, plus the phases skipped to stay within the request deadline"""
+
+    def __init__(self, results=(), degraded: Optional[List[str]] = None):
+        super().__init__(results)
+        self.degraded = degraded or []
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated fields parameter; raises ValueError on unknown fields"""
+    if not fields:
+        return None
+    field_list = sorted({field.strip() for field in fields.split(",") if field.strip()})
+    unknown = [field for field in field_list if field not in PROJECTABLE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return field_list or None
+
+
+async def _gather_cancelling(awaitables: Iterable[Awaitable]) -> List:
+    """asyncio.gather that cancels the remaining queries when one fails"""
+    tasks = [asyncio.ensure_future(a) for a in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def build_projection(fields: Optional[List[str]]) -> Optional[Dict[str, int]]:
+    """Build a Mongo projection for the requested fields plus the ones search relies on"""
+    if not fields:
+        return None
+    projection = {field: 1 for field in SEARCH_REQUIRED_FIELDS}
+    projection.update({field: 1 for field in fields if field and field != "_id"})
+    return projection
+
+
+def _score_expression(price: object, duration_minutes: object, stops: int) -> Dict:
+    """Mongo expression of the "best" ranking score"""
+    return {
+        "$add": [
+            price,
+            {"$multiply": [duration_minutes, VALUE_OF_TIME_PER_HOUR / 60]},
+            stops * STOP_PENALTY
+        ]
+    }
+
+
+def _criteria(result: Dict) -> Tuple[float, float, int]:
+    """Pareto criteria of an option: price, duration and stops, all lower is better"""
+    return result["total_price"], result["total_duration"], result.get("stops", 0)
+
+
+def pareto_front(results: Iterable[Dict]) -> List[Dict]:
+    """
+    Options no other option beats on price, duration and stops (O(n log n))
+
+    A sweep in price order: everything already seen is no more expensive, so
+    an option is dominated when a distinct, already seen option has no more
+    stops and no longer duration. Equal options are seen together and do not
+    dominate each other. Stops take only a few values, so the best duration
+    is kept per stop count.
+    """
+    front = []
+    best_duration: Dict[int, float] = {}
+    ordered = sorted(results, key=_criteria)
+    i = 0
+    while i < len(ordered):
+        criteria = _criteria(ordered[i])
+        j = i
+        while j < len(ordered) and _criteria(ordered[j]) == criteria:
+            j += 1
+        _, duration, stops = criteria
+        if not any(s <= stops and d <= duration for s, d in best_duration.items()):
+            front.extend(ordered[i:j])
+        best_duration[stops] = min(duration, best_duration.get(stops, duration))
+        i = j
+    return front
+
+
+def rank_results(direct: List[Dict], connections: List[Dict], sort: str, limit: int) -> List[Dict]:
+    """
+    Merge direct and connection results, each already sorted by Mongo, into the top ``limit``
+
+    price/duration use a lazy heap merge of the two sorted lists. best returns
+    the Pareto-optimal options (price, duration, stops) first, then the rest,
+    each ordered by score; the rest is merged lazily up to ``limit``.
+    """
+    field = SORT_FIELDS[sort]
+    key = lambda result: result[field]
+
+    if sort != "best":
+        return list(islice(heapq.merge(direct, connections, key=key), limit))
+
+    front = sorted(pareto_front(chain(direct, connections)), key=key)[:limit]
+    front_ids = {id(c) for c in front}
+    rest = (c for c in heapq.merge(direct, connections, key=key) if id(c) not in front_ids)
+    return front + list(islice(rest, limit - len(front)))
+
 
 async def search_flights_with_connections(
     db: AsyncIOMotorDatabase,
@@ -14,8 +165,11 @@ async def search_flights_with_connections(
     max_layover_hours: int = 6,
     min_layover_hours: float = 1.5,
     include_connections: bool = True,
-    max_results: int = 50
-) -> List[Dict]:
+    max_results: int = 50,
+    fields: Optional[List[str]] = None,
+    flex_days: int = 0,
+    sort: Optional[str] = None
+) -> SearchResults:
     """
     Search for direct and connecting flights between two airports
     
@@ -28,11 +182,23 @@ async def search_flights_with_connections(
         min_layover_hours: Minimum layover time in hours
         include_connections: Whether to include connecting flights
         max_results: Maximum number of results to return
+        fields: Flight fields to fetch (all fields when omitted)
+        flex_days: Also search this many days before and after departure_date;
+            max_results then applies per day
+        sort: "price", "duration" or "best" (weighted score, Pareto-optimal
+            first); default lists direct flights first, then by price
     
     Returns:
-        List of flight options (direct and connecting)
+        List of flight options (direct and connecting); ``degraded`` lists
+        "connections" when they were skipped for the request deadline
+
+    Raises:
+        ExecutionTimeout: The direct flights query ran out of time
     """
-    results = []
+    degraded: List[str] = []
+    projection = build_projection(fields)
+    # Every query below returns at most this many results per departure window
+    limit = max_results
     
     # Build base query
     base_query = {
@@ -42,27 +208,69 @@ async def search_flights_with_connections(
         "available_seats": {"$gt": 0}
     }
     
-    # Add date filter if provided
+    # Add date filter if provided: one UTC range per flexible day, with day
+    # boundaries taken in the origin airport's local time. Each day is queried
+    # and limited on its own, so busy days cannot use up the others' results
+    departure_ranges: List[Optional[Dict]] = [None]
     if departure_date:
-        start_of_day = departure_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = start_of_day + timedelta(days=1)
-        base_query["departure_time"] = {"$gte": start_of_day, "$lt": end_of_day}
+        await ensure_airport_timezones(db)
+        windows = local_day_windows(origin, departure_date, flex_days)
+        departure_ranges = [{"$gte": start, "$lt": end} for _, start, end in windows]
+
+    def in_range(query: Dict, departure_range: Optional[Dict]) -> Dict:
+        return {**query, "departure_time": departure_range} if departure_range else query
     
     # 1. Find direct flights
     logger.info(f"Searching for direct flights from {origin} to {destination}")
-    direct_flights = await db.flights.find(base_query).to_list(length=max_results)
-    
-    for flight in direct_flights:
-        flight["_id"] = str(flight["_id"])
-        flight["is_direct"] = True
-        flight["total_duration"] = (flight["arrival_time"] - flight["departure_time"]).total_seconds() / 60
-        flight["total_price"] = flight["price"]
-        flight["segments"] = [flight]
-        results.append(flight)
+    if sort:
+        # Rank in Mongo so only the top `limit` direct flights are returned
+        duration = {"$divide": [{"$subtract": ["$arrival_time", "$departure_time"]}, 60000]}
+        ranking_fields = {"total_duration": duration, "total_price": "$price"}
+        if sort == "best":
+            ranking_fields["score"] = _score_expression("$price", duration, 0)
+
+        def direct_pipeline(departure_range: Optional[Dict]) -> List[Dict]:
+            return [
+                {"$match": in_range(base_query, departure_range)},
+                # Sorting on the stored price before computing fields can use the price index
+                *([{"$sort": {"price": 1}}, {"$limit": limit}] if sort == "price" else []),
+                *([{"$project": projection}] if projection else []),
+                {"$addFields": ranking_fields},
+                *([{"$sort": {SORT_FIELDS[sort]: 1}}, {"$limit": limit}] if sort != "price" else [])
+            ]
+
+        def fetch_direct(departure_range):
+            cursor = db.flights.aggregate(direct_pipeline(departure_range), **query_options())
+            return to_list_cancellable(db, cursor, limit)
+    else:
+        def fetch_direct(departure_range):
+            options = query_options()
+            cursor = db.flights.find(in_range(base_query, departure_range), projection, comment=options.get("comment"))
+            return to_list_cancellable(db, cursor.max_time_ms(options.get("maxTimeMS")), limit)
+
+    with span("search.direct", origin=origin.upper(), destination=destination.upper(), sort=sort or "direct_first", days=len(departure_ranges)):
+        direct_by_day = await _gather_cancelling(fetch_direct(r) for r in departure_ranges)
+
+    direct_results: List[List[Dict]] = []
+    for direct_flights in direct_by_day:
+        day_results = []
+        for flight in direct_flights:
+            score = flight.pop("score", None)
+            flight["_id"] = str(flight["_id"])
+            flight["is_direct"] = True
+            flight["total_duration"] = (flight["arrival_time"] - flight["departure_time"]).total_seconds() / 60
+            flight["total_price"] = flight["price"]
+            # Copy before adding "segments" so the document does not contain itself
+            flight["segments"] = [dict(flight)]
+            if score is not None:
+                flight["score"] = score
+            day_results.append(flight)
+        direct_results.append(day_results)
     
-    logger.info(f"Found {len(direct_flights)} direct flights")
+    logger.info(f"Found {sum(len(day) for day in direct_results)} direct flights")
     
     # 2. Find connecting flights (1 stop)
+    connecting_by_day: List[List[Dict]] = [[] for _ in departure_ranges]
     if include_connections:
         logger.info(f"Searching for connecting flights from {origin} to {destination}")
         
@@ -77,8 +285,9 @@ async def search_flights_with_connections(
                     "available_seats": {"$gt": 0}
                 }
             },
-            # Stage 2: Add date filter if provided
-            *([{"$match": {"departure_time": base_query["departure_time"]}}] if departure_date else []),
+            # Stage 2: the departure date filter is inserted per day (pipeline_for)
+            # Only carry the requested first-leg fields through the pipeline
+            *([{"$project": projection}] if projection else []),
             # Stage 3: Lookup connecting flights
             {
                 "$lookup": {
@@ -117,7 +326,8 @@ async def search_flights_with_connections(
                                 "status": {"$nin": ["cancelled"]},
                                 "available_seats": {"$gt": 0}
                             }
-                        }
+                        },
+                        *([{"$project": projection}] if projection else [])
                     ],
                     "as": "connecting_flights"
                 }
@@ -145,17 +355,42 @@ async def search_flights_with_connections(
                     }
                 }
             },
-            # Stage 6: Sort by total price
-            {"$sort": {"total_price": 1}},
+            *([{
+                "$addFields": {"score": _score_expression("$total_price", "$total_duration", 1)}
+            }] if sort == "best" else []),
+            # Stage 6: Sort by total price (or the requested ranking)
+            {"$sort": {SORT_FIELDS.get(sort, "total_price"): 1}},
             # Stage 7: Limit results
-            {"$limit": max_results}
+            {"$limit": limit},
+            # Stage 8: Drop the second leg embedded in the first leg's $$ROOT
+            {"$unset": "first_flight.connecting_flights"}
         ]
+
+        def pipeline_for(departure_range: Optional[Dict]) -> List[Dict]:
+            date_match = [{"$match": {"departure_time": departure_range}}] if departure_range else []
+            return pipeline[:1] + date_match + pipeline[1:]
         
-        connecting_flights = await db.flights.aggregate(pipeline).to_list(length=max_results)
+        # Degrade to direct flights only rather than overrun the deadline
+        budget = query_budget_ms(SEARCH_CONNECTIONS_BUDGET_MS)
+        if budget < MIN_QUERY_MS:
+            logger.warning(f"Skipping connections from {origin} to {destination}: {budget}ms left")
+            degraded.append("connections")
+        else:
+            try:
+                with span("search.connections", origin=origin.upper(), destination=destination.upper(), max_time_ms=budget):
+                    connecting_by_day = await _gather_cancelling(
+                        to_list_cancellable(db, db.flights.aggregate(pipeline_for(r), **query_options(SEARCH_CONNECTIONS_BUDGET_MS)), limit)
+                        for r in departure_ranges
+                    )
+            except ExecutionTimeout:
+                logger.warning(f"Connections from {origin} to {destination} exceeded {budget}ms, returning direct flights only")
+                degraded.append("connections")
         
-        logger.info(f"Found {len(connecting_flights)} connecting flight options")
+        logger.info(f"Found {sum(len(day) for day in connecting_by_day)} connecting flight options")
         
-        # Format connecting flights
+    # Format connecting flights
+    connection_results: List[List[Dict]] = [[] for _ in departure_ranges]
+    for day_results, connecting_flights in zip(connection_results, connecting_by_day):
         for conn in connecting_flights:
             first_flight = conn["first_flight"]
             second_flight = conn["second_flight"]
@@ -163,7 +398,6 @@ async def search_flights_with_connections(
             # Clean up _id fields
             first_flight["_id"] = str(first_flight["_id"])
             second_flight["_id"] = str(second_flight["_id"])
-            first_flight.pop("connecting_flights", None)
             
             connection_option = {
                 "_id": f"{first_flight['_id']}-{second_flight['_id']}",
@@ -181,15 +415,101 @@ async def search_flights_with_connections(
                 },
                 "stops": 1
             }
+            if sort == "best":
+                connection_option["score"] = conn["score"]
             
-            results.append(connection_option)
+            day_results.append(connection_option)
     
-    # Sort all results by price
-    results.sort(key=lambda x: (not x.get("is_direct", False), x.get("total_price", 0)))
+    candidates = sum(len(day) for day in chain(direct_results, connection_results))
+    results = []
+    with span("search.rank", sort=sort or "direct_first", candidates=candidates):
+        # Ranked per day, in date order
+        for direct_day, connection_day in zip(direct_results, connection_results):
+            if sort:
+                results.extend(rank_results(direct_day, connection_day, sort, limit))
+            else:
+                # Direct flights first, then by price
+                day_results = direct_day + connection_day
+                day_results.sort(key=lambda x: (not x.get("is_direct", False), x.get("total_price", 0)))
+                results.extend(day_results[:limit])
     
     logger.info(f"Returning {len(results)} total flight options")
     
-    return results[:max_results]
+    return SearchResults(results, degraded)
+
+
+def group_results_by_day(
+    results: List[Dict],
+    max_results_per_day: int,
+    windows: Optional[List[DayWindow]] = None
+) -> List[Dict]:
+    """
+    Group search results by departure date, keeping their order within each day
+
+    Args:
+        results: Sorted search results (full or compact)
+        max_results_per_day: Maximum number of results kept per day
+        windows: Local day windows of the origin airport (see local_day_windows);
+            UTC dates are used when omitted
+
+    Returns:
+        List of ``{"date": "YYYY-MM-DD", "results": [...]}`` in date order
+    """
+    days: Dict[str, List[Dict]] = {}
+    for result in results:
+        local_day = local_day_of(result["departure_time"], windows) if windows else None
+        day = (local_day or result["departure_time"]).strftime("%Y-%m-%d")
+        bucket = days.setdefault(day, [])
+        if len(bucket) < max_results_per_day:
+            bucket.append(result)
+
+    return [{"date": day, "results": days[day]} for day in sorted(days)]
+
+
+def compact_search_results(results: List[Dict]) -> Dict:
+    """
+    Convert search results to the compact (v2) format
+
+    Each flight document appears once in a shared ``flights`` table keyed by id,
+    and result ``segments`` reference it by id instead of embedding it.
+
+    Args:
+        results: Results of search_flights_with_connections
+
+    Returns:
+        Dict with ``flights`` (id -> flight) and ``results``
+    """
+    flights: Dict[str, Dict] = {}
+    compact_results = []
+
+    for result in results:
+        segment_ids = []
+        for segment in result.get("segments", []):
+            flight_id = segment["_id"]
+            if flight_id not in flights:
+                flights[flight_id] = {k: v for k, v in segment.items() if k not in _RESULT_KEYS}
+            segment_ids.append(flight_id)
+
+        if result.get("is_direct"):
+            compact = {
+                "_id": result["_id"],
+                "is_direct": True,
+                "origin": result["origin"],
+                "destination": result["destination"],
+                "departure_time": result["departure_time"],
+                "arrival_time": result["arrival_time"],
+                "total_price": result["total_price"],
+                "total_duration": result["total_duration"],
+                "stops": 0
+            }
+            if "score" in result:
+                compact["score"] = result["score"]
+        else:
+            compact = {k: v for k, v in result.items() if k != "segments"}
+        compact["segments"] = segment_ids
+        compact_results.append(compact)
+
+    return {"flights": flights, "results": compact_results}
 
 
 async def search_multi_city_flights(
@@ -0,0 +1,408 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Snapshot file written by `python -m app.build_flight_snapshot`; when present,
+# processes map it instead of scanning the flights collection
+FLIGHT_SNAPSHOT_PATH = os.getenv("FLIGHT_SNAPSHOT_PATH", "")
+# Load the snapshot in the gunicorn master before forking workers. On by
+# default only with a snapshot file: without one, every master start and
+# worker rebuild scans the whole flights collection
+FLIGHT_SNAPSHOT_ENABLED = os.getenv("FLIGHT_SNAPSHOT", "true" if FLIGHT_SNAPSHOT_PATH else "false").lower() in ("1", "true", "yes")
+# Older snapshots are ignored and readers fall back to the database; measured
+# from the last delta catch-up, so this bounds staleness
+FLIGHT_SNAPSHOT_MAX_AGE = float(os.getenv("FLIGHT_SNAPSHOT_MAX_AGE_SECONDS", "900"))
+# How often each worker applies the changes made since the snapshot was built
+FLIGHT_SNAPSHOT_REFRESH_SECONDS = float(os.getenv("FLIGHT_SNAPSHOT_REFRESH_SECONDS", "30"))
+# Without a snapshot file to switch to, a worker rescans the flights collection
+# once the changes since its base exceed this fraction of the base rows (the
+# delta is re-read and re-applied in full on every refresh)
+FLIGHT_SNAPSHOT_MAX_DELTA_RATIO = float(os.getenv("FLIGHT_SNAPSHOT_MAX_DELTA_RATIO", "0.05"))
+# Deltas start this long before the snapshot timestamp to absorb clock skew
+# between the API hosts stamping updated_at and the snapshot builder
+DELTA_OVERLAP = timedelta(seconds=60)
+
+# Ids of deleted flights, so deltas can drop them from a snapshot
+TOMBSTONES_COLLECTION = "flight_tombstones"
+
+# Flight statuses, stored as small ints in the snapshot
+STATUS_CODES = ["scheduled", "delayed", "boarding", "departed", "arrived", "cancelled"]
+_STATUS_INDEX = {status: i for i, status in enumerate(STATUS_CODES)}
+
+SNAPSHOT_FIELDS = {
+    "_id": 1,
+    "origin": 1,
+    "destination": 1,
+    "departure_time": 1,
+    "arrival_time": 1,
+    "price": 1,
+    "available_seats": 1,
+    "status": 1,
+}
+
+# File layout: magic, little-endian uint32 header length, JSON header, then
+# each column's raw bytes at a 64-byte aligned offset listed in the header
+FILE_MAGIC = b"FLTSNAP1"
+_ALIGNMENT = 64
+
+
+def _epoch_ms(value: datetime) -> int:
+    return int((value - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def _aligned(size: int) -> int:
+    return -(-size // _ALIGNMENT) * _ALIGNMENT
+
+
+def _id_view(ids: np.ndarray) -> np.ndarray:
+    """View (n, 12) ObjectId bytes as n comparable scalars"""
+    return np.ascontiguousarray(ids).view("V12").ravel()
+
+
+class FlightSnapshot:
+    """
+    Read-only columnar snapshot of searchable flight fields
+
+    The base columns are NumPy arrays sorted by (origin, destination,
+    departure), either built in memory or mapped from a snapshot file. Flights
+    changed since the base was built are kept in a small ``delta`` snapshot,
+    and ``live`` masks out the base rows they replace or that were deleted.
+    """
+
+    def __init__(
+        self,
+        codes: List[str],
+        columns: Dict[str, np.ndarray],
+        built_at: datetime,
+        live: Optional[np.ndarray] = None,
+        delta: Optional["FlightSnapshot"] = None,
+        refreshed_at: Optional[datetime] = None,
+        buffer: Optional[mmap.mmap] = None,
+        changes: int = 0
+    ):
+        self.codes = codes
+        self.code_index = {code: i for i, code in enumerate(codes)}
+        self.columns = columns
+        self.built_at = built_at
+        self.live = live
+        self.delta = delta
+        self.refreshed_at = refreshed_at or built_at
+        # Changed and deleted flights overlaid on the base
+        self.changes = changes
+        # Keeps the file mapping open for as long as the columns use it
+        self._buffer = buffer
+
+    @property
+    def base_rows(self) -> int:
+        return len(self.columns["origin"])
+
+    def __len__(self) -> int:
+        base = len(self.columns["origin"]) if self.live is None else int(self.live.sum())
+        return base + (len(self.delta) if self.delta is not None else 0)
+
+    @classmethod
+    def from_documents(
+        cls,
+        documents: Iterable[Dict],
+        built_at: Optional[datetime] = None,
+        codes: Optional[List[str]] = None
+    ) -> "FlightSnapshot":
+        """
+        Build a snapshot from flight documents (projected to SNAPSHOT_FIELDS)
+
+        Args:
+            documents: Flight documents
+            built_at: Time the documents were read (default: now)
+            codes: Existing airport code table to extend; new codes are
+                appended so indices already in use keep their meaning
+        """
+        rows = list(documents)
+        codes = list(codes or [])
+        codes += sorted(({d["origin"] for d in rows} | {d["destination"] for d in rows}) - set(codes))
+        code_index = {code: i for i, code in enumerate(codes)}
+
+        columns = {
+            "origin": np.fromiter((code_index[d["origin"]] for d in rows), dtype=np.uint16, count=len(rows)),
+            "destination": np.fromiter((code_index[d["destination"]] for d in rows), dtype=np.uint16, count=len(rows)),
+            "departure": np.fromiter((_epoch_ms(d["departure_time"]) for d in rows), dtype=np.int64, count=len(rows)),
+            "arrival": np.fromiter((_epoch_ms(d["arrival_time"]) for d in rows), dtype=np.int64, count=len(rows)),
+            "price": np.fromiter((d["price"] for d in rows), dtype=np.float64, count=len(rows)),
+            "seats": np.fromiter((d["available_seats"] for d in rows), dtype=np.int32, count=len(rows)),
+            "status": np.fromiter((_STATUS_INDEX.get(d.get("status"), 0) for d in rows), dtype=np.uint8, count=len(rows)),
+            # Raw 12-byte ObjectIds ("S12" would strip trailing zero bytes)
+            "id": np.frombuffer(b"".join(d["_id"].binary for d in rows), dtype=np.uint8).reshape(len(rows), 12),
+        }
+
+        order = np.lexsort((columns["departure"], columns["destination"], columns["origin"]))
+        columns = {name: column[order] for name, column in columns.items()}
+        return cls(codes, columns, built_at or datetime.utcnow())
+
+    def with_changes(
+        self,
+        documents: Iterable[Dict],
+        deleted_ids: Iterable,
+        refreshed_at: Optional[datetime] = None
+    ) -> "FlightSnapshot":
+        """
+        Return a snapshot sharing this base, overlaid with the changes since it was built
+
+        Args:
+            documents: Current versions of all flights changed since built_at
+            deleted_ids: ObjectIds of flights deleted since built_at
+            refreshed_at: Time the changes were read (default: now)
+        """
+        delta = FlightSnapshot.from_documents(documents, codes=self.codes)
+        removed = b"".join(_id.binary for _id in deleted_ids)
+        replaced = np.concatenate([
+            _id_view(delta.columns["id"]),
+            _id_view(np.frombuffer(removed, dtype=np.uint8).reshape(-1, 12))
+        ])
+        live = ~np.isin(_id_view(self.columns["id"]), replaced) if len(replaced) else None
+        return FlightSnapshot(
+            delta.codes,
+            self.columns,
+            self.built_at,
+            live=live,
+            delta=delta if len(delta) else None,
+            refreshed_at=refreshed_at,
+            buffer=self._buffer,
+            changes=len(replaced)
+        )
+
+    def _select(self, names: Tuple[str, ...], after: Optional[datetime] = None, origin: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Concatenate the given columns of bookable rows across base and delta"""
+        parts = [(self.columns, self.live)]
+        if self.delta is not None:
+            parts.append((self.delta.columns, None))
+
+        selected = {name: [] for name in names}
+        for columns, live in parts:
+            rows = slice(None)
+            if origin is not None:
+                # Both parts are sorted by origin first
+                rows = slice(
+                    int(np.searchsorted(columns["origin"], origin, "left")),
+                    int(np.searchsorted(columns["origin"], origin, "right"))
+                )
+            mask = (columns["seats"][rows] > 0) & (columns["status"][rows] != _STATUS_INDEX["cancelled"])
+            if live is not None:
+                mask &= live[rows]
+            if after is not None:
+                mask &= columns["departure"][rows] >= _epoch_ms(after)
+            for name in names:
+                selected[name].append(columns[name][rows][mask])
+        return {name: np.concatenate(arrays) for name, arrays in selected.items()}
+
+    def destinations_from(self, origin: str, after: Optional[datetime] = None) -> List[Dict]:
+        """Destinations served from an origin with flight count and lowest price"""
+        o = self.code_index.get(origin.upper())
+        if o is None:
+            return []
+        rows = self._select(("destination", "price"), after=after, origin=o)
+        results = []
+        for d in np.unique(rows["destination"]):
+            route_prices = rows["price"][rows["destination"] == d]
+            results.append({
+                "destination": self.codes[int(d)],
+                "flights": int(route_prices.size),
+                "min_price": float(route_prices.min())
+            })
+        return sorted(results, key=lambda r: r["destination"])
+
+    def popular_routes(self, limit: int, after: Optional[datetime] = None) -> List[Dict]:
+        """Routes with the most bookable flights"""
+        rows = self._select(("origin", "destination"), after=after)
+        n_codes = max(len(self.codes), 1)
+        routes, counts = np.unique(rows["origin"].astype(np.uint32) * n_codes + rows["destination"], return_counts=True)
+        pairs = [(self.codes[int(r) // n_codes], self.codes[int(r) % n_codes]) for r in routes]
+        # Most flights first, ties by origin then destination code
+        top = sorted(range(len(pairs)), key=lambda i: (-counts[i], pairs[i]))[:limit]
+        return [
+            {"origin": pairs[i][0], "destination": pairs[i][1], "flights": int(counts[i])}
+            for i in top
+        ]
+
+
+def write_snapshot_file(snapshot: FlightSnapshot, path: str):
+    """
+    Write the base columns of a snapshot to a columnar file
+
+    The file is written next to the target and renamed into place, so
+    processes still mapping the previous file keep a consistent view.
+    """
+    header = {
+        "version": 1,
+        "built_at": snapshot.built_at.isoformat(),
+        "rows": len(snapshot.columns["origin"]),
+        "codes": snapshot.codes,
+        "columns": {}
+    }
+    # Column offsets are relative to the (aligned) end of the header
+    size = 0
+    for name, column in snapshot.columns.items():
+        header["columns"][name] = {"dtype": column.dtype.str, "shape": list(column.shape), "offset": size}
+        size += _aligned(column.nbytes)
+    encoded = json.dumps(header).encode()
+    data_start = _aligned(len(FILE_MAGIC) + 4 + len(encoded))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(FILE_MAGIC)
+        f.write(struct.pack("<I", len(encoded)))
+        f.write(encoded)
+        for name, column in snapshot.columns.items():
+            f.seek(data_start + header["columns"][name]["offset"])
+            f.write(np.ascontiguousarray(column).tobytes())
+        f.truncate(data_start + size)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote flight snapshot with {header['rows']} flights to {path}")
+
+
+def open_snapshot_file(path: str) -> FlightSnapshot:
+    """Map a snapshot file read-only; the columns are views of the shared page cache"""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(FILE_MAGIC)] != FILE_MAGIC:
+        buffer.close()
+        raise ValueError(f"{path} is not a flight snapshot file")
+    (header_length,) = struct.unpack_from("<I", buffer, len(FILE_MAGIC))
+    header_start = len(FILE_MAGIC) + 4
+    header = json.loads(buffer[header_start:header_start + header_length])
+    data_start = _aligned(header_start + header_length)
+
+    columns = {}
+    for name, spec in header["columns"].items():
+        count = int(np.prod(spec["shape"]))
+        column = np.frombuffer(buffer, dtype=np.dtype(spec["dtype"]), count=count, offset=data_start + spec["offset"])
+        columns[name] = column.reshape(spec["shape"])
+    return FlightSnapshot(header["codes"], columns, datetime.fromisoformat(header["built_at"]), buffer=buffer)
+
+
+# Process-wide snapshot; set before forking workers (see gunicorn.conf.py)
+_snapshot: Optional[FlightSnapshot] = None
+
+
+def get_flight_snapshot() -> Optional[FlightSnapshot]:
+    """Return the process snapshot, or None when there is none or it is too old"""
+    if _snapshot is None:
+        return None
+    if (datetime.utcnow() - _snapshot.refreshed_at).total_seconds() > FLIGHT_SNAPSHOT_MAX_AGE:
+        return None
+    return _snapshot
+
+
+def set_flight_snapshot(snapshot: Optional[FlightSnapshot]):
+    global _snapshot
+    _snapshot = snapshot
+
+
+def snapshot_query(horizon_days: int = 0) -> Dict:
+    """Flights worth keeping in a snapshot: not cancelled, departing from yesterday on"""
+    query = {
+        "status": {"$ne": "cancelled"},
+        "departure_time": {"$gte": datetime.utcnow() - timedelta(days=1)}
+    }
+    if horizon_days:
+        query["departure_time"]["$lt"] = datetime.utcnow() + timedelta(days=horizon_days)
+    return query
+
+
+def _delta_queries(snapshot: FlightSnapshot) -> Tuple[Dict, Dict]:
+    """Queries for flights changed and flights deleted since a snapshot was built"""
+    since = snapshot.built_at - DELTA_OVERLAP
+    return {"updated_at": {"$gt": since}}, {"deleted_at": {"$gt": since}}
+
+
+async def build_flight_snapshot(db: AsyncIOMotorDatabase) -> FlightSnapshot:
+    """Scan the flights collection into a new snapshot"""
+    # Taken before the scan, so the first delta covers writes made during it
+    built_at = datetime.utcnow()
+    documents = await db.flights.find(snapshot_query(), SNAPSHOT_FIELDS, batch_size=10000).to_list(length=None)
+    # Building the columns is CPU-bound; keep it off the event loop
+    snapshot = await asyncio.to_thread(FlightSnapshot.from_documents, documents, built_at=built_at)
+    logger.info(f"Built flight snapshot with {len(snapshot)} flights")
+    return snapshot
+
+
+async def catch_up(db: AsyncIOMotorDatabase, snapshot: FlightSnapshot) -> FlightSnapshot:
+    """Overlay the flights changed and deleted since the snapshot's base was built"""
+    refreshed_at = datetime.utcnow()
+    changed_query, deleted_query = _delta_queries(snapshot)
+    changed = await db.flights.find(changed_query, SNAPSHOT_FIELDS).to_list(length=None)
+    deleted = await db[TOMBSTONES_COLLECTION].find(deleted_query, {"_id": 1}).to_list(length=None)
+    return await asyncio.to_thread(snapshot.with_changes, changed, [t["_id"] for t in deleted], refreshed_at=refreshed_at)
+
+
+def load_flight_snapshot_sync(sync_db, path: str = FLIGHT_SNAPSHOT_PATH) -> FlightSnapshot:
+    """
+    Load the snapshot with a synchronous (pymongo) database, e.g. in the pre-fork master
+
+    Maps the snapshot file and applies the delta when the file exists,
+    otherwise scans the flights collection.
+    """
+    refreshed_at = datetime.utcnow()
+    if path and os.path.exists(path):
+        base = open_snapshot_file(path)
+        changed_query, deleted_query = _delta_queries(base)
+        changed = list(sync_db.flights.find(changed_query, SNAPSHOT_FIELDS))
+        deleted = [t["_id"] for t in sync_db[TOMBSTONES_COLLECTION].find(deleted_query, {"_id": 1})]
+        logger.info(
+            f"Mapped flight snapshot {path} built {base.built_at.isoformat()} "
+            f"({len(base)} flights, {len(changed)} changed and {len(deleted)} deleted since)"
+        )
+        return base.with_changes(changed, deleted, refreshed_at=refreshed_at)
+
+    cursor = sync_db.flights.find(snapshot_query(), SNAPSHOT_FIELDS, batch_size=10000)
+    snapshot = FlightSnapshot.from_documents(cursor, built_at=refreshed_at)
+    logger.info(f"Built flight snapshot with {len(snapshot)} flights")
+    return snapshot
+
+
+def _needs_rebuild(snapshot: FlightSnapshot) -> bool:
+    return snapshot.changes > FLIGHT_SNAPSHOT_MAX_DELTA_RATIO * max(snapshot.base_rows, 1)
+
+
+async def refresh_flight_snapshot(db: AsyncIOMotorDatabase, interval: float = FLIGHT_SNAPSHOT_REFRESH_SECONDS):
+    """
+    Keep the process snapshot current (runs as a task in each worker)
+
+    Maps FLIGHT_SNAPSHOT_PATH when nothing was preloaded, switches to a newer
+    file once the scheduled builder replaces it (the file is only reopened
+    when its mtime changes), and re-applies the delta every ``interval``
+    seconds. Without a file, the worker rebuilds its own base once the delta
+    outgrows FLIGHT_SNAPSHOT_MAX_DELTA_RATIO; the rebuilt base is private to
+    the worker rather than shared with the pre-fork master. Without a file or
+    preloaded snapshot there is nothing to refresh and the search routes
+    query Mongo directly.
+    """
+    file_mtime = None
+    while True:
+        try:
+            snapshot = _snapshot
+            has_file = bool(FLIGHT_SNAPSHOT_PATH) and os.path.exists(FLIGHT_SNAPSHOT_PATH)
+            if has_file:
+                mtime = os.stat(FLIGHT_SNAPSHOT_PATH).st_mtime_ns
+                if mtime != file_mtime:
+                    file_mtime = mtime
+                    mapped = open_snapshot_file(FLIGHT_SNAPSHOT_PATH)
+                    if snapshot is None or mapped.built_at > snapshot.built_at:
+                        snapshot = mapped
+            if snapshot is None:
+                return
+            if not has_file and _needs_rebuild(snapshot):
+                logger.info(f"Flight snapshot delta has {snapshot.changes} changes, rebuilding the base")
+                set_flight_snapshot(await build_flight_snapshot(db))
+            else:
+                set_flight_snapshot(await catch_up(db, snapshot))
+        except Exception as e:
+            logger.error(f"Error refreshing flight snapshot: {str(e)}")
+        await asyncio.sleep(interval)
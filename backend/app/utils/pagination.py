@@ -0,0 +1,33 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import base64
+
+
+def encode_cursor(created_at: datetime, _id: ObjectId) -> str:
+    """Opaque keyset cursor for a (created_at, _id) position"""
+    raw = f"{created_at.isoformat()}|{_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decode a cursor produced by encode_cursor; raises ValueError when malformed"""
+    try:
+        created_at, _id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_filter(cursor: Optional[str]) -> Dict:
+    """Filter selecting documents after the cursor in (created_at desc, _id desc) order"""
+    if not cursor:
+        return {}
+    created_at, _id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": _id}}
+        ]
+    }
@@ -0,0 +1,238 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+PAYPAL_MODE = os.getenv("PAYPAL_MODE", "sandbox")
+
+# Largest page each gateway's list API returns
+STRIPE_PAGE_SIZE = 100
+PAYPAL_PAGE_SIZE = 20
+
+# Gateway states mapped onto PaymentStatus values
+STRIPE_STATUSES = {
+    "succeeded": "completed",
+    "processing": "pending",
+    "requires_payment_method": "pending",
+    "requires_confirmation": "pending",
+    "requires_action": "pending",
+    "requires_capture": "pending",
+    "canceled": "failed",
+}
+PAYPAL_STATUSES = {
+    "created": "pending",
+    "approved": "completed",
+    "failed": "failed",
+    "canceled": "failed",
+    "expired": "failed",
+}
+
+
+class RefundFailed(Exception):
+    """The gateway did not accept a refund"""
+
+
+@dataclass
+class GatewayRecord:
+    """A payment as the gateway sees it"""
+    transaction_id: str
+    status: str  # PaymentStatus value; "refunded" once fully refunded at the gateway
+    amount: float  # Major currency units, like Payment.amount
+    created_at: datetime
+    gateway_status: Optional[str] = None  # The gateway's own state name
+
+
+class FakeGateway:
+    """
+    In-memory gateway with a paged list API, for tests and benchmarks
+
+    ``list_calls`` counts pages served, i.e. gateway round trips.
+    """
+
+    name = "fake"
+
+    def __init__(self, records: Iterable[GatewayRecord] = (), page_size: int = STRIPE_PAGE_SIZE, latency: float = 0.0):
+        self.records = sorted(records, key=lambda r: (r.created_at, r.transaction_id))
+        self.page_size = page_size
+        self.latency = latency
+        self.list_calls = 0
+
+    async def list_payments(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> AsyncIterator[List[GatewayRecord]]:
+        records = [
+            r for r in self.records
+            if (since is None or r.created_at >= since) and (until is None or r.created_at < until)
+        ]
+        for start in range(0, len(records), self.page_size):
+            self.list_calls += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            yield records[start:start + self.page_size]
+
+    async def get_payment(self, transaction_id: str) -> GatewayRecord:
+        for record in self.records:
+            if record.transaction_id == transaction_id:
+                return record
+        raise LookupError(f"Unknown transaction {transaction_id}")
+
+    async def refund(self, transaction_id: str):
+        (await self.get_payment(transaction_id)).status = "refunded"
+
+
+def _stripe_record(intent) -> GatewayRecord:
+    # A refunded PaymentIntent stays "succeeded"; the refund shows on its
+    # charge (expanded as latest_charge, otherwise just an id)
+    charge = getattr(intent, "latest_charge", None)
+    refunded = not isinstance(charge, str) and bool(getattr(charge, "refunded", False))
+    return GatewayRecord(
+        transaction_id=intent.id,
+        status="refunded" if refunded else STRIPE_STATUSES.get(intent.status, "pending"),
+        amount=intent.amount / 100,
+        created_at=datetime.utcfromtimestamp(intent.created),
+        gateway_status=intent.status
+    )
+
+
+class StripeGateway:
+    """PaymentIntents listed newest first, STRIPE_PAGE_SIZE per call"""
+
+    name = "stripe"
+
+    def __init__(self, api_key: Optional[str] = None):
+        # Passed on every call rather than set on the global stripe module
+        self.api_key = api_key or os.getenv("STRIPE_SECRET_KEY")
+        if not self.api_key:
+            raise ValueError("STRIPE_SECRET_KEY is not set")
+
+    async def list_payments(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> AsyncIterator[List[GatewayRecord]]:
+        import stripe
+
+        created: Dict[str, int] = {}
+        if since:
+            created["gte"] = int(since.replace(tzinfo=timezone.utc).timestamp())
+        if until:
+            created["lt"] = int(until.replace(tzinfo=timezone.utc).timestamp())
+        params = {"limit": STRIPE_PAGE_SIZE, "expand": ["data.latest_charge"], **({"created": created} if created else {})}
+        while True:
+            # The SDK is blocking; keep it off the event loop
+            page = await asyncio.to_thread(stripe.PaymentIntent.list, api_key=self.api_key, **params)
+            yield [_stripe_record(intent) for intent in page.data]
+            if not page.has_more or not page.data:
+                break
+            params["starting_after"] = page.data[-1].id
+
+    async def charge(self, amount_cents: int, payment_method_id: str) -> GatewayRecord:
+        """Create and confirm a PaymentIntent"""
+        import stripe
+
+        intent = await asyncio.to_thread(
+            stripe.PaymentIntent.create,
+            amount=amount_cents,
+            currency="usd",
+            payment_method=payment_method_id,
+            confirm=True,
+            api_key=self.api_key
+        )
+        return _stripe_record(intent)
+
+    async def get_payment(self, transaction_id: str) -> GatewayRecord:
+        import stripe
+
+        try:
+            intent = await asyncio.to_thread(
+                stripe.PaymentIntent.retrieve, transaction_id, expand=["latest_charge"], api_key=self.api_key
+            )
+        except stripe.InvalidRequestError as e:
+            raise LookupError(f"Unknown transaction {transaction_id}") from e
+        return _stripe_record(intent)
+
+    async def refund(self, transaction_id: str):
+        """Refund a PaymentIntent in full (idempotent per intent)"""
+        import stripe
+
+        try:
+            refund = await asyncio.to_thread(
+                stripe.Refund.create,
+                payment_intent=transaction_id,
+                idempotency_key=f"refund-{transaction_id}",
+                api_key=self.api_key
+            )
+        except stripe.StripeError as e:
+            raise RefundFailed(str(e)) from e
+        if refund.status in ("failed", "canceled"):
+            raise RefundFailed(f"Refund {refund.id} {refund.status}")
+
+
+def _paypal_sales(payment) -> List:
+    return [resource.sale for t in payment.transactions for resource in (t.related_resources or []) if resource.sale]
+
+
+def _paypal_record(payment) -> GatewayRecord:
+    # The payment stays "approved" after a refund; its sales become "refunded"
+    sales = _paypal_sales(payment)
+    refunded = bool(sales) and all(sale.state == "refunded" for sale in sales)
+    return GatewayRecord(
+        transaction_id=payment.id,
+        status="refunded" if refunded else PAYPAL_STATUSES.get(payment.state, "pending"),
+        amount=sum(float(t.amount.total) for t in payment.transactions),
+        created_at=datetime.strptime(payment.create_time, "%Y-%m-%dT%H:%M:%SZ"),
+        gateway_status=payment.state
+    )
+
+
+class PayPalGateway:
+    """REST v1 payments, PAYPAL_PAGE_SIZE per call"""
+
+    name = "paypal"
+
+    def __init__(self, client_id: Optional[str] = None, client_secret: Optional[str] = None, mode: str = PAYPAL_MODE):
+        import paypalrestsdk
+
+        client_id = client_id or os.getenv("PAYPAL_CLIENT_ID")
+        client_secret = client_secret or os.getenv("PAYPAL_CLIENT_SECRET")
+        if not client_id or not client_secret:
+            raise ValueError("PAYPAL_CLIENT_ID and PAYPAL_CLIENT_SECRET must be set")
+        self.api = paypalrestsdk.Api({"mode": mode, "client_id": client_id, "client_secret": client_secret})
+
+    async def list_payments(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> AsyncIterator[List[GatewayRecord]]:
+        import paypalrestsdk
+
+        params = {"count": PAYPAL_PAGE_SIZE, "sort_by": "create_time"}
+        if since:
+            params["start_time"] = since.strftime("%Y-%m-%dT%H:%M:%SZ")
+        if until:
+            params["end_time"] = until.strftime("%Y-%m-%dT%H:%M:%SZ")
+        while True:
+            page = await asyncio.to_thread(paypalrestsdk.Payment.all, params, api=self.api)
+            payments = page.payments or []
+            yield [_paypal_record(payment) for payment in payments]
+            if not payments or not page.next_id:
+                break
+            params["start_id"] = page.next_id
+
+    async def get_payment(self, transaction_id: str) -> GatewayRecord:
+        import paypalrestsdk
+
+        try:
+            payment = await asyncio.to_thread(paypalrestsdk.Payment.find, transaction_id, api=self.api)
+        except paypalrestsdk.ResourceNotFound as e:
+            raise LookupError(f"Unknown transaction {transaction_id}") from e
+        return _paypal_record(payment)
+
+    async def refund(self, transaction_id: str):
+        """Refund every completed sale of a payment in full"""
+        import paypalrestsdk
+
+        payment = await asyncio.to_thread(paypalrestsdk.Payment.find, transaction_id, api=self.api)
+        for sale in _paypal_sales(payment):
+            if sale.state != "completed":
+                continue
+            sale = await asyncio.to_thread(paypalrestsdk.Sale.find, sale.id, api=self.api)
+            if not await asyncio.to_thread(sale.refund, {}):
+                raise RefundFailed(f"Sale {sale.id}: {sale.error}")
+
+
+GATEWAYS = {"fake": FakeGateway, "stripe": StripeGateway, "paypal": PayPalGateway}
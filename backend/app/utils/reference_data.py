@@ -0,0 +1,94 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Iterable, List, Optional
+from app.utils import airport_timezones
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Other replicas pick up airline/airport writes after at most this long
+REFERENCE_DATA_TTL = float(os.getenv("REFERENCE_DATA_TTL_SECONDS", "300"))
+
+EXPAND_OPTIONS = ("airline", "airport")
+
+AIRLINE_FIELDS = ("name", "code", "logo_url", "country")
+AIRPORT_FIELDS = ("code", "name", "city", "country", "timezone")
+
+
+class ReferenceData:
+    """In-process snapshot of airlines (by id) and airports (by code)"""
+
+    def __init__(self):
+        self.airlines: Dict[str, Dict] = {}
+        self.airports: Dict[str, Dict] = {}
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, db: AsyncIOMotorDatabase):
+        """Reload both dictionaries from the database"""
+        airlines = await db.airlines.find({}).to_list(length=None)
+        airports = await db.airports.find({}).to_list(length=None)
+        self._populate(airlines, airports)
+
+    def load_sync(self, sync_db):
+        """Load with a synchronous (pymongo) database, e.g. in the pre-fork master"""
+        self._populate(sync_db.airlines.find({}), sync_db.airports.find({}))
+
+    def _populate(self, airline_documents: Iterable[Dict], airport_documents: Iterable[Dict]):
+        airlines = {}
+        for airline in airline_documents:
+            airlines[str(airline["_id"])] = {"id": str(airline["_id"]), **{f: airline.get(f) for f in AIRLINE_FIELDS}}
+        airports = {}
+        for airport in airport_documents:
+            if airport.get("code"):
+                airports[airport["code"].upper()] = {"id": str(airport["_id"]), **{f: airport.get(f) for f in AIRPORT_FIELDS}}
+
+        self.airlines = airlines
+        self.airports = airports
+        self.loaded_at = time.monotonic()
+        # The timezone snapshot used by date filtering comes from the same read
+        airport_timezones.set_airport_timezones({
+            code: airport["timezone"] for code, airport in airports.items() if airport.get("timezone")
+        })
+        logger.info(f"Loaded reference data: {len(airlines)} airlines, {len(airports)} airports")
+
+    async def ensure_fresh(self, db: AsyncIOMotorDatabase):
+        """Load on first use and again once the TTL has expired"""
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < REFERENCE_DATA_TTL:
+            return
+        async with self._lock:
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= REFERENCE_DATA_TTL:
+                await self.refresh(db)
+
+    def _expand_flight(self, flight: Dict, expand: Iterable[str]):
+        if "airline" in expand and "airline_id" in flight:
+            flight["airline"] = self.airlines.get(flight["airline_id"])
+        if "airport" in expand:
+            if "origin" in flight:
+                flight["origin_airport"] = self.airports.get(flight["origin"])
+            if "destination" in flight:
+                flight["destination_airport"] = self.airports.get(flight["destination"])
+
+    def expand_results(self, results: List[Dict], expand: Iterable[str]):
+        """Add airline and/or airport details in place to results and their embedded segments"""
+        for result in results:
+            self._expand_flight(result, expand)
+            for segment in result.get("segments", []):
+                if isinstance(segment, dict):
+                    self._expand_flight(segment, expand)
+
+
+reference_data = ReferenceData()
+
+
+def parse_expand(expand: Optional[str]) -> List[str]:
+    """Parse a comma-separated expand parameter; raises ValueError on unknown options"""
+    if not expand:
+        return []
+    options = [option.strip() for option in expand.split(",") if option.strip()]
+    unknown = [option for option in options if option not in EXPAND_OPTIONS]
+    if unknown:
+        raise ValueError(f"Unknown expand option(s): {', '.join(unknown)}")
+    return options
@@ -0,0 +1,48 @@
+from fastapi.responses import JSONResponse
+from bson import ObjectId
+from typing import Any
+import orjson
+import os
+
+# Opt-in switch for the orjson response path on large read endpoints
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+
+def _default(obj: Any) -> Any:
+    """Serialize types orjson does not handle natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson
+
+    Datetimes, enums and numpy scalars are encoded natively and ObjectId values
+    as strings. Returned directly from a handler, it skips FastAPI's
+    response_model validation and jsonable_encoder pass.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+
+def json_response(content: Any, enabled: bool = None) -> Any:
+    """
+    Wrap handler output in a FastJSONResponse when the fast path is enabled
+
+    Returns the content unchanged otherwise, so FastAPI validates and encodes
+    it as usual.
+    """
+    if enabled is None:
+        enabled = FAST_JSON_RESPONSES
+    if enabled:
+        return FastJSONResponse(content)
+    return content
@@ -0,0 +1,73 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _copy(value: Any) -> Any:
+    """Copy nested dicts and lists (documents hold only immutable leaves otherwise)"""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task. Every caller receives its own copy of
+    the result, and the task is shielded, so a cancelled caller does not cancel
+    the work the others are waiting on. Once every caller has been cancelled
+    (e.g. all clients disconnected) the task is cancelled too.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.create_task(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+        return _copy(result)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieve the exception so an abandoned failure is not reported as unhandled
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"{self.name} call failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "saved": self.coalesced,
+            "in_flight": len(self._in_flight)
+        }
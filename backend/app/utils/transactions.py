@@ -0,0 +1,116 @@
+import asyncio
+import random
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+from pymongo.read_concern import ReadConcern
+from pymongo.write_concern import WriteConcern
+from typing import Any, Awaitable, Callable, Dict
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Bounded retry budget: a transaction that keeps conflicting on a hot
+# document gives up instead of piling up behind it
+TXN_MAX_ATTEMPTS = int(os.getenv("TXN_MAX_ATTEMPTS", "5"))
+TXN_TIME_BUDGET_SECONDS = float(os.getenv("TXN_TIME_BUDGET_SECONDS", "2"))
+# Short transactions: the commit must finish within this many milliseconds
+TXN_MAX_COMMIT_MS = int(os.getenv("TXN_MAX_COMMIT_MS", "1000"))
+# Retry sleep: base * attempt, with jitter so conflicting writers spread out
+TXN_RETRY_BASE_SECONDS = float(os.getenv("TXN_RETRY_BASE_SECONDS", "0.005"))
+
+# Process-wide outcome counters (reported by the contention benchmark)
+TRANSACTION_STATS: Dict[str, int] = {"committed": 0, "retried": 0, "aborted": 0, "exhausted": 0}
+
+
+def is_transient(error: Exception) -> bool:
+    return isinstance(error, PyMongoError) and error.has_error_label("TransientTransactionError")
+
+
+async def supports_transactions(client: AsyncIOMotorClient) -> bool:
+    """Whether the server is a replica set member or mongos (standalones reject transactions)"""
+    try:
+        hello = await client.admin.command("hello")
+    except PyMongoError as e:
+        logger.warning(f"Could not check transaction support: {e}")
+        return False
+    return bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+
+
+def is_unknown_commit(error: Exception) -> bool:
+    return isinstance(error, PyMongoError) and error.has_error_label("UnknownTransactionCommitResult")
+
+
+async def run_in_transaction(
+    client: AsyncIOMotorClient,
+    callback: Callable[[Any], Awaitable[Any]],
+    max_attempts: int = TXN_MAX_ATTEMPTS,
+    time_budget: float = TXN_TIME_BUDGET_SECONDS
+) -> Any:
+    """
+    Run ``callback(session)`` in a multi-document transaction
+
+    Unlike ``ClientSession.with_transaction`` (a fixed 120s budget), retries
+    of TransientTransactionError (write conflicts, elections) are bounded by
+    ``max_attempts`` and ``time_budget``; a commit with an unknown result is
+    retried within the same budget. Any other error aborts and propagates.
+
+    Args:
+        client: Motor client of a replica set or sharded cluster
+        callback: Performs the writes, passing ``session`` to every operation
+        max_attempts: Transaction attempts before giving up
+        time_budget: Seconds after which no new attempt is started
+
+    Returns:
+        The callback's result, once committed
+    """
+    deadline = time.monotonic() + time_budget
+    async with await client.start_session() as session:
+        attempt = 0
+        while True:
+            attempt += 1
+            session.start_transaction(
+                read_concern=ReadConcern("snapshot"),
+                write_concern=WriteConcern("majority"),
+                max_commit_time_ms=TXN_MAX_COMMIT_MS
+            )
+            try:
+                result = await callback(session)
+            except BaseException as e:
+                if session.in_transaction:
+                    await session.abort_transaction()
+                TRANSACTION_STATS["aborted"] += 1
+                if is_transient(e) and attempt < max_attempts and time.monotonic() < deadline:
+                    TRANSACTION_STATS["retried"] += 1
+                    await asyncio.sleep(TXN_RETRY_BASE_SECONDS * attempt * random.uniform(0.5, 1.5))
+                    continue
+                if is_transient(e):
+                    TRANSACTION_STATS["exhausted"] += 1
+                    logger.warning(f"Transaction gave up after {attempt} attempts: {str(e)}")
+                raise
+
+            try:
+                await _commit(session, deadline)
+            except PyMongoError as e:
+                TRANSACTION_STATS["aborted"] += 1
+                if is_transient(e) and attempt < max_attempts and time.monotonic() < deadline:
+                    TRANSACTION_STATS["retried"] += 1
+                    continue
+                if is_transient(e):
+                    TRANSACTION_STATS["exhausted"] += 1
+                raise
+            TRANSACTION_STATS["committed"] += 1
+            return result
+
+
+async def _commit(session, deadline: float):
+    """Commit, retrying while the outcome is unknown and time remains"""
+    while True:
+        try:
+            await session.commit_transaction()
+            return
+        except PyMongoError as e:
+            if is_unknown_commit(e) and time.monotonic() < deadline:
+                continue
+            raise
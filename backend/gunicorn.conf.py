@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration for multi-worker pods
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported once in the master (preload_app). Before forking, the
+master loads airlines, airports and, when FLIGHT_SNAPSHOT is on (by default
+only with FLIGHT_SNAPSHOT_PATH set), a columnar flight snapshot (mapping the
+file plus a delta) with a synchronous client and freezes the GC, so the workers share those pages
+copy-on-write instead of each loading its own copy.
+"""
+from pymongo import MongoClient
+import gc
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger("gunicorn.error")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+preload_app = True
+
+# Recycle workers after a jittered number of requests so leaks and
+# copy-on-write drift are bounded; in-flight requests get graceful_timeout
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+
+def on_starting(server):
+    """Load shared read-only data in the master, before any worker is forked"""
+    from app.database import MONGO_DATABASE, MONGO_URI
+    from app.utils.flight_snapshot import FLIGHT_SNAPSHOT_ENABLED, load_flight_snapshot_sync, set_flight_snapshot
+    from app.utils.reference_data import reference_data
+
+    sync_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=10000)
+    try:
+        sync_db = sync_client[MONGO_DATABASE]
+        reference_data.load_sync(sync_db)
+        if FLIGHT_SNAPSHOT_ENABLED:
+            set_flight_snapshot(load_flight_snapshot_sync(sync_db))
+    except Exception as e:
+        # Workers still start; they load reference data lazily and query Mongo
+        logger.warning(f"Preloading shared data failed, workers will load lazily: {str(e)}")
+    finally:
+        sync_client.close()
+
+    # Move everything allocated so far out of the collector's generations so
+    # GC passes in the workers don't write to (and un-share) these pages
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Preloaded shared data; {gc.get_freeze_count()} objects frozen")